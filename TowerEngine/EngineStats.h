@@ -0,0 +1,34 @@
+#pragma once
+#include <chrono>
+
+// Counters and phase timings of the last GameEngine::update call, summed over its sub-steps.
+// Plain data: bridge.cpp copies it out as is, and cpp_bridge.C_Stats mirrors the layout.
+struct EngineStats {
+    int steps;
+    // Entities alive after the update.
+    int zombies; int plants; int projectiles; int effects;
+    // Zombie/plant (eating) and projectile/zombie (swept hit) pairs actually tested.
+    int collision_tests;
+    // Zombies looked at by Peashooter targeting.
+    int target_scans;
+    // make_shared calls: spawned zombies, fired peas, and the plants built since the previous update.
+    int allocations;
+    // Entities and effects removed.
+    int erased;
+    // Seconds. waves covers the timers and spawns at the start of a step, compact the erases at its end.
+    double time_waves; double time_zombies; double time_plants; double time_projectiles; double time_compact;
+    double time_total;
+};
+
+class StatsClock {
+    using Clock = std::chrono::steady_clock;
+    Clock::time_point last = Clock::now();
+public:
+    // Seconds since the previous lap (or construction).
+    double lap() {
+        auto now = Clock::now();
+        double s = std::chrono::duration<double>(now - last).count();
+        last = now;
+        return s;
+    }
+};
@@ -29,5 +29,6 @@ enum class GameSound {
     ConeHit,       // 5:    ()
     BucketHit,     // 6:    ()
     PaperRip,      // 7:  
-    ZombieAngry
+    ZombieAngry,
+    Freeze         // 9:  ( )
 };
@@ -4,9 +4,18 @@
 #include <algorithm>
 #include <iostream>
 #include <fstream>
+#include <random>
+#include <unordered_map>
+#include <cstdint>
+#include <cstring>
 #include <nlohmann/json.hpp> 
 #include "GameObjects.h"
 #include "GameMap.h"
+#include "LaneIndex.h"
+#include "WaveScheduler.h"
+#include "LevelData.h"
+#include "EngineStats.h"
+#include "StateBuffer.h"
 
 using json = nlohmann::json;
 
@@ -28,10 +37,28 @@ class GameEngine {
     float auto_sun_timer; float auto_sun_interval; int auto_sun_amount;
     int money; int lives;
 
-    struct WaveEvent { float time; ZombieType type; int row; };
-    std::vector<WaveEvent> pending_waves;
+    WaveScheduler waves;
+    std::unordered_map<int, LevelData> level_cache;
+
+    // All randomness of a level run; reseeded from `seed` by start_level so a run is
+    // reproducible from (level, seed, inputs).
+    std::mt19937 rng;
+    uint32_t seed = 0;
     bool level_completed; bool game_over;
 
+    // Rebuilt every tick: plants before the zombie pass, zombies once they have moved.
+    LaneIndex plant_lanes;
+    LaneIndex zombie_lanes;
+
+    EngineStats stats{};
+    // Plants built between updates; counted with the next update's allocations.
+    int build_allocations = 0;
+
+    static constexpr float EAT_RANGE = 50.0f;
+    // update() splits longer dt values into equal steps no longer than this, so scaled-up
+    // dt (fast-forward, coarse headless runs) plays out like the same time at 60 ticks/s.
+    static constexpr float MAX_STEP = 1.0f / 60.0f;
+
 public:
     GameEngine() : level_time(0), auto_sun_timer(0), money(0), lives(0), level_completed(false), game_over(false) {
         cards.push_back(PlantCard(PlantType::Peashooter, 100, 5.0f));
@@ -47,14 +74,42 @@ public:
     const std::vector<std::shared_ptr<Projectile>>& get_projectiles() const { return projectiles; }
     const std::vector<VisualEffect>& get_effects() const { return effects; }
     const std::vector<int>& get_sounds() const { return sound_events; }
+    const EngineStats& get_stats() const { return stats; }
 
     int get_money() const { return money; }
     int get_lives() const { return lives; }
     int get_map_width() const { return map.width; }
     int get_map_height() const { return map.height; }
+    const std::vector<int>& get_active_rows() const { return map.active_rows; }
+    int get_card_count() const { return (int)cards.size(); }
     bool is_level_complete() const { return level_completed; }
     bool is_game_over() const { return game_over; }
 
+    void set_seed(uint32_t s) { seed = s; rng.seed(s); }
+
+    // FNV-1a over the simulation state (no entity ids, which are global to the process).
+    // Equal hashes after the same inputs mean the runs did not diverge.
+    uint64_t state_hash() const {
+        uint64_t h = 14695981039346656037ull;
+        auto mix = [&h](const void* data, size_t n) {
+            const unsigned char* b = static_cast<const unsigned char*>(data);
+            for (size_t i = 0; i < n; i++) { h ^= b[i]; h *= 1099511628211ull; }
+        };
+        auto add = [&mix](auto v) { mix(&v, sizeof(v)); };
+
+        add(level_time); add(auto_sun_timer); add(money); add(lives);
+        add(level_completed); add(game_over);
+        for (const auto& c : cards) add(c.current_cooldown);
+        for (const auto& z : zombies) {
+            add((int)z->type); add(z->pos.x); add(z->pos.y); add(z->health);
+            add(z->freeze_timer); add(z->armor_state); add(z->has_arm); add(z->has_newspaper);
+        }
+        for (const auto& p : plants) { add((int)p->type); add(p->pos.x); add(p->pos.y); add(p->health); add(p->cooldown_timer); }
+        for (const auto& p : projectiles) { add(p->pos.x); add(p->pos.y); }
+        for (const auto& e : effects) { add(e.type); add(e.x); add(e.y); add(e.timer); }
+        return h;
+    }
+
     float get_card_cooldown_pct(int index) {
         if (index < 0 || index >= cards.size()) return 0.0f;
         if (cards[index].current_cooldown <= 0) return 0.0f;
@@ -74,16 +129,33 @@ public:
         }
     }
 
-    void load_level(int level_id) {
-        zombies.clear(); plants.clear(); projectiles.clear(); pending_waves.clear(); effects.clear(); sound_events.clear();
+    bool load_level(int level_id) {
+        auto it = level_cache.find(level_id);
+        if (it == level_cache.end()) {
+            std::ifstream file("levels/level_" + std::to_string(level_id) + ".json");
+            LevelData data;
+            if (!file || !LevelData::parse(json::parse(file, nullptr, false), data)) return false;
+            it = level_cache.emplace(level_id, std::move(data)).first;
+        }
+        start_level(it->second);
+        return true;
+    }
+
+    bool load_level_from_memory(const char* text, size_t len) {
+        LevelData data;
+        if (!text || !LevelData::parse(json::parse(text, text + len, nullptr, false), data)) return false;
+        start_level(data);
+        return true;
+    }
+
+    void start_level(const LevelData& level) {
+        zombies.clear(); plants.clear(); projectiles.clear(); waves.clear(); effects.clear(); sound_events.clear();
         for (auto& c : cards) c.current_cooldown = 0.0f;
         level_time = 0; level_completed = false; game_over = false;
+        rng.seed(seed);
+        stats = EngineStats{}; build_allocations = 0;
 
-        std::string path = "levels/level_" + std::to_string(level_id) + ".json";
-        std::ifstream file(path);
-
-        json j; file >> j;
-        auto settings = j["settings"];
+        const json& settings = level.settings;
         money = settings.value("start_money", 50);
         lives = settings.value("lives", 5);
         auto_sun_amount = settings.value("auto_sun_amount", 25);
@@ -92,61 +164,81 @@ public:
 
         map.load_from_json(settings);
 
-        for (const auto& w : j["waves"]) {
-            float t = w["time"]; int r = w["row"]; int type_id = w["type"];
-            pending_waves.push_back({ t, static_cast<ZombieType>(type_id), r });
-        }
-        std::sort(pending_waves.begin(), pending_waves.end(), [](const auto& a, const auto& b) { return a.time < b.time; });
+        waves.add(std::make_unique<ListWaveSource>(level.waves));
+        if (!level.wave_stream.empty()) waves.add(std::make_unique<StreamWaveSource>(level.wave_stream));
+        if (level.wave_generator.is_object()) waves.add(make_wave_generator(level.wave_generator));
+    }
+
+    // "wave_generator": see RampWaveSource. Rows are the level's active rows.
+    std::unique_ptr<WaveSource> make_wave_generator(const json& g) {
+        auto src = std::make_unique<RampWaveSource>();
+        src->t = g.value("start", 0.0f);
+        src->interval = g.value("interval", 5.0f);
+        src->min_interval = g.value("min_interval", src->interval);
+        src->ramp = g.value("ramp", 1.0f);
+        src->count = g.value("count", 0);
+        src->types = g.value("types", std::vector<int>{ 0 });
+        src->rows = map.active_rows;
+        src->rng.seed(g.value("seed", 0u));
+        return src;
     }
 
     void update(float dt) {
+        StatsClock clock;
+        stats = EngineStats{};
+        stats.allocations = build_allocations; build_allocations = 0;
+
         sound_events.clear();
+        int steps = std::max(1, (int)std::ceil(dt / MAX_STEP));
+        for (int i = 0; i < steps; i++) step(dt / steps);
+
+        stats.zombies = (int)zombies.size(); stats.plants = (int)plants.size();
+        stats.projectiles = (int)projectiles.size(); stats.effects = (int)effects.size();
+        stats.time_total = clock.lap();
+    }
 
+    void step(float dt) {
         if (game_over || level_completed) return;
+        StatsClock clock;
+        stats.steps++;
         level_time += dt;
 
         for (auto& c : cards) if (c.current_cooldown > 0) c.current_cooldown -= dt;
         for (auto& e : effects) e.timer -= dt;
+        size_t effect_count = effects.size();
         effects.erase(std::remove_if(effects.begin(), effects.end(), [](const auto& e) { return e.timer <= 0; }), effects.end());
+        stats.erased += (int)(effect_count - effects.size());
 
         auto_sun_timer -= dt;
         if (auto_sun_timer <= 0) { money += auto_sun_amount; auto_sun_timer = auto_sun_interval; }
 
-        while (!pending_waves.empty() && pending_waves.front().time <= level_time) {
-            WaveEvent ev = pending_waves.front();
-            spawn_zombie_at_row(ev.type, ev.row);
-            pending_waves.erase(pending_waves.begin());
-        }
+        waves.pop_due(level_time, [&](const WaveEvent& ev) { spawn_zombie_at_row(ev.type, ev.row); });
+        stats.time_waves += clock.lap();
 
         float speed_multiplier = 1.0f;
         for (const auto& z : zombies) { if (z->type == ZombieType::Flag && !z->to_delete) { speed_multiplier = 1.3f; break; } }
 
+        plant_lanes.build(plants, map.tile_h, map.height);
+
         for (auto& z : zombies) {
             if (z->to_delete) continue;
 
             float move_mult = 1.0f;
             bool is_eating = false;
 
-            for (auto& p : plants) {
-                if (p->to_delete) continue;
-
-                int z_row = (int)(z->pos.y / map.tile_h);
-                int p_row = (int)(p->pos.y / map.tile_h);
-
-                if (z_row == p_row && std::abs(z->pos.x - p->pos.x) < 50.0f) {
-                    bool safe_to_eat = true;
-                    if (p->type == PlantType::PotatoMine) {
-                        auto mine = std::static_pointer_cast<PotatoMine>(p);
-                        if (mine->is_armed) safe_to_eat = false;
-                    }
-
-                    if (safe_to_eat) {
-                        p->take_damage(z->damage * dt);
-                        is_eating = true;
-                        if (std::rand() % 100 < 5) sound_events.push_back((int)GameSound::ZombieEat);
-                        break;
-                    }
-                }
+            int target = plant_lanes.first_in_range(plant_lanes.lane_of(z->pos.y),
+                z->pos.x - EAT_RANGE - 1.0f, z->pos.x + EAT_RANGE + 1.0f, [&](int i) {
+                    stats.collision_tests++;
+                    const auto& p = plants[i];
+                    if (p->to_delete || std::abs(z->pos.x - p->pos.x) >= EAT_RANGE) return false;
+                    if (p->type == PlantType::PotatoMine && std::static_pointer_cast<PotatoMine>(p)->is_armed) return false;
+                    return true;
+                });
+
+            if (target >= 0) {
+                plants[target]->take_damage(z->damage * dt);
+                is_eating = true;
+                if (rng() % 100 < 5) sound_events.push_back((int)GameSound::ZombieEat);
             }
 
             if (is_eating) move_mult = 0.0f;
@@ -159,79 +251,94 @@ public:
                 if (lives <= 0) game_over = true;
             }
         }
+        stats.time_zombies += clock.lap();
+
+        zombie_lanes.build(zombies, map.tile_h, map.height);
+        float reach = 0.0f;
+        for (const auto& z : zombies) reach = std::max(reach, z->radius);
+        TargetTable targets{ zombies, zombie_lanes, map.spawn_x() };
 
+        size_t fired = projectiles.size();
         for (auto& p : plants) {
             p->update(dt);
-            p->update_logic(dt, zombies, projectiles, effects, sound_events);
+            p->update_logic(dt, zombies, targets, projectiles, effects, sound_events);
             money += p->produce_money();
         }
+        stats.allocations += (int)(projectiles.size() - fired);
+        stats.target_scans += targets.scanned;
+        stats.time_plants += clock.lap();
 
         for (auto& proj : projectiles) {
+            Vec from = proj->pos;
             proj->update(dt);
             if (proj->to_delete) continue;
-            for (auto& z : zombies) {
-                if (!z->to_delete && Vec::distance(proj->pos, z->pos) < z->radius) {
-                    bool had_paper = z->has_newspaper;
-
-                    z->take_damage(proj->damage);
-                    proj->to_delete = true;
-
-                    bool hit_armor = false;
-
-                    if (z->health > z->body_health) {
-                        if (z->type == ZombieType::Conehead) {
-                            sound_events.push_back((int)GameSound::ConeHit);
-                            hit_armor = true;
-                        }
-                        else if (z->type == ZombieType::Buckethead || z->type == ZombieType::Football) {
-                            sound_events.push_back((int)GameSound::BucketHit);
-                            hit_armor = true;
-                        }
-                    }
 
-                    if (!hit_armor) {
-                        sound_events.push_back((int)GameSound::PeaHit);
-                    }
+            // Swept test: a zombie is hit if the path travelled this step passes within its radius.
+            Vec to = proj->pos;
+            float x_lo = std::min(from.x, to.x), x_hi = std::max(from.x, to.x);
+            int hit = -1;
+            for (int lane = zombie_lanes.first_lane(std::min(from.y, to.y), reach); lane <= zombie_lanes.last_lane(std::max(from.y, to.y), reach); lane++) {
+                int found = zombie_lanes.first_in_range(lane, x_lo - reach - 1.0f, x_hi + reach + 1.0f, [&](int i) {
+                    stats.collision_tests++;
+                    return !zombies[i]->to_delete && Vec::segment_distance(from, to, zombies[i]->pos) < zombies[i]->radius;
+                }, hit >= 0 ? hit : INT_MAX);
+                if (found >= 0) hit = found;
+            }
+
+            if (hit >= 0) {
+                auto& z = zombies[hit];
+                bool had_paper = z->has_newspaper;
+
+                z->take_damage(proj->damage);
+                proj->to_delete = true;
 
-                    if (had_paper && !z->has_newspaper) {
-                        sound_events.push_back((int)GameSound::PaperRip);
-                        sound_events.push_back((int)GameSound::ZombieAngry);
+                bool hit_armor = false;
+
+                if (z->health > z->body_health) {
+                    if (z->type == ZombieType::Conehead) {
+                        sound_events.push_back((int)GameSound::ConeHit);
+                        hit_armor = true;
+                    }
+                    else if (z->type == ZombieType::Buckethead || z->type == ZombieType::Football) {
+                        sound_events.push_back((int)GameSound::BucketHit);
+                        hit_armor = true;
                     }
+                }
 
-                    break;
+                if (!hit_armor) {
+                    sound_events.push_back((int)GameSound::PeaHit);
+                }
+
+                if (had_paper && !z->has_newspaper) {
+                    sound_events.push_back((int)GameSound::PaperRip);
+                    sound_events.push_back((int)GameSound::ZombieAngry);
                 }
             }
         }
 
+        stats.time_projectiles += clock.lap();
+
+        size_t entity_count = zombies.size() + plants.size() + projectiles.size();
         zombies.erase(std::remove_if(zombies.begin(), zombies.end(), [](const auto& o) { return o->to_delete; }), zombies.end());
         plants.erase(std::remove_if(plants.begin(), plants.end(), [](const auto& o) { return o->to_delete; }), plants.end());
         projectiles.erase(std::remove_if(projectiles.begin(), projectiles.end(), [](const auto& o) { return o->to_delete; }), projectiles.end());
+        stats.erased += (int)(entity_count - zombies.size() - plants.size() - projectiles.size());
+        stats.time_compact += clock.lap();
 
-        if (pending_waves.empty() && zombies.empty() && lives > 0) level_completed = true;
+        if (waves.empty() && zombies.empty() && lives > 0) level_completed = true;
     }
 
     void spawn_zombie_at_row(ZombieType type, int row) {
         if (row < 0 || row >= map.height) return;
 
-        float start_x = map.width * map.tile_w + 100.0f;
+        float start_x = map.spawn_x();
         float start_y = row * map.tile_h + map.tile_h / 2.0f;
 
-        std::shared_ptr<Zombie> z = nullptr;
-
-        switch (type) {
-        case ZombieType::Normal: z = std::make_shared<NormalZombie>(start_x, start_y); break;
-        case ZombieType::Conehead: z = std::make_shared<ConeheadZombie>(start_x, start_y); break;
-        case ZombieType::Buckethead: z = std::make_shared<BucketheadZombie>(start_x, start_y); break;
-        case ZombieType::Football: z = std::make_shared<FootballZombie>(start_x, start_y); break;
-        case ZombieType::Newspaper: z = std::make_shared<NewspaperZombie>(start_x, start_y); break;
-        case ZombieType::Imp: z = std::make_shared<ImpZombie>(start_x, start_y); break;
-        case ZombieType::Gargantuar: z = std::make_shared<GargantuarZombie>(start_x, start_y); break;
-        case ZombieType::Flag: z = std::make_shared<FlagZombie>(start_x, start_y); break;
-        }
-
+        std::shared_ptr<Zombie> z = make_zombie(type, start_x, start_y);
         if (z) {
             z->id = Entity::next_id++;
             zombies.push_back(z);
+            stats.allocations++;
         }
     }
 
@@ -251,20 +358,171 @@ public:
             if (Vec::distance({ cx, cy }, p->pos) < 30.0f) return;
         }
 
-        std::shared_ptr<Plant> p = nullptr;
-        switch (card.type) {
-        case PlantType::Peashooter: p = std::make_shared<Peashooter>(cx, cy); break;
-        case PlantType::Sunflower: p = std::make_shared<Sunflower>(cx, cy); break;
-        case PlantType::WallNut: p = std::make_shared<WallNut>(cx, cy); break;
-        case PlantType::PotatoMine: p = std::make_shared<PotatoMine>(cx, cy); break;
-        case PlantType::CherryBomb: p = std::make_shared<CherryBomb>(cx, cy); break;
-        case PlantType::IceLettuce: p = std::make_shared<IceLettuce>(cx, cy); break;
-        }
-
+        std::shared_ptr<Plant> p = make_plant(card.type, cx, cy);
         if (p) {
             plants.push_back(p);
+            build_allocations++;
             money -= card.cost;
             card.current_cooldown = card.max_cooldown;
         }
     }
+
+    static std::shared_ptr<Zombie> make_zombie(ZombieType type, float x, float y) {
+        switch (type) {
+        case ZombieType::Normal: return std::make_shared<NormalZombie>(x, y);
+        case ZombieType::Conehead: return std::make_shared<ConeheadZombie>(x, y);
+        case ZombieType::Buckethead: return std::make_shared<BucketheadZombie>(x, y);
+        case ZombieType::Football: return std::make_shared<FootballZombie>(x, y);
+        case ZombieType::Newspaper: return std::make_shared<NewspaperZombie>(x, y);
+        case ZombieType::Imp: return std::make_shared<ImpZombie>(x, y);
+        case ZombieType::Gargantuar: return std::make_shared<GargantuarZombie>(x, y);
+        case ZombieType::Flag: return std::make_shared<FlagZombie>(x, y);
+        }
+        return nullptr;
+    }
+
+    static std::shared_ptr<Plant> make_plant(PlantType type, float x, float y) {
+        switch (type) {
+        case PlantType::Peashooter: return std::make_shared<Peashooter>(x, y);
+        case PlantType::Sunflower: return std::make_shared<Sunflower>(x, y);
+        case PlantType::WallNut: return std::make_shared<WallNut>(x, y);
+        case PlantType::PotatoMine: return std::make_shared<PotatoMine>(x, y);
+        case PlantType::CherryBomb: return std::make_shared<CherryBomb>(x, y);
+        case PlantType::IceLettuce: return std::make_shared<IceLettuce>(x, y);
+        }
+        return nullptr;
+    }
+
+    // --- state ---------------------------------------------------------------
+    // Everything a level run depends on: map, timers, cards, RNG, pending waves and
+    // every entity. The level cache and the stats of the last update are not part of it.
+
+    static constexpr uint32_t STATE_MAGIC = 0x535A5650;    // "PVZS"
+    static constexpr uint32_t STATE_VERSION = 1;
+
+    struct ZombieState {
+        ZombieType type; int id; Vec pos; float radius; bool to_delete;
+        float health, max_health, body_health, speed_base, current_speed, freeze_timer, damage;
+        int armor_state; bool has_arm, has_newspaper;
+    };
+    struct PlantState {
+        PlantType type; Vec pos; float radius; bool to_delete;
+        float health, max_health, cost, cooldown_timer, action_cooldown;
+        bool is_armed;
+    };
+    struct ProjectileState { int id; Vec pos; float radius; bool to_delete; Vec velocity; float damage; bool hit_triggered; };
+
+    void save_state(StateWriter& w) const {
+        w.put(STATE_MAGIC); w.put(STATE_VERSION);
+        w.put(map.width); w.put(map.height); w.put(map.tile_w); w.put(map.tile_h);
+        w.put_vector(map.grid); w.put_vector(map.active_rows);
+
+        w.put(level_time); w.put(auto_sun_timer); w.put(auto_sun_interval); w.put(auto_sun_amount);
+        w.put(money); w.put(lives); w.put(level_completed); w.put(game_over);
+        w.put(seed); w.put(rng);
+
+        std::vector<float> cooldowns;
+        for (const auto& c : cards) cooldowns.push_back(c.current_cooldown);
+        w.put_vector(cooldowns);
+        w.put_vector(effects);
+        w.put_vector(sound_events);
+        waves.save(w);
+
+        std::vector<ZombieState> zs;
+        zs.reserve(zombies.size());
+        for (const auto& z : zombies) {
+            zs.push_back({ z->type, z->id, z->pos, z->radius, z->to_delete, z->health, z->max_health, z->body_health,
+                z->speed_base, z->current_speed, z->freeze_timer, z->damage, z->armor_state, z->has_arm, z->has_newspaper });
+        }
+        w.put_vector(zs);
+
+        std::vector<PlantState> ps;
+        ps.reserve(plants.size());
+        for (const auto& p : plants) {
+            bool armed = p->type == PlantType::PotatoMine && std::static_pointer_cast<PotatoMine>(p)->is_armed;
+            ps.push_back({ p->type, p->pos, p->radius, p->to_delete, p->health, p->max_health, p->cost,
+                p->cooldown_timer, p->action_cooldown, armed });
+        }
+        w.put_vector(ps);
+
+        std::vector<ProjectileState> prs;
+        prs.reserve(projectiles.size());
+        for (const auto& p : projectiles) prs.push_back({ p->id, p->pos, p->radius, p->to_delete, p->velocity, p->damage, p->hit_triggered });
+        w.put_vector(prs);
+    }
+
+    // Leaves the engine untouched and returns false if the buffer is not a complete state
+    // written by this version.
+    bool restore_state(const char* data, size_t len) {
+        StateReader r(data, len);
+        GameEngine next;
+        if (r.get<uint32_t>() != STATE_MAGIC || r.get<uint32_t>() != STATE_VERSION || !next.read_state(r) || !r.done()) return false;
+        next.level_cache = std::move(level_cache);
+        *this = std::move(next);
+        return true;
+    }
+
+    GameEngine* clone() const {
+        StateWriter w;
+        save_state(w);
+        auto* copy = new GameEngine();
+        copy->restore_state(w.data.data(), w.data.size());
+        copy->level_cache = level_cache;
+        return copy;
+    }
+
+private:
+    bool read_state(StateReader& r) {
+        map.width = r.get<int>(); map.height = r.get<int>(); map.tile_w = r.get<float>(); map.tile_h = r.get<float>();
+        r.get_vector(map.grid); r.get_vector(map.active_rows);
+
+        level_time = r.get<float>(); auto_sun_timer = r.get<float>(); auto_sun_interval = r.get<float>(); auto_sun_amount = r.get<int>();
+        money = r.get<int>(); lives = r.get<int>(); level_completed = r.get<bool>(); game_over = r.get<bool>();
+        seed = r.get<uint32_t>(); rng = r.get<std::mt19937>();
+
+        std::vector<float> cooldowns;
+        r.get_vector(cooldowns);
+        if (cooldowns.size() != cards.size()) return false;
+        for (size_t i = 0; i < cards.size(); i++) cards[i].current_cooldown = cooldowns[i];
+        r.get_vector(effects);
+        r.get_vector(sound_events);
+        if (!waves.load(r)) return false;
+
+        std::vector<ZombieState> zs;
+        r.get_vector(zs);
+        zombies.reserve(zs.size());
+        for (const auto& s : zs) {
+            auto z = make_zombie(s.type, s.pos.x, s.pos.y);
+            if (!z) return false;
+            z->id = s.id; z->radius = s.radius; z->to_delete = s.to_delete;
+            z->health = s.health; z->max_health = s.max_health; z->body_health = s.body_health;
+            z->speed_base = s.speed_base; z->current_speed = s.current_speed; z->freeze_timer = s.freeze_timer; z->damage = s.damage;
+            z->armor_state = s.armor_state; z->has_arm = s.has_arm; z->has_newspaper = s.has_newspaper;
+            zombies.push_back(z);
+        }
+
+        std::vector<PlantState> ps;
+        r.get_vector(ps);
+        plants.reserve(ps.size());
+        for (const auto& s : ps) {
+            auto p = make_plant(s.type, s.pos.x, s.pos.y);
+            if (!p) return false;
+            p->radius = s.radius; p->to_delete = s.to_delete;
+            p->health = s.health; p->max_health = s.max_health; p->cost = s.cost;
+            p->cooldown_timer = s.cooldown_timer; p->action_cooldown = s.action_cooldown;
+            if (s.type == PlantType::PotatoMine) std::static_pointer_cast<PotatoMine>(p)->is_armed = s.is_armed;
+            plants.push_back(p);
+        }
+
+        std::vector<ProjectileState> prs;
+        r.get_vector(prs);
+        projectiles.reserve(prs.size());
+        for (const auto& s : prs) {
+            auto p = std::make_shared<Projectile>(s.pos.x, s.pos.y, s.pos, 0.0f, s.damage);
+            p->id = s.id; p->radius = s.radius; p->to_delete = s.to_delete;
+            p->velocity = s.velocity; p->hit_triggered = s.hit_triggered;
+            projectiles.push_back(p);
+        }
+        return r.ok;
+    }
 };
\ No newline at end of file
@@ -29,6 +29,9 @@ public:
         }
     }
 
+    // Zombies enter here, one step right of the last column.
+    float spawn_x() const { return width * tile_w + 100.0f; }
+
     bool is_buildable(float x, float y) {
         int gx = (int)(x / tile_w);
         int gy = (int)(y / tile_h);
@@ -1,6 +1,7 @@
 #pragma once
 #include "Entity.h"
 #include "Enums.h"
+#include "LaneIndex.h"
 #include <vector>
 #include <memory>
 #include <algorithm>
@@ -146,6 +147,21 @@ public:
 
 class FlagZombie : public Zombie { public: FlagZombie(float x, float y) : Zombie(ZombieType::Flag, x, y) { speed_base = 45; } };
 
+// Built once per tick after the zombies have moved; shared by every plant that needs a target.
+struct TargetTable {
+    const std::vector<std::shared_ptr<Zombie>>& zombies;
+    const LaneIndex& lanes;
+    float max_x;
+    // Zombies looked at by nearest_ahead, for EngineStats.
+    mutable int scanned = 0;
+
+    // Nearest live zombie in y's lane that is strictly ahead of x, or nullptr.
+    Zombie* nearest_ahead(float x, float y) const {
+        int i = lanes.nearest_after(lanes.lane_of(y), x, max_x, [&](int i) { scanned++; return !zombies[i]->to_delete; });
+        return i >= 0 ? zombies[i].get() : nullptr;
+    }
+};
+
 class Plant : public Entity {
 public:
     PlantType type;
@@ -164,6 +180,7 @@ public:
     }
     virtual int produce_money() { return 0; }
     virtual void update_logic(float dt, const std::vector<std::shared_ptr<Zombie>>& z,
+        const TargetTable& targets,
         std::vector<std::shared_ptr<Projectile>>& p,
         std::vector<VisualEffect>& e,
         std::vector<int>& sounds) = 0;
@@ -176,30 +193,24 @@ public:
 class Peashooter : public Plant {
 public:
     Peashooter(float x, float y) : Plant(PlantType::Peashooter, x, y) { cost = 100; action_cooldown = 1.5f; }
-    void update_logic(float dt, const std::vector<std::shared_ptr<Zombie>>& zombies,
+    void update_logic(float dt, const std::vector<std::shared_ptr<Zombie>>&, const TargetTable& targets,
         std::vector<std::shared_ptr<Projectile>>& projectiles,
         std::vector<VisualEffect>&, std::vector<int>&) override {
         if (cooldown_timer > 0) return;
-        int my_row = (int)(pos.y / 180.0f);
 
-        for (const auto& z : zombies) {
-            if (z->to_delete) continue;
-            int zombie_row = (int)(z->pos.y / 180.0f);
+        const Zombie* z = targets.nearest_ahead(pos.x, pos.y);
+        if (!z) return;
 
-            if (my_row == zombie_row && z->pos.x > pos.x && z->pos.x < 1500.0f) {
-                auto proj = std::make_shared<Projectile>(pos.x + 60, pos.y - 25, Vec(z->pos.x, pos.y - 25), 500.0f, 20.0f);
-                projectiles.push_back(proj);
-                cooldown_timer = action_cooldown;
-                break;
-            }
-        }
+        auto proj = std::make_shared<Projectile>(pos.x + 60, pos.y - 25, Vec(z->pos.x, pos.y - 25), 500.0f, 20.0f);
+        projectiles.push_back(proj);
+        cooldown_timer = action_cooldown;
     }
 };
 
 class Sunflower : public Plant {
 public:
     Sunflower(float x, float y) : Plant(PlantType::Sunflower, x, y) { cost = 50; action_cooldown = 10.0f; cooldown_timer = 5.0f; }
-    void update_logic(float dt, const std::vector<std::shared_ptr<Zombie>>& z,
+    void update_logic(float dt, const std::vector<std::shared_ptr<Zombie>>& z, const TargetTable&,
         std::vector<std::shared_ptr<Projectile>>& p,
         std::vector<VisualEffect>& e,
         std::vector<int>& sounds) override {}
@@ -212,7 +223,7 @@ public:
 class WallNut : public Plant {
 public:
     WallNut(float x, float y) : Plant(PlantType::WallNut, x, y) { cost = 50; health = max_health = 2000.0f; }
-    void update_logic(float dt, const std::vector<std::shared_ptr<Zombie>>& z,
+    void update_logic(float dt, const std::vector<std::shared_ptr<Zombie>>& z, const TargetTable&,
         std::vector<std::shared_ptr<Projectile>>& p,
         std::vector<VisualEffect>& e,
         std::vector<int>& sounds) override {}
@@ -224,7 +235,7 @@ public:
     PotatoMine(float x, float y) : Plant(PlantType::PotatoMine, x, y), is_armed(false) {
         cost = 25; action_cooldown = 12.0f; cooldown_timer = action_cooldown;
     }
-    void update_logic(float dt, const std::vector<std::shared_ptr<Zombie>>& zombies,
+    void update_logic(float dt, const std::vector<std::shared_ptr<Zombie>>& zombies, const TargetTable&,
         std::vector<std::shared_ptr<Projectile>>&, std::vector<VisualEffect>& effects,
         std::vector<int>& sounds) override {
         if (!is_armed) {
@@ -257,7 +268,7 @@ public:
         action_cooldown = 1.2f;
         cooldown_timer = action_cooldown;
     }
-    void update_logic(float dt, const std::vector<std::shared_ptr<Zombie>>& zombies,
+    void update_logic(float dt, const std::vector<std::shared_ptr<Zombie>>& zombies, const TargetTable&,
         std::vector<std::shared_ptr<Projectile>>&, std::vector<VisualEffect>& effects,
         std::vector<int>& sounds) override {
         if (cooldown_timer <= 0) {
@@ -274,7 +285,7 @@ public:
 class IceLettuce : public Plant {
 public:
     IceLettuce(float x, float y) : Plant(PlantType::IceLettuce, x, y) { cost = 0; health = 50; }
-    void update_logic(float dt, const std::vector<std::shared_ptr<Zombie>>& zombies,
+    void update_logic(float dt, const std::vector<std::shared_ptr<Zombie>>& zombies, const TargetTable&,
         std::vector<std::shared_ptr<Projectile>>&, std::vector<VisualEffect>& effects,
         std::vector<int>& sounds) override {
         for (const auto& z : zombies) {
@@ -283,6 +294,7 @@ public:
                 z->take_damage(20.0f);
                 z->apply_freeze(10.0f);
                 effects.push_back({ pos.x, pos.y, 2, 0.5f });
+                sounds.push_back((int)GameSound::Freeze);
                 this->to_delete = true;
                 break;
             }
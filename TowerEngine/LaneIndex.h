@@ -0,0 +1,72 @@
+#pragma once
+#include <vector>
+#include <memory>
+#include <algorithm>
+#include <climits>
+#include <cmath>
+
+// Entities bucketed by lane (row) and sorted by x inside each lane.
+// Entries keep the entity's index in the owner's vector, so a query can return the
+// match with the lowest index -- the same one a plain front-to-back scan would find.
+class LaneIndex {
+public:
+    struct Entry { float x; int index; };
+
+    template <class T>
+    void build(const std::vector<std::shared_ptr<T>>& items, float lane_h, int lane_count) {
+        tile_h = lane_h;
+        lanes.resize(lane_count);
+        for (auto& l : lanes) l.clear();
+
+        for (int i = 0; i < (int)items.size(); i++) {
+            const auto& e = items[i];
+            if (e->to_delete) continue;
+            int lane = lane_of(e->pos.y);
+            if (lane < 0 || lane >= lane_count) continue;
+            lanes[lane].push_back({ e->pos.x, i });
+        }
+        for (auto& l : lanes) {
+            std::sort(l.begin(), l.end(), [](const Entry& a, const Entry& b) {
+                return a.x < b.x || (a.x == b.x && a.index < b.index);
+            });
+        }
+    }
+
+    int lane_of(float y) const { return (int)(y / tile_h); }
+    int lane_count() const { return (int)lanes.size(); }
+
+    // Lanes that may hold an entity whose y is within `reach` of y, clamped to the map.
+    int first_lane(float y, float reach) const { return std::max(0, (int)std::floor((y - reach) / tile_h)); }
+    int last_lane(float y, float reach) const { return std::min(lane_count() - 1, (int)std::floor((y + reach) / tile_h)); }
+
+    // Lowest index below `limit` among entries of `lane` with x in [x_min, x_max] that satisfy pred,
+    // or -1. The x window only narrows the search; pred must still do the exact check.
+    template <class Pred>
+    int first_in_range(int lane, float x_min, float x_max, Pred pred, int limit = INT_MAX) const {
+        if (lane < 0 || lane >= lane_count()) return -1;
+        const auto& l = lanes[lane];
+        auto it = std::lower_bound(l.begin(), l.end(), x_min, [](const Entry& e, float v) { return e.x < v; });
+        int best = -1;
+        for (; it != l.end() && it->x <= x_max; ++it) {
+            if (it->index >= limit || (best >= 0 && it->index >= best)) continue;
+            if (pred(it->index)) best = it->index;
+        }
+        return best;
+    }
+
+    // First entry in x order with x in (x, x_max] that satisfies pred, or -1.
+    template <class Pred>
+    int nearest_after(int lane, float x, float x_max, Pred pred) const {
+        if (lane < 0 || lane >= lane_count()) return -1;
+        const auto& l = lanes[lane];
+        auto it = std::upper_bound(l.begin(), l.end(), x, [](float v, const Entry& e) { return v < e.x; });
+        for (; it != l.end() && it->x <= x_max; ++it) {
+            if (pred(it->index)) return it->index;
+        }
+        return -1;
+    }
+
+private:
+    float tile_h = 1.0f;
+    std::vector<std::vector<Entry>> lanes;
+};
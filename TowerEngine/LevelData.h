@@ -0,0 +1,31 @@
+#pragma once
+#include <string>
+#include <vector>
+#include <nlohmann/json.hpp>
+#include "WaveScheduler.h"
+
+using json = nlohmann::json;
+
+// A level file after parsing. GameEngine keeps one per level id, so restarts do not touch the disk.
+struct LevelData {
+    json settings;
+    std::vector<WaveEvent> waves;
+    std::string wave_stream;
+    json wave_generator;
+
+    static bool parse(const json& j, LevelData& out) {
+        if (!j.is_object() || !j.contains("settings") || !j["settings"].is_object()) return false;
+        try {
+            out.settings = j["settings"];
+            out.waves.clear();
+            for (const auto& w : j.value("waves", json::array())) {
+                float t = w["time"]; int r = w["row"]; int type_id = w["type"];
+                out.waves.push_back({ t, static_cast<ZombieType>(type_id), r });
+            }
+            out.wave_stream = j.value("wave_stream", std::string());
+            out.wave_generator = j.value("wave_generator", json());
+        }
+        catch (const json::exception&) { return false; }
+        return true;
+    }
+};
@@ -0,0 +1,74 @@
+#pragma once
+#include <vector>
+#include <string>
+#include <cstring>
+#include <cstdint>
+#include <type_traits>
+
+// Flat binary buffers for GameEngine::save_state / restore_state. Values are copied byte
+// for byte, so a buffer is only meant for the same build of the engine that wrote it.
+class StateWriter {
+public:
+    std::vector<char> data;
+
+    template <class T>
+    void put(const T& v) {
+        static_assert(std::is_trivially_copyable<T>::value, "put() copies raw bytes");
+        const char* p = reinterpret_cast<const char*>(&v);
+        data.insert(data.end(), p, p + sizeof(T));
+    }
+
+    template <class T>
+    void put_vector(const T* items, size_t n) {
+        static_assert(std::is_trivially_copyable<T>::value, "put_vector() copies raw bytes");
+        put((uint32_t)n);
+        const char* p = reinterpret_cast<const char*>(items);
+        data.insert(data.end(), p, p + n * sizeof(T));
+    }
+    template <class T>
+    void put_vector(const std::vector<T>& v) { put_vector(v.data(), v.size()); }
+
+    void put_string(const std::string& s) { put_vector(s.data(), s.size()); }
+};
+
+// Reads what StateWriter wrote. A read past the end (or a size that cannot fit) clears ok
+// and returns zeroes from then on, so callers check ok once at the end.
+class StateReader {
+    const char* p;
+    const char* end;
+
+    void read(void* out, size_t n) {
+        if (!ok || (size_t)(end - p) < n) { ok = false; return; }
+        std::memcpy(out, p, n);
+        p += n;
+    }
+
+public:
+    bool ok = true;
+
+    StateReader(const char* data, size_t len) : p(data), end(data + len) {}
+
+    template <class T>
+    T get() {
+        static_assert(std::is_trivially_copyable<T>::value, "get() copies raw bytes");
+        T v{};
+        read(&v, sizeof(T));
+        return v;
+    }
+
+    template <class T>
+    void get_vector(std::vector<T>& v) {
+        uint32_t n = get<uint32_t>();
+        if (!ok || n > (size_t)(end - p) / sizeof(T)) { ok = false; v.clear(); return; }
+        v.resize(n);
+        read(v.data(), n * sizeof(T));
+    }
+
+    std::string get_string() {
+        std::vector<char> chars;
+        get_vector(chars);
+        return std::string(chars.begin(), chars.end());
+    }
+
+    bool done() const { return ok && p == end; }
+};
@@ -21,4 +21,14 @@ struct Vec {
     static float distance(const Vec& a, const Vec& b) {
         return (a - b).length();
     }
+
+    // Distance from p to the closest point of the segment a-b.
+    static float segment_distance(const Vec& a, const Vec& b, const Vec& p) {
+        Vec ab = b - a;
+        float len2 = ab.x * ab.x + ab.y * ab.y;
+        if (len2 <= 0) return distance(a, p);
+        float t = ((p.x - a.x) * ab.x + (p.y - a.y) * ab.y) / len2;
+        t = t < 0 ? 0 : (t > 1 ? 1 : t);
+        return distance(a + ab * t, p);
+    }
 };
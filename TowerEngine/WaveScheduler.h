@@ -0,0 +1,180 @@
+#pragma once
+#include <vector>
+#include <memory>
+#include <algorithm>
+#include <fstream>
+#include <sstream>
+#include <string>
+#include <random>
+#include <cstdint>
+#include "Enums.h"
+#include "StateBuffer.h"
+
+struct WaveEvent { float time; ZombieType type; int row; };
+
+// Hands out spawns one at a time, in non-decreasing time order.
+// save() writes a kind tag and the source's position; WaveSource::load rebuilds it.
+class WaveSource {
+public:
+    enum Kind : uint8_t { List, Stream, Ramp };
+    virtual ~WaveSource() = default;
+    virtual bool next(WaveEvent& out) = 0;
+    virtual void save(StateWriter& w) const = 0;
+    static std::unique_ptr<WaveSource> load(StateReader& r);
+};
+
+// The level's "waves" array: sorted once, then read with a cursor.
+class ListWaveSource : public WaveSource {
+    std::vector<WaveEvent> events;
+    size_t cursor = 0;
+public:
+    explicit ListWaveSource(std::vector<WaveEvent> list) : events(std::move(list)) {
+        std::stable_sort(events.begin(), events.end(), [](const auto& a, const auto& b) { return a.time < b.time; });
+    }
+    bool next(WaveEvent& out) override {
+        if (cursor >= events.size()) return false;
+        out = events[cursor++];
+        return true;
+    }
+    // Only the spawns still to come.
+    void save(StateWriter& w) const override {
+        w.put(List);
+        w.put_vector(events.data() + cursor, events.size() - cursor);
+    }
+};
+
+// Reads "time type row" lines from a text file only when they are due.
+// Empty lines and lines starting with '#' are skipped.
+class StreamWaveSource : public WaveSource {
+    std::string path;
+    mutable std::ifstream in;
+public:
+    explicit StreamWaveSource(const std::string& path) : path(path), in(path) {}
+    // The file is reopened and read on from the saved offset (-1 once it has run out).
+    StreamWaveSource(const std::string& path, int64_t offset) : StreamWaveSource(path) {
+        if (offset < 0) in.setstate(std::ios::failbit);
+        else in.seekg(offset);
+    }
+    bool next(WaveEvent& out) override {
+        std::string line;
+        while (std::getline(in, line)) {
+            if (line.empty() || line[0] == '#') continue;
+            std::istringstream ls(line);
+            float t; int type, row;
+            if (ls >> t >> type >> row) { out = { t, static_cast<ZombieType>(type), row }; return true; }
+        }
+        return false;
+    }
+    void save(StateWriter& w) const override {
+        w.put(Stream);
+        w.put_string(path);
+        w.put((int64_t)(in ? (std::streamoff)in.tellg() : -1));
+    }
+};
+
+// Endless spawns: one every `interval` seconds from `t`, shrinking by `ramp` down to
+// `min_interval`, with random types and rows. `count` of 0 never stops.
+class RampWaveSource : public WaveSource {
+public:
+    float t = 0, interval = 5, min_interval = 5, ramp = 1;
+    int count = 0, made = 0;
+    std::vector<int> types, rows;
+    std::mt19937 rng;
+
+    bool next(WaveEvent& out) override {
+        if ((count > 0 && made >= count) || types.empty() || rows.empty()) return false;
+        out = { t, static_cast<ZombieType>(types[rng() % types.size()]), rows[rng() % rows.size()] };
+        made++;
+        t += interval;
+        interval = std::max(min_interval, interval * ramp);
+        return true;
+    }
+    void save(StateWriter& w) const override {
+        w.put(Ramp);
+        w.put(t); w.put(interval); w.put(min_interval); w.put(ramp); w.put(count); w.put(made);
+        w.put_vector(types); w.put_vector(rows); w.put(rng);
+    }
+};
+
+inline std::unique_ptr<WaveSource> WaveSource::load(StateReader& r) {
+    switch (r.get<Kind>()) {
+    case List: {
+        std::vector<WaveEvent> events;
+        r.get_vector(events);
+        return std::make_unique<ListWaveSource>(std::move(events));
+    }
+    case Stream: {
+        std::string path = r.get_string();
+        int64_t offset = r.get<int64_t>();
+        return std::make_unique<StreamWaveSource>(path, offset);
+    }
+    case Ramp: {
+        auto src = std::make_unique<RampWaveSource>();
+        src->t = r.get<float>(); src->interval = r.get<float>(); src->min_interval = r.get<float>(); src->ramp = r.get<float>();
+        src->count = r.get<int>(); src->made = r.get<int>();
+        r.get_vector(src->types); r.get_vector(src->rows);
+        src->rng = r.get<std::mt19937>();
+        return src;
+    }
+    }
+    r.ok = false;
+    return nullptr;
+}
+
+// Merges any number of sources. Only the next spawn of each source is held in memory,
+// in a min-heap ordered by time, so taking a spawn is O(log sources).
+class WaveScheduler {
+    struct Head { WaveEvent ev; size_t source; };
+    std::vector<std::unique_ptr<WaveSource>> sources;
+    std::vector<Head> heap;
+
+    static bool later(const Head& a, const Head& b) {
+        return a.ev.time > b.ev.time || (a.ev.time == b.ev.time && a.source > b.source);
+    }
+
+    void pull(size_t i) {
+        WaveEvent ev;
+        if (!sources[i]->next(ev)) return;
+        heap.push_back({ ev, i });
+        std::push_heap(heap.begin(), heap.end(), later);
+    }
+
+public:
+    void clear() { sources.clear(); heap.clear(); }
+
+    void add(std::unique_ptr<WaveSource> src) {
+        sources.push_back(std::move(src));
+        pull(sources.size() - 1);
+    }
+
+    bool empty() const { return heap.empty(); }
+
+    void save(StateWriter& w) const {
+        w.put((uint32_t)sources.size());
+        for (const auto& s : sources) s->save(w);
+        w.put_vector(heap);
+    }
+
+    bool load(StateReader& r) {
+        clear();
+        uint32_t n = r.get<uint32_t>();
+        for (uint32_t i = 0; i < n && r.ok; i++) {
+            auto src = WaveSource::load(r);
+            if (src) sources.push_back(std::move(src));
+        }
+        r.get_vector(heap);
+        for (const auto& h : heap) if (h.source >= sources.size()) r.ok = false;
+        return r.ok;
+    }
+
+    template <class Spawn>
+    void pop_due(float now, Spawn&& spawn) {
+        while (!heap.empty() && heap.front().ev.time <= now) {
+            std::pop_heap(heap.begin(), heap.end(), later);
+            Head h = heap.back();
+            heap.pop_back();
+            spawn(h.ev);
+            pull(h.source);
+        }
+    }
+};
@@ -4,13 +4,76 @@
 
 struct C_Zombie { float x, y; int type; float health, max_health, speed; int id; int armor_state; int flags; };
 struct C_Plant { float x, y; int type; float health, max_health, timer, max_timer; };
-struct C_Projectile { float x, y; int is_frozen; };
+struct C_Projectile { float x, y; int is_frozen; int id; };
 struct C_Effect { float x, y; int type; float timer; };
 
+struct C_Snapshot {
+    C_Zombie* zombies; int zombie_capacity; int zombie_count;
+    C_Plant* plants; int plant_capacity; int plant_count;
+    C_Projectile* projectiles; int projectile_capacity; int projectile_count;
+    C_Effect* effects; int effect_capacity; int effect_count;
+    float* card_cooldowns; int card_capacity; int card_count;
+    int* sounds; int sound_capacity; int sound_count;
+    int money; int lives; int level_complete; int game_over;
+};
+
+static void fill_zombie(const Zombie& z, C_Zombie* out) {
+    out->x = z.pos.x; out->y = z.pos.y; out->type = (int)z.type;
+    out->health = z.health; out->max_health = z.max_health;
+    out->speed = z.current_speed; out->id = z.id;
+
+    out->armor_state = z.armor_state;
+
+    int flags = 0;
+    if (z.has_arm) flags |= 1;
+    if (z.has_newspaper) flags |= 2;
+    if (z.freeze_timer > 0) flags |= 8;
+
+    out->flags = flags;
+}
+
+static void fill_plant(const Plant& p, C_Plant* out) {
+    out->x = p.pos.x; out->y = p.pos.y; out->type = (int)p.type;
+    out->health = p.health; out->max_health = p.max_health;
+    out->timer = p.cooldown_timer; out->max_timer = p.action_cooldown;
+}
+
+static void fill_projectile(const Projectile& p, C_Projectile* out) {
+    out->x = p.pos.x; out->y = p.pos.y; out->is_frozen = 0; out->id = p.id;
+}
+
+static void fill_effect(const VisualEffect& e, C_Effect* out) {
+    out->x = e.x; out->y = e.y; out->type = e.type; out->timer = e.timer;
+}
+
 EXPORT GameEngine* Engine_Create() { return new GameEngine(); }
 EXPORT void Engine_Destroy(GameEngine* engine) { if (engine) delete engine; }
-EXPORT void Engine_LoadLevel(GameEngine* engine, int lvl) { if (engine) engine->load_level(lvl); }
+EXPORT bool Engine_LoadLevel(GameEngine* engine, int lvl) { return engine ? engine->load_level(lvl) : false; }
+EXPORT bool Engine_LoadLevelFromMemory(GameEngine* engine, const char* text, int len) {
+    return engine && len >= 0 ? engine->load_level_from_memory(text, len) : false;
+}
 EXPORT void Engine_Update(GameEngine* engine, float dt) { if (engine) engine->update(dt); }
+EXPORT void Engine_SetSeed(GameEngine* engine, unsigned int seed) { if (engine) engine->set_seed(seed); }
+EXPORT unsigned long long Engine_GetStateHash(GameEngine* engine) { return engine ? engine->state_hash() : 0; }
+// Writes the whole engine state to out if it fits. Returns its size either way, so
+// passing capacity 0 first tells the caller how much to allocate.
+EXPORT int Engine_SaveState(GameEngine* engine, char* out, int capacity) {
+    if (!engine) return 0;
+    StateWriter w;
+    engine->save_state(w);
+    if (out && capacity >= (int)w.data.size()) std::memcpy(out, w.data.data(), w.data.size());
+    return (int)w.data.size();
+}
+EXPORT bool Engine_RestoreState(GameEngine* engine, const char* data, int len) {
+    return engine && data && len >= 0 ? engine->restore_state(data, len) : false;
+}
+// A separate engine in the same state; free it with Engine_Destroy.
+EXPORT GameEngine* Engine_Clone(GameEngine* engine) { return engine ? engine->clone() : nullptr; }
+EXPORT bool Engine_GetStats(GameEngine* engine, EngineStats* out) {
+    if (!engine || !out) return false;
+    *out = engine->get_stats();
+    return true;
+}
 EXPORT void Engine_TryBuildPlant(GameEngine* engine, float x, float y, int card) { if (engine) engine->try_build_plant(x, y, card); }
 EXPORT void Engine_RemovePlant(GameEngine* engine, float x, float y) { if (engine) engine->remove_plant_at(x, y); }
 
@@ -18,51 +81,40 @@ EXPORT int Engine_GetMoney(GameEngine* engine) { return engine ? engine->get_mon
 EXPORT int Engine_GetLives(GameEngine* engine) { return engine ? engine->get_lives() : 0; }
 EXPORT int Engine_GetMapWidth(GameEngine* engine) { return engine ? engine->get_map_width() : 0; }
 EXPORT int Engine_GetMapHeight(GameEngine* engine) { return engine ? engine->get_map_height() : 0; }
+EXPORT int Engine_GetActiveRows(GameEngine* engine, int* out, int capacity) {
+    if (!engine) return 0;
+    const auto& rows = engine->get_active_rows();
+    for (int i = 0; out && i < capacity && i < (int)rows.size(); i++) out[i] = rows[i];
+    return (int)rows.size();
+}
 EXPORT bool Engine_IsLevelComplete(GameEngine* engine) { return engine ? engine->is_level_complete() : false; }
 EXPORT bool Engine_IsGameOver(GameEngine* engine) { return engine ? engine->is_game_over() : false; }
 
 EXPORT int Engine_GetZombieCount(GameEngine* engine) { return engine ? (int)engine->get_zombies().size() : 0; }
 EXPORT bool Engine_GetZombieData(GameEngine* engine, int i, C_Zombie* out) {
     if (!engine || !out || i < 0 || i >= engine->get_zombies().size()) return false;
-    auto z = engine->get_zombies()[i];
-    out->x = z->pos.x; out->y = z->pos.y; out->type = (int)z->type;
-    out->health = z->health; out->max_health = z->max_health;
-    out->speed = z->current_speed; out->id = z->id;
-
-    out->armor_state = z->armor_state;
-
-    int flags = 0;
-    if (z->has_arm) flags |= 1;
-    if (z->has_newspaper) flags |= 2;
-    if (z->freeze_timer > 0) flags |= 8;
-
-    out->flags = flags;
+    fill_zombie(*engine->get_zombies()[i], out);
     return true;
 }
 
 EXPORT int Engine_GetPlantCount(GameEngine* engine) { return engine ? (int)engine->get_plants().size() : 0; }
 EXPORT bool Engine_GetPlantData(GameEngine* engine, int i, C_Plant* out) {
     if (!engine || !out || i < 0 || i >= engine->get_plants().size()) return false;
-    auto p = engine->get_plants()[i];
-    out->x = p->pos.x; out->y = p->pos.y; out->type = (int)p->type;
-    out->health = p->health; out->max_health = p->max_health;
-    out->timer = p->cooldown_timer; out->max_timer = p->action_cooldown;
+    fill_plant(*engine->get_plants()[i], out);
     return true;
 }
 
 EXPORT int Engine_GetProjectileCount(GameEngine* engine) { return engine ? (int)engine->get_projectiles().size() : 0; }
 EXPORT bool Engine_GetProjectileData(GameEngine* engine, int i, C_Projectile* out) {
     if (!engine || !out || i < 0 || i >= engine->get_projectiles().size()) return false;
-    auto p = engine->get_projectiles()[i];
-    out->x = p->pos.x; out->y = p->pos.y;
+    fill_projectile(*engine->get_projectiles()[i], out);
     return true;
 }
 
 EXPORT int Engine_GetEffectCount(GameEngine* engine) { return engine ? (int)engine->get_effects().size() : 0; }
 EXPORT bool Engine_GetEffectData(GameEngine* engine, int i, C_Effect* out) {
     if (!engine || !out || i < 0 || i >= engine->get_effects().size()) return false;
-    auto e = engine->get_effects()[i];
-    out->x = e.x; out->y = e.y; out->type = e.type; out->timer = e.timer;
+    fill_effect(engine->get_effects()[i], out);
     return true;
 }
 
@@ -72,4 +124,46 @@ EXPORT int Engine_GetSoundCount(GameEngine* engine) { return engine ? (int)engin
 EXPORT int Engine_GetSoundData(GameEngine* engine, int i) {
     if (!engine || i < 0 || i >= engine->get_sounds().size()) return 0;
     return engine->get_sounds()[i];
+}
+
+// Fills all caller-owned arrays in one call. Counts always report the full sizes;
+// returns false if any array was too small, so the caller can grow it and call again.
+EXPORT bool Engine_GetSnapshot(GameEngine* engine, C_Snapshot* out) {
+    if (!engine || !out) return false;
+    bool fits = true;
+
+    const auto& zombies = engine->get_zombies();
+    out->zombie_count = (int)zombies.size();
+    if (out->zombie_count > out->zombie_capacity) fits = false;
+    else for (int i = 0; i < out->zombie_count; i++) fill_zombie(*zombies[i], &out->zombies[i]);
+
+    const auto& plants = engine->get_plants();
+    out->plant_count = (int)plants.size();
+    if (out->plant_count > out->plant_capacity) fits = false;
+    else for (int i = 0; i < out->plant_count; i++) fill_plant(*plants[i], &out->plants[i]);
+
+    const auto& projectiles = engine->get_projectiles();
+    out->projectile_count = (int)projectiles.size();
+    if (out->projectile_count > out->projectile_capacity) fits = false;
+    else for (int i = 0; i < out->projectile_count; i++) fill_projectile(*projectiles[i], &out->projectiles[i]);
+
+    const auto& effects = engine->get_effects();
+    out->effect_count = (int)effects.size();
+    if (out->effect_count > out->effect_capacity) fits = false;
+    else for (int i = 0; i < out->effect_count; i++) fill_effect(effects[i], &out->effects[i]);
+
+    out->card_count = engine->get_card_count();
+    if (out->card_count > out->card_capacity) fits = false;
+    else for (int i = 0; i < out->card_count; i++) out->card_cooldowns[i] = engine->get_card_cooldown_pct(i);
+
+    const auto& sounds = engine->get_sounds();
+    out->sound_count = (int)sounds.size();
+    if (out->sound_count > out->sound_capacity) fits = false;
+    else for (int i = 0; i < out->sound_count; i++) out->sounds[i] = sounds[i];
+
+    out->money = engine->get_money();
+    out->lives = engine->get_lives();
+    out->level_complete = engine->is_level_complete();
+    out->game_over = engine->is_game_over();
+    return fits;
 }
\ No newline at end of file
@@ -1,9 +1,164 @@
 import pygame
+import hashlib
+import io
+import json
+import mmap
 import os
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 import config as cfg
 
+ATLAS_VERSION = 1
+
+
+def atlas_sources(jobs):
+    # What an atlas is built from: every image file a group uses, with its mtime, size and
+    # target sizes. build_atlas.py stores this in the index; AssetManager compares it.
+    out = {}
+    for kind, key, names, outputs in jobs:
+        if kind != "img": continue
+        for n in names:
+            p = f"assets/{n}"
+            if not os.path.exists(p): continue
+            st = os.stat(p)
+            entry = out.setdefault(n, [st.st_mtime_ns, st.st_size, []])
+            entry[2].extend(list(size) if size else None for _, size in outputs)
+            break
+    return out
+
+
+class TransformCache:
+    """Scaled/rotated copies of loaded images, keyed by (image key, size, angle).
+
+    Angles are rounded to cfg.TRANSFORM_ANGLE_STEP degrees so a swaying sprite only
+    ever needs a handful of frames. The least recently used copies are dropped once
+    their pixels take more than cfg.TRANSFORM_CACHE_MB.
+    """
+    def __init__(self, max_mb=cfg.TRANSFORM_CACHE_MB, angle_step=cfg.TRANSFORM_ANGLE_STEP):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.angle_step = angle_step
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def quantize(self, angle):
+        return round(angle / self.angle_step) * self.angle_step if angle else 0.0
+
+    def get(self, key, img, size=None, angle=0.0):
+        angle = self.quantize(angle)
+        if size == img.get_size(): size = None
+        if size is None and not angle: return img
+
+        k = (key, size, angle)
+        out = self.entries.get(k)
+        if out is not None:
+            self.entries.move_to_end(k)
+            self.hits += 1
+            return out
+
+        self.misses += 1
+        out = img
+        if size: out = pygame.transform.scale(out, size)
+        if angle: out = pygame.transform.rotate(out, angle)
+        self.entries[k] = out
+        self.bytes += self._size(out)
+        while self.bytes > self.max_bytes and len(self.entries) > 1:
+            _, old = self.entries.popitem(last=False)
+            self.bytes -= self._size(old)
+        return out
+
+    def clear(self):
+        self.entries.clear(); self.bytes = 0
+
+    @staticmethod
+    def _size(img):
+        return img.get_width() * img.get_height() * img.get_bytesize()
+
+
+class TextCache:
+    """Rendered text surfaces keyed by (font, text, color), least recently used dropped first."""
+    def __init__(self, max_items=cfg.TEXT_CACHE_SIZE):
+        self.max_items = max_items
+        self.entries = OrderedDict()
+        self.misses = 0
+
+    def render(self, font, text, color):
+        k = (font, text, tuple(color))
+        out = self.entries.get(k)
+        if out is not None:
+            self.entries.move_to_end(k)
+            return out
+        self.misses += 1
+        out = font.render(text, True, color)
+        self.entries[k] = out
+        if len(self.entries) > self.max_items: self.entries.popitem(last=False)
+        return out
+
+
+class SurfacePool:
+    """Reusable overlay and scratch surfaces, so the draw path does not allocate per frame.
+
+    overlay() returns a surface filled once with a solid color and kept by (size, flags,
+    color, alpha). scratch() hands out surfaces by (size, flags) for drawing into; each one
+    stays taken until release() is called at the start of the next frame, so several
+    scratch surfaces of the same size can be in flight within one frame.
+    """
+    def __init__(self):
+        self.overlays = {}
+        self.free = {}
+        self.taken = []
+        self.allocs = 0
+
+    def overlay(self, size, color, flags=0, alpha=None):
+        k = (tuple(size), flags, tuple(color), alpha)
+        s = self.overlays.get(k)
+        if s is None:
+            s = pygame.Surface(k[0], flags)
+            self.allocs += 1
+            if alpha is not None: s.set_alpha(alpha)
+            s.fill(color)
+            self.overlays[k] = s
+        return s
+
+    def scratch(self, size, flags=0):
+        k = (tuple(size), flags)
+        stack = self.free.get(k)
+        if stack: s = stack.pop()
+        else: s = pygame.Surface(k[0], flags); self.allocs += 1
+        self.taken.append((k, s))
+        return s
+
+    def release(self):
+        for k, s in self.taken:
+            self.free.setdefault(k, []).append(s)
+        self.taken.clear()
+
+    def clear(self):
+        self.overlays.clear(); self.free.clear(); self.taken.clear()
+
+
 class AssetManager:
-    def __init__(self, width, height):
+    """Images, sounds and fonts, loaded in groups.
+
+    "menu" is loaded in the constructor. The other groups ("level_select", "game",
+    "level_N") can be prefetched: their files are decoded and scaled on a thread
+    pool, and poll() stores the finished ones from the main thread. load_group()
+    waits for a group to be complete. progress(group, done, total) is called as
+    files of a group are stored.
+
+    Scaled images are also written to cfg.ASSET_CACHE_DIR as raw pixel blobs, one
+    folder per version/resolution/display depth. A blob is reused while its source
+    file has the same content hash, so warm starts map the blob instead of decoding
+    and scaling the PNG again.
+
+    Every stored image goes through a registry keyed by (content hash, size, kind):
+    the same file at the same size is decoded once per group and converted once, and
+    all keys that use it share one Surface. memory_report() gives the footprint.
+    """
+    CACHE_VERSION = 2
+    def __init__(self, width, height, progress=None):
         self.W = width
         self.H = height
         self.imgs = {}
@@ -11,12 +166,96 @@ class AssetManager:
         self.zombie_sounds = []
         self.music_files = {}
         self.fonts = {}
-        
-        print("\n=== START LOADING ASSETS ===")
+        self.transforms = TransformCache()
+        self.texts = TextCache()
+        self.surfaces = SurfacePool()
+        self.zombie_lut = []
+        self.plant_lut = []
+
+        self.progress = progress
+        self.pool = ThreadPoolExecutor(cfg.ASSET_THREADS)
+        self.pending = {}
+        self.loaded_groups = set()
+        self.atlas_regions = {}
+        self.registry = {}
+        self.requested = set()
+
+        self._open_cache()
         self._load_fonts()
-        self._load_audio()
-        self._load_images()
-        print("=== ASSETS LOADING FINISHED ===\n")
+        self._load_music()
+        self.load_group("menu")
+
+    # Sprite lookup tables, built once so drawing an entity is a single list index.
+    # zombie_lut[zombie_index(type, armor_state, flags)] -> Surface or None
+    # plant_lut[plant_index(type, state)] -> image key or None (plants keep the key for the sway cache)
+    ZOMBIE_TYPES, ARMOR_STATES, ZOMBIE_FLAGS = 8, 4, 16
+    PLANT_STATES = 3
+
+    @staticmethod
+    def zombie_index(ztype, armor, flags):
+        return (ztype * AssetManager.ARMOR_STATES + armor) * AssetManager.ZOMBIE_FLAGS + (flags & 15)
+
+    @staticmethod
+    def plant_index(ptype, state):
+        return ptype * AssetManager.PLANT_STATES + state
+
+    def _build_sprite_luts(self):
+        self.zombie_lut = [None] * (self.ZOMBIE_TYPES * self.ARMOR_STATES * self.ZOMBIE_FLAGS)
+        for t in range(self.ZOMBIE_TYPES):
+            for a in range(self.ARMOR_STATES):
+                for f in range(self.ZOMBIE_FLAGS):
+                    self.zombie_lut[self.zombie_index(t, a, f)] = self.imgs.get(self._zombie_key(t, a, f))
+
+        self.plant_lut = [None] * (len(cfg.PLANT_NAMES) * self.PLANT_STATES)
+        for t in range(len(cfg.PLANT_NAMES)):
+            for s in range(self.PLANT_STATES):
+                self.plant_lut[self.plant_index(t, s)] = self._plant_key(t, s)
+
+    def _zombie_key(self, ztype, armor, flags):
+        suffix = "frozen" if flags & 8 else "norm"
+        has_arm, has_paper = flags & 1, flags & 2
+        ak = f"zombie_{ztype}_{suffix}"
+        if ztype == 1:
+            if armor == 1: ak = f"zombie_1_armor1_{suffix}"
+            elif armor == 2: ak = f"zombie_1_armor2_{suffix}"
+            else: ak = f"zombie_0_{suffix}"
+        elif ztype == 2:
+            if armor == 1: ak = f"zombie_2_armor1_{suffix}"
+            elif armor >= 2: ak = f"zombie_2_armor2_{suffix}"
+            else: ak = f"zombie_0_{suffix}"
+        elif ztype == 3:
+            if armor == 0: ak = f"zombie_3_nohelm_{suffix}" if has_arm else f"zombie_3_nohelm_noarm_{suffix}"
+        elif ztype == 4:
+            if not has_paper: ak = f"zombie_4_nopaper_{suffix}" if has_arm else f"zombie_4_nopaper_noarm_{suffix}"
+        elif ztype != 6:
+            if not has_arm: ak = f"zombie_{ztype}_noarm_{suffix}"
+
+        if ak not in self.imgs:
+            ak = f"zombie_{ztype}_{suffix}" if f"zombie_{ztype}_{suffix}" in self.imgs else f"zombie_{ztype}_norm"
+        return ak
+
+    def _plant_key(self, ptype, state):
+        # Wall-nut: 0/1/2 = healthy/cracked/badly cracked. Potato Mine: 0/1/2 = arming/armed/armed blink.
+        keys = [f"plant_{ptype}"]
+        if ptype == 2: keys = [f"plant_2_s{i}" for i in range(state + 1, 0, -1)] + keys
+        if ptype == 3 and state >= 1: keys = ["plant_3_armed"] + keys
+        if ptype == 3 and state == 2: keys = ["plant_3_blink"] + keys
+        for k in keys:
+            if k in self.imgs: return k
+        return None
+
+    # Sunflower and Wall-nut sway by at most this many degrees (see GameApp.draw_game_scene).
+    SWAY = {"plant_1": 3.0, "plant_2_s1": 2.0, "plant_2_s2": 2.0, "plant_2_s3": 2.0}
+
+    def _precompute_sway(self):
+        step = self.transforms.angle_step
+        for key, amp in self.SWAY.items():
+            if key not in self.imgs: continue
+            n = int(amp / step)
+            for i in range(-n, n + 1): self.transformed(key, angle=i * step)
+
+    def transformed(self, key, size=None, angle=0.0):
+        return self.transforms.get(key, self.imgs[key], size, angle)
 
     def _load_fonts(self):
         font_path = f"assets/{cfg.FONT_NAME}"
@@ -34,144 +273,295 @@ class AssetManager:
             self.fonts["small"] = pygame.font.SysFont("Arial", 18, bold=True)
             self.fonts["money"] = pygame.font.SysFont("Arial", 28, bold=True)
 
-    def _load_audio(self):
-        sound_files = {
-            "click": "snd_click.ogg", "pause": "snd_pause.ogg",
-            "shovel": "snd_shovel.ogg", "plant": "snd_plant.ogg",
-            "win": "snd_win.ogg", "lose": "snd_lose.ogg",
-            "cherry": "snd_cherrybomb.ogg", "imp": "snd_imp.ogg",
-            "pea_hit": "snd_pea_hit.ogg", "eat": "snd_eat.ogg",
-            "freeze": "snd_freeze.ogg", "dig": "snd_dig.ogg",
-            "gargantuar": "snd_gargantuar.ogg",
-            "cone_hit": "snd_cone_hit.ogg", "bucket_hit": "snd_bucket_hit.ogg",
-            "paper_rip": "snd_paper_rip.ogg", "zombie_angry": "snd_zombie_angry.ogg"
-        }
-        for k, v in sound_files.items():
-            p = f"assets/{v}"
-            if os.path.exists(p): 
-                self.sounds[k] = pygame.mixer.Sound(p)
-            else:
-                print(f"[MISSING SOUND] {v}")
-
-        for i in range(1, 7):
-            p = f"assets/snd_zombie_{i}.ogg"
-            if os.path.exists(p): self.zombie_sounds.append(pygame.mixer.Sound(p))
-        if not self.zombie_sounds and os.path.exists("assets/snd_zombie.ogg"):
-            self.zombie_sounds.append(pygame.mixer.Sound("assets/snd_zombie.ogg"))
-
+    def _load_music(self):
+        # Music is streamed by pygame.mixer.music, so only the paths are needed up front.
         self.music_menu = "assets/music_menu.ogg" if os.path.exists("assets/music_menu.ogg") else None
         self.music_game_default = "assets/music_game.ogg" if os.path.exists("assets/music_game.ogg") else None
         for i in range(1, 21):
             p = f"assets/music_level_{i}.ogg"
             if os.path.exists(p): self.music_files[i] = p
 
-    def _load_images(self):
+    # --- groups ---------------------------------------------------------------
+
+    @staticmethod
+    def level_background(lvl):
+        if lvl == 2 or lvl == 3: return "bg_2"
+        return "bg_3" if lvl > 3 else "bg_1"
+
+    @staticmethod
+    def group_jobs(group, screen_size):
+        # A job is (kind, key, file names to try, outputs). Images list (key, size) outputs,
+        # size None keeps the file's size; kind "bg" is an opaque full-screen image.
         gw, gh = int(cfg.PY_TILE_W - 10), int(cfg.PY_TILE_H - 10)
+        zw, zh = int(cfg.PY_TILE_W), int(cfg.PY_TILE_H * 1.2)
+        full = screen_size
+        def img(key, fname, size=None): return ("img", key, [fname], [(key, size)])
+        def bg(name, key): return ("bg", key, [f"{name}.png", f"{name}.jpg"], [(key, full)])
+        def snd(key, fname): return ("snd", key, [fname], [])
+
+        if group == "menu":
+            return [bg("menu_background", "menu_bg"), img("btn_generic", "btn_generic.png"),
+                    snd("click", "snd_click.ogg"), snd("pause", "snd_pause.ogg")] + \
+                   [img(b, f"{b}.png", (60, 60)) for b in ["btn_sound_on", "btn_sound_off", "btn_music_on", "btn_music_off"]]
+
+        if group == "level_select":
+            return [bg("level_select_bg", "level_select_bg")]
+
+        if group.startswith("level_"):
+            k = AssetManager.level_background(int(group[len("level_"):]))
+            return [bg(f"background_{k[len('bg_'):]}", k)]
+
+        if group != "game": raise ValueError(f"unknown asset group {group!r}")
+        jobs = []
         for i in range(len(cfg.PLANT_NAMES)):
-            p = f"assets/plant_{i}.png"
-            if os.path.exists(p):
-                img = pygame.image.load(p).convert_alpha()
-                self.imgs[f"plant_{i}"] = pygame.transform.scale(img, (gw, gh))
-                self.imgs[f"icon_{i}"] = pygame.transform.scale(img, (cfg.CARD_ICON_W, cfg.CARD_ICON_H))
-                print(f"[LOADED] plant_{i}.png")
-            else:
-                print(f"[MISSING] plant_{i}.png")
-
-        extras = ["plant_1_active.png", "plant_3_armed.png", "plant_3_blink.png"]
-        for e in extras:
-            if os.path.exists(f"assets/{e}"):
-                img = pygame.image.load(f"assets/{e}").convert_alpha()
-                self.imgs[e.replace(".png", "")] = pygame.transform.scale(img, (gw, gh))
-        
-        if "plant_3_armed" in self.imgs:
-             self.imgs["icon_3"] = pygame.transform.scale(self.imgs["plant_3_armed"], (cfg.CARD_ICON_W, cfg.CARD_ICON_H))
-
-        if "plant_2" in self.imgs: self.imgs["plant_2_s1"] = self.imgs["plant_2"]
+            jobs.append(("img", f"plant_{i}", [f"plant_{i}.png"],
+                         [(f"plant_{i}", (gw, gh)), (f"icon_{i}", (cfg.CARD_ICON_W, cfg.CARD_ICON_H))]))
+        for e in ["plant_1_active", "plant_3_armed", "plant_3_blink"]:
+            jobs.append(img(e, f"{e}.png", (gw, gh)))
         for i in range(1, 4):
-            p = f"assets/plant_2_cracked{i}.png"
-            if os.path.exists(p):
-                idx = i + 1
-                self.imgs[f"plant_2_s{idx}"] = pygame.transform.scale(pygame.image.load(p).convert_alpha(), (100, 100))
+            jobs.append(img(f"plant_2_s{i + 1}", f"plant_2_cracked{i}.png", (100, 100)))
+        jobs += [img(("anim_cherry_pulse", i), f"cherry_pulse_{i}.png", (gw, gh)) for i in range(5)]
 
-        def load_anim(key, prefix, count):
-            self.imgs[key] = []
-            for i in range(count):
-                p = f"assets/{prefix}_{i}.png"
-                if os.path.exists(p):
-                    self.imgs[key].append(pygame.transform.scale(pygame.image.load(p).convert_alpha(), (gw, gh)))
+        def z(key, fname): return img(key, fname, (zw, zh))
+        for i in range(8):
+            jobs += [z(f"zombie_{i}_norm", f"zombie_{i}.png"), z(f"zombie_{i}_frozen", f"zombie_{i}_frozen.png"),
+                     z(f"zombie_{i}_noarm_norm", f"zombie_{i}_noarm.png"),
+                     z(f"zombie_{i}_noarm_frozen", f"zombie_{i}_noarm_frozen.png")]
+        for t in (1, 2):
+            for a in (1, 2):
+                jobs += [z(f"zombie_{t}_armor{a}_norm", f"zombie_{t}_armor{a}.png"),
+                         z(f"zombie_{t}_armor{a}_frozen", f"zombie_{t}_armor{a}_frozen.png")]
+        jobs += [z("zombie_3_nohelm_norm", "zombie_3.png"), z("zombie_3_nohelm_frozen", "zombie_3_frozen.png"),
+                 z("zombie_3_nohelm_noarm_norm", "zombie_3_nohelm.png"),
+                 z("zombie_3_nohelm_noarm_frozen", "zombie_3_nohelm_frozen.png"),
+                 z("zombie_4_nopaper_norm", "zombie_4.png"), z("zombie_4_nopaper_frozen", "zombie_4_frozen.png"),
+                 z("zombie_4_nopaper_noarm_norm", "zombie_4_nopaper.png"),
+                 z("zombie_4_nopaper_noarm_frozen", "zombie_4_nopaper_frozen.png")]
 
-        load_anim("anim_cherry_pulse", "cherry_pulse", 5)
+        jobs += [img("proj_0", "proj_pea.png", (40, 40)), img("expl_0", "effect_mine.png", (200, 200))]
+        jobs += [img(("anim_cherry_expl", i), f"expl_cherry_{i}.png", (350, 350)) for i in range(8)]
+        jobs.append(bg("pause_bg", "pause_bg"))
+        jobs += [img("btn_shovel", "btn_shovel.png", (80, 80)), img("btn_shovel_hover", "btn_shovel_hover.png", (80, 80)),
+                 img("btn_pause", "btn_pause.png", (60, 60)), img("btn_pause_hover", "btn_pause_hover.png", (60, 60)),
+                 img("ui_panel_bg", "ui_panel_bg.png"), img("ui_card_bg", "ui_card_bg.png", (cfg.CARD_W, cfg.CARD_H)),
+                 img("ui_sun_display", "ui_sun_display.png", (140, 50)), img("sun_icon", "sun_icon.png", (50, 50)),
+                 img("cursor_shovel", "cursor_shovel.png", (60, 60))]
 
-        zw, zh = int(cfg.PY_TILE_W), int(cfg.PY_TILE_H * 1.2)
-        
-        def load_z(key, fname):
-            if os.path.exists(f"assets/{fname}"):
-                self.imgs[key] = pygame.transform.scale(pygame.image.load(f"assets/{fname}").convert_alpha(), (zw, zh))
-                print(f"[LOADED] {fname} -> {key}")
-            else:
-                print(f"[MISSING] {fname}")
+        for k, v in [("shovel", "snd_shovel.ogg"), ("plant", "snd_plant.ogg"), ("win", "snd_win.ogg"),
+                     ("lose", "snd_lose.ogg"), ("cherry", "snd_cherrybomb.ogg"), ("imp", "snd_imp.ogg"),
+                     ("pea_hit", "snd_pea_hit.ogg"), ("eat", "snd_eat.ogg"), ("freeze", "snd_freeze.ogg"),
+                     ("dig", "snd_dig.ogg"), ("gargantuar", "snd_gargantuar.ogg"), ("cone_hit", "snd_cone_hit.ogg"),
+                     ("bucket_hit", "snd_bucket_hit.ogg"), ("paper_rip", "snd_paper_rip.ogg"),
+                     ("zombie_angry", "snd_zombie_angry.ogg")]:
+            jobs.append(snd(k, v))
+        names = [f"snd_zombie_{i}.ogg" for i in range(1, 7) if os.path.exists(f"assets/snd_zombie_{i}.ogg")]
+        jobs += [snd(("zombie", i), n) for i, n in enumerate(names or ["snd_zombie.ogg"])]
+        return jobs
 
-        for i in range(8):
-            load_z(f"zombie_{i}_norm", f"zombie_{i}.png")
-            load_z(f"zombie_{i}_frozen", f"zombie_{i}_frozen.png")
-            load_z(f"zombie_{i}_noarm_norm", f"zombie_{i}_noarm.png")
-            load_z(f"zombie_{i}_noarm_frozen", f"zombie_{i}_noarm_frozen.png")
-        
-        # Variants
-        load_z("zombie_1_armor1_norm", "zombie_1_armor1.png"); load_z("zombie_1_armor1_frozen", "zombie_1_armor1_frozen.png")
-        load_z("zombie_1_armor2_norm", "zombie_1_armor2.png"); load_z("zombie_1_armor2_frozen", "zombie_1_armor2_frozen.png")
-        load_z("zombie_2_armor1_norm", "zombie_2_armor1.png"); load_z("zombie_2_armor1_frozen", "zombie_2_armor1_frozen.png")
-        load_z("zombie_2_armor2_norm", "zombie_2_armor2.png"); load_z("zombie_2_armor2_frozen", "zombie_2_armor2_frozen.png")
-        
-        load_z("zombie_3_nohelm_norm", "zombie_3.png"); load_z("zombie_3_nohelm_frozen", "zombie_3_frozen.png")
-        load_z("zombie_3_nohelm_noarm_norm", "zombie_3_nohelm.png"); load_z("zombie_3_nohelm_frozen", "zombie_3_nohelm_noarm_frozen.png")
-
-        load_z("zombie_4_nopaper_norm", "zombie_4.png"); load_z("zombie_4_nopaper_frozen", "zombie_4_frozen.png")
-        load_z("zombie_4_nopaper_noarm_norm", "zombie_4_nopaper.png"); load_z("zombie_4_nopaper_noarm_frozen", "zombie_4_nopaper_frozen.png")
-
-        if os.path.exists("assets/proj_pea.png"): self.imgs["proj_0"] = pygame.transform.scale(pygame.image.load("assets/proj_pea.png").convert_alpha(), (40, 40))
-        if os.path.exists("assets/effect_mine.png"): self.imgs["expl_0"] = pygame.transform.scale(pygame.image.load("assets/effect_mine.png").convert_alpha(), (200, 200))
-        
-        self.imgs["anim_cherry_expl"] = []
-        for i in range(8):
-            p = f"assets/expl_cherry_{i}.png"
-            if os.path.exists(p): self.imgs["anim_cherry_expl"].append(pygame.transform.scale(pygame.image.load(p).convert_alpha(), (350, 350)))
-
-        def load_bg(name, key):
-            p = f"assets/{name}.png"
-            if not os.path.exists(p): p = f"assets/{name}.jpg"
-            
-            if os.path.exists(p):
-                self.imgs[key] = pygame.transform.scale(pygame.image.load(p).convert(), (self.W, self.H))
-                print(f"[LOADED] Background: {p}")
-            else:
-                print(f"[MISSING] Background: {name}")
+    @staticmethod
+    def _source(job):
+        kind, key, names, outputs = job
+        for n in names:
+            if os.path.exists(f"assets/{n}"): return f"assets/{n}", kind, tuple(size for _, size in outputs)
+        return None
 
-        load_bg("menu_background", "menu_bg")
-        load_bg("level_select_bg", "level_select_bg")
-        load_bg("pause_bg", "pause_bg")
+    def _decode(self, job):
+        # Runs on the pool: only file decoding and scaling, no display-format conversion.
+        # Images come back as (content hash, [surface per output]).
+        src = self._source(job)
+        if src is None: return None
+        p, kind, sizes = src
+        if kind == "snd": return pygame.mixer.Sound(p)
 
-        for i in range(1, 4):
-            load_bg(f"background_{i}", f"bg_{i}")
-
-        ui_files = ["btn_generic", "btn_shovel", "btn_shovel_hover", "btn_pause", "btn_pause_hover", 
-                    "ui_panel_bg", "ui_card_bg", "btn_sound_on", "btn_sound_off", "btn_music_on", "btn_music_off", 
-                    "ui_sun_display", "sun_icon"]
-        
-        for b in ui_files:
-            p = f"assets/{b}.png"
-            if os.path.exists(p):
-                img = pygame.image.load(p).convert_alpha()
-                if "shovel" in b: img = pygame.transform.scale(img, (80, 80))
-                elif "pause" in b or "sound" in b or "music" in b: img = pygame.transform.scale(img, (60, 60))
-                elif "card" in b: img = pygame.transform.scale(img, (cfg.CARD_W, cfg.CARD_H))
-                elif "sun_display" in b: img = pygame.transform.scale(img, (140, 50))
-                elif "sun_icon" in b: img = pygame.transform.scale(img, (50, 50))
-                self.imgs[b] = img
+        with open(p, "rb") as f: data = f.read()
+        content = hashlib.sha1(data).hexdigest()[:16]
+        fmt = "RGB" if kind == "bg" else "RGBA"
+        digests = [hashlib.sha1(f"{content}|{size}|{fmt}".encode()).hexdigest()[:16] for size in sizes]
+        cached = [self._read_blob(k, d, fmt) for (k, _), d in zip(job[3], digests)]
+        if None not in cached: return content, cached
+
+        img = pygame.image.load(io.BytesIO(data), p)
+        out = []
+        for (k, size), d in zip(job[3], digests):
+            surf = pygame.transform.scale(img, size) if size else img
+            self._write_blob(k, d, surf, fmt)
+            out.append(surf)
+        return content, out
+
+    # --- scaled image cache ---------------------------------------------------
+    # Blob file name: <key>.<digest>.<w>x<h>.<RGB|RGBA>, raw pixels with no header.
+
+    def _open_cache(self):
+        bits = pygame.display.get_surface().get_bitsize() if pygame.display.get_surface() else 32
+        self.cache_dir = os.path.join(cfg.ASSET_CACHE_DIR, f"v{self.CACHE_VERSION}_{self.W}x{self.H}_{bits}")
+        self.blobs = {}
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            for f in os.listdir(self.cache_dir):
+                parts = f.split(".")
+                if len(parts) != 4 or "x" not in parts[2]: continue
+                w, h = parts[2].split("x")
+                self.blobs[parts[0]] = (parts[1], (int(w), int(h)), parts[3], os.path.join(self.cache_dir, f))
+        except (OSError, ValueError) as e:
+            print(f"[WARN] Asset cache disabled: {e}")
+            self.cache_dir = None
+
+    @staticmethod
+    def _blob_name(key):
+        return "-".join(map(str, key)) if isinstance(key, tuple) else key
+
+    def _read_blob(self, key, digest, fmt):
+        entry = self.blobs.get(self._blob_name(key))
+        if not entry or entry[0] != digest or entry[2] != fmt: return None
+        _, size, _, path = entry
+        try:
+            with open(path, "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        except (OSError, ValueError):
+            return None
+        if len(data) != size[0] * size[1] * len(fmt): return None
+        return pygame.image.frombuffer(data, size, fmt)
+
+    def _write_blob(self, key, digest, surf, fmt):
+        if self.cache_dir is None: return
+        name = self._blob_name(key)
+        w, h = surf.get_size()
+        path = os.path.join(self.cache_dir, f"{name}.{digest}.{w}x{h}.{fmt}")
+        try:
+            with open(path + ".tmp", "wb") as f:
+                f.write(pygame.image.tobytes(surf, fmt))
+            os.replace(path + ".tmp", path)
+            old = self.blobs.get(name)
+            if old and old[3] != path: os.remove(old[3])
+        except OSError:
+            return
+        self.blobs[name] = (digest, (w, h), fmt, path)
+
+    def _group_jobs(self, group):
+        jobs = self.group_jobs(group, (self.W, self.H))
+        index = self._atlas_index(group, jobs)
+        if index is None: return jobs
+
+        # One job per atlas page; images the atlas does not cover still load on their own.
+        pages = []
+        for i, page in enumerate(index["pages"]):
+            key = f"atlas_{group}_{i}"
+            pages.append(("atlas", key, [page], [(key, None)]))
+            self.atlas_regions[key] = []
+        covered = set()
+        for name, frame, page, x, y, w, h in index["sprites"]:
+            k = name if frame is None else (name, frame)
+            self.atlas_regions[f"atlas_{group}_{page}"].append((k, pygame.Rect(x, y, w, h)))
+            covered.add(k)
+        return pages + [j for j in jobs if j[0] != "img" or any(k not in covered for k, _ in j[3])]
+
+    def _atlas_index(self, group, jobs):
+        path = f"assets/atlas_{group}.json"
+        if not os.path.exists(path): return None
+        try:
+            with open(path) as f: index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        if index.get("version") != ATLAS_VERSION or index.get("sources") != atlas_sources(jobs) or \
+                not all(os.path.exists(f"assets/{p}") for p in index.get("pages", [])):
+            print(f"[WARN] {path} is out of date, run build_atlas.py. Loading files one by one.")
+            return None
+        return index
+
+    def prefetch(self, group):
+        if group in self.loaded_groups or group in self.pending: return
+        jobs = deque()
+        decodes = {}
+        for job in self._group_jobs(group):
+            keys = {k for k, _ in job[3]} or {job[1]}
+            if keys <= self.requested: continue
+            self.requested |= keys
+            # Jobs reading the same file at the same sizes share one decode.
+            src = self._source(job)
+            fut = decodes.get(src) if src else None
+            if fut is None:
+                fut = self.pool.submit(self._decode, job)
+                if src: decodes[src] = fut
+            jobs.append((job, fut))
+        self.pending[group] = {"jobs": jobs, "total": len(jobs), "start": time.perf_counter()}
+
+    def poll(self, wait_for=None):
+        # Stores finished files in submission order, so a later job for the same key wins
+        # exactly as it would when loading one file after another.
+        for group in list(self.pending):
+            g = self.pending[group]
+            jobs = g["jobs"]
+            while jobs and (group == wait_for or jobs[0][1].done()):
+                job, fut = jobs.popleft()
+                self._store(job, fut.result())
+                if self.progress: self.progress(group, g["total"] - len(jobs), g["total"])
+            if not jobs:
+                del self.pending[group]
+                self._finish_group(group)
+                total_mb = self.memory_report()[1] / (1024 * 1024)
+                print(f"[LOADED] {group}: {g['total']} files in {(time.perf_counter() - g['start']) * 1000:.0f} ms,"
+                      f" images {total_mb:.1f} MB")
+
+    def load_group(self, group):
+        self.prefetch(group)
+        self.poll(wait_for=group)
+
+    def _store(self, job, result):
+        kind, key, names, outputs = job
+        if result is None:
+            print(f"[MISSING] {names[0]}")
+            return
+        if kind == "snd":
+            if isinstance(key, tuple): self.zombie_sounds.append(result)
+            else: self.sounds[key] = result
+            return
+        content, surfs = result
+        for (k, _), surf in zip(outputs, surfs):
+            rk = (content, surf.get_size(), kind == "bg")
+            shared = self.registry.get(rk)
+            if shared is None:
+                shared = self.registry[rk] = surf.convert() if kind == "bg" else surf.convert_alpha()
+            if kind == "atlas":
+                for sk, rect in self.atlas_regions[k]: self._put(sk, shared.subsurface(rect))
             else:
-                print(f"[MISSING] UI: {b}.png")
-        
-        if os.path.exists("assets/cursor_shovel.png"): 
-            self.imgs["cursor_shovel"] = pygame.transform.scale(pygame.image.load("assets/cursor_shovel.png").convert_alpha(), (60, 60))
-        elif "btn_shovel" in self.imgs: 
-            self.imgs["cursor_shovel"] = pygame.transform.scale(self.imgs["btn_shovel"], (60, 60))
\ No newline at end of file
+                self._put(k, shared)
+
+    def surface_allocs(self):
+        """Surfaces created so far by the caches and pools the draw path goes through."""
+        return self.transforms.misses + self.texts.misses + self.surfaces.allocs
+
+    def memory_report(self):
+        """Returns ({image key: bytes}, total bytes). In the total, surfaces shared by
+        several keys and atlas pages behind subsurfaces are counted once."""
+        per_key, bases = {}, {}
+        for key, v in self.imgs.items():
+            surfs = v if isinstance(v, list) else [v]
+            per_key[key] = sum(TransformCache._size(s) for s in surfs)
+            for s in surfs:
+                while s.get_parent() is not None: s = s.get_parent()
+                bases[id(s)] = TransformCache._size(s)
+        return per_key, sum(bases.values())
+
+    def _put(self, key, surf):
+        if isinstance(key, tuple):
+            self.imgs.setdefault(key[0], []).append(surf)
+        else:
+            self.imgs[key] = surf
+
+    def _finish_group(self, group):
+        self.loaded_groups.add(group)
+        if group == "menu" and "btn_generic" in self.imgs:
+            locked = self.imgs["btn_generic"].copy()
+            s = pygame.Surface(locked.get_size()); s.set_alpha(150); s.fill((0, 0, 0))
+            locked.blit(s, (0, 0))
+            self.imgs["btn_generic_locked"] = locked
+
+        if group == "game":
+            self.imgs.setdefault("anim_cherry_pulse", []); self.imgs.setdefault("anim_cherry_expl", [])
+            if "plant_3_armed" in self.imgs:
+                self.imgs["icon_3"] = pygame.transform.scale(self.imgs["plant_3_armed"], (cfg.CARD_ICON_W, cfg.CARD_ICON_H))
+            if "plant_2" in self.imgs: self.imgs["plant_2_s1"] = self.imgs["plant_2"]
+            if "cursor_shovel" not in self.imgs and "btn_shovel" in self.imgs:
+                self.imgs["cursor_shovel"] = pygame.transform.scale(self.imgs["btn_shovel"], (60, 60))
+            self._precompute_sway()
+            self._build_sprite_luts()
@@ -0,0 +1,174 @@
+"""Balance sweeps: runs every level x strategy x parameter combination headless
+on a process pool and streams one CSV row per run.
+
+Run it from this folder, the same way as main.py:
+
+    python batch_sim.py --all --strategies peas,sun_peas \\
+        --set start_money=50,100,150 --set auto_sun_interval=6,8,10 \\
+        --set wave_time_scale=0.8,1.0 --seeds 20 --out results.csv
+
+Every --set key except wave_time_scale replaces that key in the level's
+"settings"; wave_time_scale multiplies every wave's "time".
+
+--seeds N plays each combination N times, with seeds 0..N-1. Seed s goes to
+Engine_SetSeed and is added to the level's "wave_generator" seed, so seed 0 is
+the level as written. Fixed wave lists play the same under every seed; only
+the engine RNG and generated waves vary.
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import headless
+from cpp_bridge import lib
+
+RESULT_FIELDS = ["outcome", "time", "lives", "money", "ticks", "ticks_per_sec"]
+
+
+def _plant_rows(settings, card, cols):
+    rows = settings.get("active_rows", range(settings.get("height", 5)))
+    return [{"time": 0.0, "action": "build", "card": card, "col": c, "row": r, "wait": True}
+            for c in cols for r in rows]
+
+
+# Each strategy turns a level's settings into a headless action script.
+STRATEGIES = {
+    "idle": lambda s: [],
+    "peas": lambda s: _plant_rows(s, 0, [0, 1]),
+    "sun_peas": lambda s: _plant_rows(s, 1, [0]) + _plant_rows(s, 0, [1, 2]),
+    "sun_peas_nuts": lambda s: _plant_rows(s, 1, [0]) + _plant_rows(s, 0, [1, 2]) + _plant_rows(s, 2, [6]),
+}
+
+
+def apply_overrides(level_data, overrides):
+    data = json.loads(json.dumps(level_data))
+    for key, value in overrides.items():
+        if key == "wave_time_scale":
+            for w in data["waves"]: w["time"] *= value
+        else:
+            data["settings"][key] = value
+    return data
+
+
+def parse_set(text):
+    key, _, values = text.partition("=")
+    if not values:
+        raise argparse.ArgumentTypeError(f"expected key=v1,v2,... got {text!r}")
+    return key, [json.loads(v) for v in values.split(",")]
+
+
+def build_tasks(levels, strategies, sweeps, seeds=1):
+    keys = [k for k, _ in sweeps]
+    for lvl, strat in itertools.product(levels, strategies):
+        for values in itertools.product(*(v for _, v in sweeps)):
+            for seed in range(seeds):
+                yield lvl, strat, dict(zip(keys, values)), seed
+
+
+# --- worker process ----------------------------------------------------------
+
+_worker = {}
+
+
+def _init_worker(base_levels, dt, max_time):
+    _worker.update(base_levels=base_levels, dt=dt, max_time=max_time)
+
+
+def _run_task(task):
+    lvl, strat, overrides, seed = task
+    data = apply_overrides(_worker["base_levels"][lvl], overrides)
+    if "wave_generator" in data:
+        data["wave_generator"]["seed"] = data["wave_generator"].get("seed", 0) + seed
+    actions = STRATEGIES[strat](data["settings"])
+    engine = lib.Engine_Create()
+    try:
+        lib.Engine_SetSeed(engine, seed)
+        result = headless.run_level(lvl, actions, _worker["dt"], _worker["max_time"], engine,
+                                    level_text=json.dumps(data).encode())
+    finally:
+        lib.Engine_Destroy(engine)
+    return task, result
+
+
+# --- main process ------------------------------------------------------------
+
+def summarize(rows, keys):
+    groups = {}
+    for r in rows:
+        groups.setdefault(tuple(r[k] for k in keys), []).append(r)
+    print("\n" + "  ".join(f"{k:>16}" for k in keys) + f"  {'runs':>5}  {'win %':>6}  {'clear s':>8}")
+    for cfg_key, runs in sorted(groups.items(), key=lambda kv: tuple(map(str, kv[0]))):
+        wins = [r for r in runs if r["outcome"] == "win"]
+        clear = sum(r["time"] for r in wins) / len(wins) if wins else float("nan")
+        print("  ".join(f"{str(v):>16}" for v in cfg_key)
+              + f"  {len(runs):>5}  {100.0 * len(wins) / len(runs):>6.1f}  {clear:>8.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep level parameters and strategies headless.")
+    parser.add_argument("levels", nargs="*", type=int, help="level numbers to run")
+    parser.add_argument("--all", action="store_true", help="run every levels/level_*.json")
+    parser.add_argument("--strategies", default=",".join(STRATEGIES),
+                        help=f"comma-separated, from: {', '.join(STRATEGIES)}")
+    parser.add_argument("--set", dest="sweeps", action="append", type=parse_set, default=[],
+                        metavar="KEY=V1,V2", help="sweep a level setting over these values")
+    parser.add_argument("--seeds", type=int, default=1, help="runs per combination, with seeds 0..N-1")
+    parser.add_argument("--out", default="batch_results.csv", help="CSV file to stream results to")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--dt", type=float, default=headless.DEFAULT_DT)
+    parser.add_argument("--max-time", type=float, default=headless.DEFAULT_MAX_TIME)
+    args = parser.parse_args(argv)
+    if args.seeds < 1: parser.error("--seeds must be at least 1")
+
+    levels = headless.level_ids() if args.all else args.levels
+    if not levels:
+        parser.error("no levels given (pass level numbers or --all)")
+    strategies = args.strategies.split(",")
+    for s in strategies:
+        if s not in STRATEGIES: parser.error(f"unknown strategy {s!r}")
+
+    base_levels = {}
+    for lvl in levels:
+        with open(f"levels/level_{lvl}.json") as f:
+            base_levels[lvl] = json.load(f)
+
+    tasks = list(build_tasks(levels, strategies, args.sweeps, args.seeds))
+    keys = ["level", "strategy"] + [k for k, _ in args.sweeps]
+    rows = []
+    total_ticks = 0
+    start = last_print = time.perf_counter()
+
+    with open(args.out, "w", newline="") as f, \
+            ProcessPoolExecutor(args.workers, initializer=_init_worker,
+                                initargs=(base_levels, args.dt, args.max_time)) as pool:
+        writer = csv.DictWriter(f, fieldnames=keys + ["seed"] + RESULT_FIELDS)
+        writer.writeheader()
+        chunk = max(1, len(tasks) // (args.workers * 8))
+        for (lvl, strat, overrides, seed), result in pool.map(_run_task, tasks, chunksize=chunk):
+            row = {"level": lvl, "strategy": strat, **overrides, "seed": seed, **{k: result[k] for k in RESULT_FIELDS}}
+            writer.writerow(row)
+            rows.append(row)
+            total_ticks += result["ticks"]
+
+            now = time.perf_counter()
+            if now - last_print > 0.5 or len(rows) == len(tasks):
+                last_print = now
+                el = now - start
+                sys.stderr.write(f"\r{len(rows)}/{len(tasks)} runs  {len(rows) / el:8.1f} runs/s"
+                                 f"  {total_ticks / el:12.0f} ticks/s")
+                sys.stderr.flush()
+                f.flush()
+    sys.stderr.write("\n")
+
+    summarize(rows, keys)
+    print(f"\n{len(rows)} runs in {time.perf_counter() - start:.1f}s -> {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,316 @@
+"""Performance benchmarks on generated stress levels, with a baseline check.
+
+Run it from this folder, the same way as main.py:
+
+    python benchmark.py
+    python benchmark.py --only engine,snapshot --baseline bench_results/before.json
+    python benchmark.py --write-levels stress_levels
+
+Four kinds of measurement, each on every stress level:
+- engine:   Engine_Update ticks per second over a fixed window of game time;
+- snapshot: microseconds per Snapshot.read at the end of that window;
+- state:    microseconds per Engine_RestoreState of the state the window ends in;
+- render:   GameApp.draw_game_scene frames per second under SDL's dummy video
+            driver, once per --resolutions entry.
+
+The levels are generated here in the levels/level_N.json format (--write-levels
+saves them) and loaded with Engine_LoadLevelFromMemory. Each run uses the same
+seed and scripted builds, so it replays the same game on the same engine.
+
+Results are written as JSON to cfg.BENCH_DIR. With --baseline, every result is
+compared against the same one in an earlier file. The exit code is 1 if any of them
+is worse by more than --threshold (a fraction, cfg.BENCH_THRESHOLD by default).
+"""
+import argparse
+import ctypes
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+import config as cfg
+import headless
+from cpp_bridge import lib, NATIVE, Snapshot, save_state, restore_state
+
+DT = 1.0 / 60.0
+SEED = 1
+LIVES = 1000000    # stress levels must not end in the middle of a window
+KINDS = ("engine", "snapshot", "state", "render")
+DEFAULT_RESOLUTIONS = "1280x720,1920x1080,2560x1440"
+SNAPSHOT_READS = 200
+STATE_RESTORES = 200
+RENDER_FRAMES = 300
+
+# headless card indices
+PEA, SUN, NUT, MINE, CHERRY, ICE = range(6)
+
+
+def _settings(money):
+    return {"width": 9, "height": 5, "start_money": money, "lives": LIVES,
+            "auto_sun_amount": 25, "auto_sun_interval": 10.0, "active_rows": [0, 1, 2, 3, 4]}
+
+
+def _horde(count, start, duration):
+    # Every zombie type, spread evenly over the lanes and over `duration` seconds.
+    return [{"time": round(start + i * duration / count, 4), "type": i % 8, "row": i % 5} for i in range(count)]
+
+
+def _build(t, card, col, row):
+    return {"time": t, "action": "build", "card": card, "col": col, "row": row, "wait": True}
+
+
+def horde_level(zombies):
+    """Zombies only: `zombies` spawn in the first 10 s and walk across an empty lawn; the
+    first ones reach the house at about 27 s."""
+    return {"settings": _settings(0), "waves": _horde(zombies, 0.0, 10.0)}, [], 10.0, 10.0
+
+
+def lawn_level(zombies):
+    """All 45 cells planted (sunflowers, peashooters, wall-nuts), then a horde walks into them.
+    The builds wait for their card cooldowns, so the lawn is complete at about 175 s."""
+    actions = [_build(0.0, SUN, 0, r) for r in range(5)] + [_build(0.0, NUT, 8, r) for r in range(5)]
+    actions += [_build(0.0, PEA, c, r) for c in range(1, 8) for r in range(5)]
+    return {"settings": _settings(1000000), "waves": _horde(zombies, 180.0, 30.0)}, actions, 180.0, 20.0
+
+
+def aoe_level(zombies):
+    """A horde kept under area damage: a cherry bomb, ice lettuce and potato mine are planted
+    each time their card cools down (30, 15 and 20 s), on rotating rows."""
+    actions = [_build(1.0 + 30.0 * i, CHERRY, 5, i % 5) for i in range(4)]
+    actions += [_build(1.0 + 15.0 * i, ICE, 4, i % 5) for i in range(8)]
+    actions += [_build(1.0 + 20.0 * i, MINE, 6, i % 5) for i in range(6)]
+    return {"settings": _settings(1000000), "waves": _horde(zombies, 0.0, 90.0)}, actions, 5.0, 60.0
+
+
+# name -> (level id used by --write-levels, level factory). A factory takes the zombie
+# count and returns (level data, headless actions, warm-up seconds, measured seconds).
+STRESS_LEVELS = {
+    "horde": (101, horde_level),
+    "lawn": (102, lawn_level),
+    "aoe": (103, aoe_level),
+}
+
+
+class Session:
+    """A stress level loaded into an engine and played forward tick by tick."""
+
+    def __init__(self, engine, level, actions):
+        text = json.dumps(level).encode()
+        lib.Engine_SetSeed(engine, SEED)
+        if not lib.Engine_LoadLevelFromMemory(engine, text, len(text)): raise ValueError("stress level did not load")
+        self.engine = engine
+        self.script = sorted(actions, key=lambda a: a["time"])
+        self.cursor = 0
+        self.waiting = []
+        self.ticks = 0
+        self.c_dt = ctypes.c_float(DT)
+
+    def advance(self, ticks):
+        for _ in range(ticks):
+            now = self.ticks * DT
+            while self.cursor < len(self.script) and self.script[self.cursor]["time"] <= now:
+                self.waiting.append(self.script[self.cursor]); self.cursor += 1
+            if self.waiting:
+                self.waiting = [a for a in self.waiting if not headless.apply_action(self.engine, a)]
+            lib.Engine_Update(self.engine, self.c_dt)
+            self.ticks += 1
+
+    def ended(self):
+        return lib.Engine_IsLevelComplete(self.engine) or lib.Engine_IsGameOver(self.engine)
+
+    def entities(self):
+        return (lib.Engine_GetZombieCount(self.engine) + lib.Engine_GetPlantCount(self.engine)
+                + lib.Engine_GetProjectileCount(self.engine))
+
+
+def _result(value, unit, higher_is_better, **extra):
+    return dict(value=value, unit=unit, higher_is_better=higher_is_better, **extra)
+
+
+def bench_engine(name, zombies, window_ticks, repeat):
+    """Engine ticks/s over the level's window (best of `repeat` runs), then the snapshot
+    read and state restore costs in the state the window ends in."""
+    level, actions, warmup, window = STRESS_LEVELS[name][1](zombies)
+    ticks = window_ticks or int(window / DT)
+    engine = lib.Engine_Create()
+    try:
+        best = float("inf")
+        for _ in range(repeat):
+            s = Session(engine, level, actions)
+            s.advance(int(warmup / DT))
+            start = time.perf_counter()
+            s.advance(ticks)
+            best = min(best, time.perf_counter() - start)
+            if s.ended(): raise RuntimeError(f"{name}: the level ended inside the measured window")
+
+        snap = Snapshot()
+        snap.read(engine)    # grows the buffers once, outside the timing
+        reads = []
+        for _ in range(SNAPSHOT_READS):
+            t0 = time.perf_counter()
+            snap.read(engine)
+            reads.append(time.perf_counter() - t0)
+        entities = s.entities()
+
+        state = save_state(engine)
+        restores = []
+        for _ in range(STATE_RESTORES):
+            t0 = time.perf_counter()
+            restore_state(engine, state)
+            restores.append(time.perf_counter() - t0)
+    finally:
+        lib.Engine_Destroy(engine)
+    return {
+        f"engine/{name}": _result(ticks / best, "ticks/s", True, ticks=ticks, entities=entities),
+        f"snapshot/{name}": _result(float(np.median(reads)) * 1e6, "us/read", False, entities=entities),
+        f"state/{name}": _result(float(np.median(restores)) * 1e6, "us/restore", False, entities=entities,
+                                 bytes=len(state)),
+    }
+
+
+def bench_render(names, zombies, resolutions, frames):
+    """draw_game_scene frames/s per level and resolution. The engine is stepped one tick
+    per frame outside the timing; the frame repaints only what the game would repaint."""
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    cfg.RECORD_REPLAYS = False
+    import pygame
+    from game import GameApp
+
+    out = {}
+    for w, h in resolutions:
+        app = GameApp((w, h))
+        try:
+            app.available_plants_count = len(cfg.PLANT_NAMES)
+            app.current_level = 1
+            app.load_level(1)
+            app.state = "GAME"
+            # The engine is driven by hand from here on: stop the simulation thread so that
+            # every Engine_Update comes from Session.advance and the game is the scripted one.
+            app.sim.stop()
+            snaps = [Snapshot(), Snapshot()]
+            for name in names:
+                level, actions, warmup, _ = STRESS_LEVELS[name][1](zombies)
+                s = Session(app.engine, level, actions)
+                app.active_rows = level["settings"]["active_rows"]
+                s.advance(int(warmup / DT))
+                app.dirty_rects = None
+                app.static_key = None
+                times = []
+                for i in range(frames):
+                    s.advance(1)
+                    app.prev_snapshot, app.snapshot = app.snapshot, snaps[i % 2].read(app.engine)
+                    app.alpha = 1.0
+                    t0 = time.perf_counter()
+                    app.dirty_rects = app.draw_game_scene(app.dirty_rects)
+                    times.append(time.perf_counter() - t0)
+                    pygame.event.pump()
+                times = np.array(times[1:])    # the first frame repaints the whole screen
+                out[f"render/{name}/{w}x{h}"] = _result(
+                    len(times) / times.sum(), "fps", True, p95_ms=round(float(np.percentile(times, 95)) * 1000, 3),
+                    entities=len(app.snapshot.zombies) + len(app.snapshot.plants) + len(app.snapshot.projectiles))
+        finally:
+            app.sim.stop()
+            lib.Engine_Destroy(app.engine)
+            pygame.display.quit()
+    return out
+
+
+def compare(results, baseline, threshold):
+    """Rows of (name, baseline value, new value, relative change, regressed) for results
+    present in both. The change is positive when the result got better."""
+    rows = []
+    for name, r in results.items():
+        if name not in baseline: continue
+        old, new = baseline[name]["value"], r["value"]
+        if not old: continue
+        change = (new - old) / old if r["higher_is_better"] else (old - new) / old
+        rows.append((name, old, new, change, change < -threshold))
+    return rows
+
+
+def parse_resolutions(text):
+    try:
+        return [tuple(int(v) for v in part.lower().split("x")) for part in text.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WxH,WxH,... got {text!r}")
+
+
+def write_levels(folder, zombies):
+    os.makedirs(folder, exist_ok=True)
+    for name, (level_id, factory) in STRESS_LEVELS.items():
+        path = os.path.join(folder, f"level_{level_id}.json")
+        with open(path, "w") as f: json.dump(factory(zombies)[0], f, indent=4)
+        print(f"{name:<8} -> {path}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the engine, snapshots and rendering on stress levels.")
+    parser.add_argument("--only", default=",".join(KINDS), help=f"comma-separated, from: {', '.join(KINDS)}")
+    parser.add_argument("--levels", default=",".join(STRESS_LEVELS),
+                        help=f"comma-separated, from: {', '.join(STRESS_LEVELS)}")
+    parser.add_argument("--zombies", type=int, default=2000, help="zombies in each stress level")
+    parser.add_argument("--ticks", type=int, help="measured engine ticks (default: each level's own window)")
+    parser.add_argument("--repeat", type=int, default=3, help="engine runs per level; the fastest one counts")
+    parser.add_argument("--resolutions", type=parse_resolutions, default=parse_resolutions(DEFAULT_RESOLUTIONS),
+                        metavar="WxH,...", help="window sizes for the render benchmark")
+    parser.add_argument("--frames", type=int, default=RENDER_FRAMES, help="frames per render benchmark")
+    parser.add_argument("--out", help=f"result file (default: {cfg.BENCH_DIR}/bench_<time>.json)")
+    parser.add_argument("--baseline", help="earlier result file to compare against")
+    parser.add_argument("--threshold", type=float, default=cfg.BENCH_THRESHOLD,
+                        help="allowed slowdown against the baseline, as a fraction")
+    parser.add_argument("--write-levels", metavar="DIR", help="only save the stress levels as level_N.json files")
+    args = parser.parse_args(argv)
+
+    if args.write_levels:
+        write_levels(args.write_levels, args.zombies)
+        return 0
+
+    kinds, names = args.only.split(","), args.levels.split(",")
+    for k in kinds:
+        if k not in KINDS: parser.error(f"unknown benchmark {k!r}")
+    for n in names:
+        if n not in STRESS_LEVELS: parser.error(f"unknown stress level {n!r}")
+
+    results = {}
+    if {"engine", "snapshot", "state"} & set(kinds):
+        for name in names:
+            for key, r in bench_engine(name, args.zombies, args.ticks, args.repeat).items():
+                if key.split("/")[0] in kinds: results[key] = r
+    if "render" in kinds:
+        results.update(bench_render(names, args.zombies, args.resolutions, args.frames))
+
+    for name, r in results.items():
+        print(f"{name:<28} {r['value']:12.1f} {r['unit']:<10} ({r['entities']} entities)")
+
+    report = {
+        "meta": {"time": time.strftime("%Y-%m-%d %H:%M:%S"), "engine": "native" if NATIVE else "python",
+                 "platform": platform.platform(), "python": platform.python_version(),
+                 "zombies": args.zombies, "seed": SEED},
+        "results": results,
+    }
+    out = args.out or os.path.join(cfg.BENCH_DIR, f"bench_{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as f: json.dump(report, f, indent=2)
+    print(f"-> {out}")
+
+    if not args.baseline: return 0
+    with open(args.baseline) as f: base = json.load(f)
+    if base["meta"]["engine"] != report["meta"]["engine"]:
+        print(f"[WARN] baseline was measured on the {base['meta']['engine']} engine")
+    if base["meta"].get("zombies") != args.zombies:
+        print(f"[WARN] baseline was measured with {base['meta'].get('zombies')} zombies per level")
+    rows = compare(results, base["results"], args.threshold)
+    print(f"\n{'':<28} {'baseline':>12} {'now':>12} {'change':>8}")
+    for name, old, new, change, regressed in rows:
+        print(f"{name:<28} {old:12.1f} {new:12.1f} {change:+8.1%}{'  REGRESSION' if regressed else ''}")
+    regressions = sum(r[4] for r in rows)
+    print(f"\n{len(rows)} compared, {regressions} worse than -{args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
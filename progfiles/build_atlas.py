@@ -0,0 +1,100 @@
+"""Packs the small images of the "menu" and "game" asset groups into atlas pages.
+
+Run it from this folder after changing anything in assets/:
+
+    python build_atlas.py
+
+It writes assets/atlas_<group>_<n>.png pages and an assets/atlas_<group>.json
+index. Images are packed already scaled to the size the game draws them at.
+AssetManager loads each page as one surface and hands out subsurfaces. If any
+source file changed since the build, it warns and loads the files one by one.
+"""
+import argparse
+import json
+import os
+import sys
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+import pygame
+
+from assets import ATLAS_VERSION, AssetManager, atlas_sources
+
+PAGE_SIZE = 2048
+PADDING = 1
+GROUPS = ["menu", "game"]
+
+
+def collect(jobs):
+    # (name, frame) -> scaled surface. A later job for the same key replaces the earlier one,
+    # the same way AssetManager stores them. The same file at the same size is one surface,
+    # so it is packed once and every key using it points at the same region.
+    sprites, scaled = {}, {}
+    for kind, key, names, outputs in jobs:
+        if kind != "img": continue
+        p = next((f"assets/{n}" for n in names if os.path.exists(f"assets/{n}")), None)
+        if p is None: continue
+        src = None
+        for k, size in outputs:
+            if (p, size) not in scaled:
+                if src is None: src = pygame.image.load(p)
+                scaled[p, size] = pygame.transform.scale(src, size) if size else src
+            sid = k if isinstance(k, tuple) else (k, None)
+            sprites[sid] = scaled[p, size]
+    return sprites
+
+
+def pack(sizes, page_size=PAGE_SIZE):
+    # Shelf packing, tallest first. Returns ({id: (page, x, y)}, used height per page).
+    placed, heights = {}, [0]
+    page = x = y = shelf_h = 0
+    for sid in sorted(sizes, key=lambda s: (-sizes[s][1], -sizes[s][0])):
+        w, h = sizes[sid][0] + PADDING, sizes[sid][1] + PADDING
+        if x + w > page_size: x, y, shelf_h = 0, y + shelf_h, 0
+        if y + h > page_size:
+            page += 1; heights.append(0)
+            x = y = shelf_h = 0
+        placed[sid] = (page, x, y)
+        x += w; shelf_h = max(shelf_h, h)
+        heights[page] = max(heights[page], y + h)
+    return placed, heights
+
+
+def build(group):
+    jobs = AssetManager.group_jobs(group, (0, 0))
+    sprites = collect(jobs)
+    fits = {sid: s for sid, s in sprites.items()
+            if s.get_width() + PADDING <= PAGE_SIZE and s.get_height() + PADDING <= PAGE_SIZE}
+    unique = {id(s): s for s in fits.values()}
+    placed, heights = pack({i: s.get_size() for i, s in unique.items()})
+
+    pages = [pygame.Surface((PAGE_SIZE, h), pygame.SRCALPHA) for h in heights]
+    for p in pages: p.fill((0, 0, 0, 0))
+    for i, surf in unique.items():
+        page, x, y = placed[i]
+        pages[page].blit(surf, (x, y))
+    entries = [[sid[0], sid[1], *placed[id(s)], s.get_width(), s.get_height()] for sid, s in fits.items()]
+
+    names = []
+    for i, p in enumerate(pages):
+        names.append(f"atlas_{group}_{i}.png")
+        pygame.image.save(p, f"assets/{names[-1]}")
+    with open(f"assets/atlas_{group}.json", "w") as f:
+        json.dump({"version": ATLAS_VERSION, "pages": names, "sources": atlas_sources(jobs), "sprites": entries}, f)
+
+    skipped = len(sprites) - len(fits)
+    print(f"{group}: {len(fits)} images ({len(unique)} unique) -> {len(pages)} page(s)" + (f", {skipped} too large, left out" if skipped else ""))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pack sprite atlases for AssetManager.")
+    parser.add_argument("groups", nargs="*", default=GROUPS, help=f"asset groups to pack (default: {' '.join(GROUPS)})")
+    args = parser.parse_args(argv)
+    pygame.init()
+    for g in args.groups:
+        if g not in GROUPS: parser.error(f"unknown group {g!r}")
+        build(g)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -21,6 +21,26 @@ CARD_COST_OFF_Y = 65
 SAVE_FILE = "save.json"
 DLL_NAME = "TowerEngine.dll"
 FONT_NAME = "font_custom.ttf"
+
+TRANSFORM_CACHE_MB = 32
+TRANSFORM_ANGLE_STEP = 0.5
+TEXT_CACHE_SIZE = 256
+ASSET_THREADS = 4
+ASSET_CACHE_DIR = "asset_cache"
+FPS_LIMIT = 144
+SIM_HZ = 60
+SIM_MAX_STEPS = 5
+GAME_SPEEDS = (1, 2, 4, 8)
+RECORD_REPLAYS = False
+REPLAY_DIR = "replays"
+REPLAY_KEEP = 50
+PROFILE_WINDOW = 600
+PROFILE_OVERLAY_EVERY = 15
+PROFILE_EXPORT = ""
+PROFILE_DIR = "profiles"
+PROFILE_MAX_ROWS = 100000
+BENCH_DIR = "bench_results"
+BENCH_THRESHOLD = 0.10
 GAME_TITLE = "Plants vs Zombies: My Version"
 
 TEXT_GREEN = (50, 205, 50)
@@ -1,14 +1,7 @@
 import ctypes
-import sys
 import os
 import config as cfg
 
-if not os.path.exists(cfg.DLL_NAME):
-    print(f"CRITICAL ERROR: {cfg.DLL_NAME} missing!")
-    sys.exit(1)
-
-lib = ctypes.CDLL(os.path.abspath(cfg.DLL_NAME))
-
 class C_Zombie(ctypes.Structure):
     _fields_ = [("x", ctypes.c_float), ("y", ctypes.c_float), ("type", ctypes.c_int),
                 ("health", ctypes.c_float), ("max_health", ctypes.c_float),
@@ -21,35 +14,171 @@ class C_Plant(ctypes.Structure):
                 ("timer", ctypes.c_float), ("max_timer", ctypes.c_float)]
 
 class C_Projectile(ctypes.Structure):
-    _fields_ = [("x", ctypes.c_float), ("y", ctypes.c_float), ("is_frozen", ctypes.c_int)]
+    _fields_ = [("x", ctypes.c_float), ("y", ctypes.c_float), ("is_frozen", ctypes.c_int), ("id", ctypes.c_int)]
 
 class C_Effect(ctypes.Structure):
     _fields_ = [("x", ctypes.c_float), ("y", ctypes.c_float), ("type", ctypes.c_int), ("timer", ctypes.c_float)]
 
-lib.Engine_Create.restype = ctypes.c_void_p
-lib.Engine_Destroy.argtypes = [ctypes.c_void_p]
-lib.Engine_LoadLevel.argtypes = [ctypes.c_void_p, ctypes.c_int]
-lib.Engine_Update.argtypes = [ctypes.c_void_p, ctypes.c_float]
-lib.Engine_TryBuildPlant.argtypes = [ctypes.c_void_p, ctypes.c_float, ctypes.c_float, ctypes.c_int]
-lib.Engine_RemovePlant.argtypes = [ctypes.c_void_p, ctypes.c_float, ctypes.c_float]
-
-lib.Engine_GetMoney.argtypes = [ctypes.c_void_p]; lib.Engine_GetMoney.restype = ctypes.c_int
-lib.Engine_GetLives.argtypes = [ctypes.c_void_p]; lib.Engine_GetLives.restype = ctypes.c_int
-lib.Engine_GetMapWidth.argtypes = [ctypes.c_void_p]; lib.Engine_GetMapWidth.restype = ctypes.c_int
-lib.Engine_GetMapHeight.argtypes = [ctypes.c_void_p]; lib.Engine_GetMapHeight.restype = ctypes.c_int
-lib.Engine_IsLevelComplete.argtypes = [ctypes.c_void_p]; lib.Engine_IsLevelComplete.restype = ctypes.c_bool
-lib.Engine_IsGameOver.argtypes = [ctypes.c_void_p]; lib.Engine_IsGameOver.restype = ctypes.c_bool
-
-lib.Engine_GetZombieCount.argtypes = [ctypes.c_void_p]; lib.Engine_GetZombieCount.restype = ctypes.c_int
-lib.Engine_GetZombieData.argtypes = [ctypes.c_void_p, ctypes.c_int, ctypes.POINTER(C_Zombie)]
-lib.Engine_GetPlantCount.argtypes = [ctypes.c_void_p]; lib.Engine_GetPlantCount.restype = ctypes.c_int
-lib.Engine_GetPlantData.argtypes = [ctypes.c_void_p, ctypes.c_int, ctypes.POINTER(C_Plant)]
-lib.Engine_GetProjectileCount.argtypes = [ctypes.c_void_p]; lib.Engine_GetProjectileCount.restype = ctypes.c_int
-lib.Engine_GetProjectileData.argtypes = [ctypes.c_void_p, ctypes.c_int, ctypes.POINTER(C_Projectile)]
-
-lib.Engine_GetEffectCount.argtypes = [ctypes.c_void_p]; lib.Engine_GetEffectCount.restype = ctypes.c_int
-lib.Engine_GetEffectData.argtypes = [ctypes.c_void_p, ctypes.c_int, ctypes.POINTER(C_Effect)]
-lib.Engine_GetCardCooldownPct.argtypes = [ctypes.c_void_p, ctypes.c_int]; lib.Engine_GetCardCooldownPct.restype = ctypes.c_float
-
-lib.Engine_GetSoundCount.argtypes = [ctypes.c_void_p]; lib.Engine_GetSoundCount.restype = ctypes.c_int
-lib.Engine_GetSoundData.argtypes = [ctypes.c_void_p, ctypes.c_int]; lib.Engine_GetSoundData.restype = ctypes.c_int
\ No newline at end of file
+class C_Snapshot(ctypes.Structure):
+    _fields_ = [("zombies", ctypes.POINTER(C_Zombie)), ("zombie_capacity", ctypes.c_int), ("zombie_count", ctypes.c_int),
+                ("plants", ctypes.POINTER(C_Plant)), ("plant_capacity", ctypes.c_int), ("plant_count", ctypes.c_int),
+                ("projectiles", ctypes.POINTER(C_Projectile)), ("projectile_capacity", ctypes.c_int), ("projectile_count", ctypes.c_int),
+                ("effects", ctypes.POINTER(C_Effect)), ("effect_capacity", ctypes.c_int), ("effect_count", ctypes.c_int),
+                ("card_cooldowns", ctypes.POINTER(ctypes.c_float)), ("card_capacity", ctypes.c_int), ("card_count", ctypes.c_int),
+                ("sounds", ctypes.POINTER(ctypes.c_int)), ("sound_capacity", ctypes.c_int), ("sound_count", ctypes.c_int),
+                ("money", ctypes.c_int), ("lives", ctypes.c_int), ("level_complete", ctypes.c_int), ("game_over", ctypes.c_int)]
+
+# EngineStats.h: counters and phase times (seconds) of the last Engine_Update.
+class C_Stats(ctypes.Structure):
+    _fields_ = [("steps", ctypes.c_int),
+                ("zombies", ctypes.c_int), ("plants", ctypes.c_int), ("projectiles", ctypes.c_int), ("effects", ctypes.c_int),
+                ("collision_tests", ctypes.c_int), ("target_scans", ctypes.c_int),
+                ("allocations", ctypes.c_int), ("erased", ctypes.c_int),
+                ("time_waves", ctypes.c_double), ("time_zombies", ctypes.c_double), ("time_plants", ctypes.c_double),
+                ("time_projectiles", ctypes.c_double), ("time_compact", ctypes.c_double), ("time_total", ctypes.c_double)]
+
+# Every function bound below; an older build of the .dll lacks some of them.
+EXPORTS = ("Engine_Create", "Engine_Destroy", "Engine_LoadLevel", "Engine_LoadLevelFromMemory",
+           "Engine_Update", "Engine_SetSeed", "Engine_GetStateHash", "Engine_SaveState",
+           "Engine_RestoreState", "Engine_Clone", "Engine_GetStats", "Engine_TryBuildPlant",
+           "Engine_RemovePlant", "Engine_GetMoney", "Engine_GetLives", "Engine_GetMapWidth",
+           "Engine_GetMapHeight", "Engine_GetActiveRows", "Engine_IsLevelComplete", "Engine_IsGameOver",
+           "Engine_GetZombieCount", "Engine_GetZombieData", "Engine_GetPlantCount", "Engine_GetPlantData",
+           "Engine_GetProjectileCount", "Engine_GetProjectileData", "Engine_GetEffectCount",
+           "Engine_GetEffectData", "Engine_GetCardCooldownPct", "Engine_GetSoundCount",
+           "Engine_GetSoundData", "Engine_GetSnapshot")
+
+
+def _load_native():
+    """TowerEngine.dll with its argument and result types set. Raises OSError if the file is
+    missing or is not a library for this platform (the shipped .dll is a Windows build), and
+    AttributeError if it was built from an older bridge.cpp."""
+    native = ctypes.CDLL(os.path.abspath(cfg.DLL_NAME))
+    missing = [name for name in EXPORTS if not hasattr(native, name)]
+    if missing: raise AttributeError(f"it lacks {', '.join(missing)}, rebuild it from TowerEngine/bridge.cpp")
+
+    native.Engine_Create.restype = ctypes.c_void_p
+    native.Engine_Destroy.argtypes = [ctypes.c_void_p]
+    native.Engine_LoadLevel.argtypes = [ctypes.c_void_p, ctypes.c_int]; native.Engine_LoadLevel.restype = ctypes.c_bool
+    native.Engine_LoadLevelFromMemory.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int]; native.Engine_LoadLevelFromMemory.restype = ctypes.c_bool
+    native.Engine_Update.argtypes = [ctypes.c_void_p, ctypes.c_float]
+    native.Engine_SetSeed.argtypes = [ctypes.c_void_p, ctypes.c_uint]
+    native.Engine_GetStateHash.argtypes = [ctypes.c_void_p]; native.Engine_GetStateHash.restype = ctypes.c_ulonglong
+    native.Engine_SaveState.argtypes = [ctypes.c_void_p, ctypes.POINTER(ctypes.c_char), ctypes.c_int]; native.Engine_SaveState.restype = ctypes.c_int
+    native.Engine_RestoreState.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int]; native.Engine_RestoreState.restype = ctypes.c_bool
+    native.Engine_Clone.argtypes = [ctypes.c_void_p]; native.Engine_Clone.restype = ctypes.c_void_p
+    native.Engine_GetStats.argtypes = [ctypes.c_void_p, ctypes.POINTER(C_Stats)]; native.Engine_GetStats.restype = ctypes.c_bool
+    native.Engine_TryBuildPlant.argtypes = [ctypes.c_void_p, ctypes.c_float, ctypes.c_float, ctypes.c_int]
+    native.Engine_RemovePlant.argtypes = [ctypes.c_void_p, ctypes.c_float, ctypes.c_float]
+
+    native.Engine_GetMoney.argtypes = [ctypes.c_void_p]; native.Engine_GetMoney.restype = ctypes.c_int
+    native.Engine_GetLives.argtypes = [ctypes.c_void_p]; native.Engine_GetLives.restype = ctypes.c_int
+    native.Engine_GetMapWidth.argtypes = [ctypes.c_void_p]; native.Engine_GetMapWidth.restype = ctypes.c_int
+    native.Engine_GetMapHeight.argtypes = [ctypes.c_void_p]; native.Engine_GetMapHeight.restype = ctypes.c_int
+    native.Engine_GetActiveRows.argtypes = [ctypes.c_void_p, ctypes.POINTER(ctypes.c_int), ctypes.c_int]; native.Engine_GetActiveRows.restype = ctypes.c_int
+    native.Engine_IsLevelComplete.argtypes = [ctypes.c_void_p]; native.Engine_IsLevelComplete.restype = ctypes.c_bool
+    native.Engine_IsGameOver.argtypes = [ctypes.c_void_p]; native.Engine_IsGameOver.restype = ctypes.c_bool
+
+    native.Engine_GetZombieCount.argtypes = [ctypes.c_void_p]; native.Engine_GetZombieCount.restype = ctypes.c_int
+    native.Engine_GetZombieData.argtypes = [ctypes.c_void_p, ctypes.c_int, ctypes.POINTER(C_Zombie)]
+    native.Engine_GetPlantCount.argtypes = [ctypes.c_void_p]; native.Engine_GetPlantCount.restype = ctypes.c_int
+    native.Engine_GetPlantData.argtypes = [ctypes.c_void_p, ctypes.c_int, ctypes.POINTER(C_Plant)]
+    native.Engine_GetProjectileCount.argtypes = [ctypes.c_void_p]; native.Engine_GetProjectileCount.restype = ctypes.c_int
+    native.Engine_GetProjectileData.argtypes = [ctypes.c_void_p, ctypes.c_int, ctypes.POINTER(C_Projectile)]
+
+    native.Engine_GetEffectCount.argtypes = [ctypes.c_void_p]; native.Engine_GetEffectCount.restype = ctypes.c_int
+    native.Engine_GetEffectData.argtypes = [ctypes.c_void_p, ctypes.c_int, ctypes.POINTER(C_Effect)]
+    native.Engine_GetCardCooldownPct.argtypes = [ctypes.c_void_p, ctypes.c_int]; native.Engine_GetCardCooldownPct.restype = ctypes.c_float
+
+    native.Engine_GetSoundCount.argtypes = [ctypes.c_void_p]; native.Engine_GetSoundCount.restype = ctypes.c_int
+    native.Engine_GetSoundData.argtypes = [ctypes.c_void_p, ctypes.c_int]; native.Engine_GetSoundData.restype = ctypes.c_int
+
+    native.Engine_GetSnapshot.argtypes = [ctypes.c_void_p, ctypes.POINTER(C_Snapshot)]; native.Engine_GetSnapshot.restype = ctypes.c_bool
+    return native
+
+
+try:
+    lib = _load_native()
+    NATIVE = True
+except (OSError, AttributeError) as e:
+    print(f"[WARN] {cfg.DLL_NAME} could not be loaded ({e}), using the Python engine.")
+    import py_engine as lib
+    NATIVE = False
+
+
+def get_stats(engine, out=None):
+    """Engine_GetStats into out (a C_Stats, reused if given)."""
+    if out is None: out = C_Stats()
+    lib.Engine_GetStats(engine, ctypes.byref(out))
+    return out
+
+
+def save_state(engine):
+    """The engine's whole state as bytes, for restore_state. Only the same build of the
+    same engine (.dll or py_engine) can read it back."""
+    n = lib.Engine_SaveState(engine, None, 0)
+    buf = ctypes.create_string_buffer(n)
+    lib.Engine_SaveState(engine, buf, n)
+    return buf.raw
+
+
+def restore_state(engine, state):
+    return bool(lib.Engine_RestoreState(engine, state, len(state)))
+
+
+def get_active_rows(engine):
+    n = lib.Engine_GetActiveRows(engine, None, 0)
+    rows = (ctypes.c_int * n)()
+    lib.Engine_GetActiveRows(engine, rows, n)
+    return list(rows)
+
+
+class Snapshot:
+    """Whole-frame engine state read with a single Engine_GetSnapshot call.
+
+    The arrays are owned here and reused between frames; they only grow when the
+    engine reports more entities than fit. After read(), zombies/plants/projectiles/
+    effects/card_cooldowns/sounds are ctypes array views over those buffers, so
+    indexing them does not copy anything.
+    """
+
+    # (pointer field, element type, initial capacity)
+    _ARRAYS = {"zombie": ("zombies", C_Zombie, 256), "plant": ("plants", C_Plant, 64),
+               "projectile": ("projectiles", C_Projectile, 256), "effect": ("effects", C_Effect, 32),
+               "card": ("card_cooldowns", ctypes.c_float, 8), "sound": ("sounds", ctypes.c_int, 64)}
+
+    def __init__(self):
+        self.raw = C_Snapshot()
+        self._buffers = {}
+        for kind, (_, _, cap) in self._ARRAYS.items():
+            self._reserve(kind, cap)
+        self._set_views()
+        self.money = 0; self.lives = 0
+        self.level_complete = False; self.game_over = False
+
+    def _reserve(self, kind, capacity):
+        field, elem, _ = self._ARRAYS[kind]
+        buf = (elem * capacity)()
+        self._buffers[kind] = buf
+        setattr(self.raw, field, ctypes.cast(buf, ctypes.POINTER(elem)))
+        setattr(self.raw, f"{kind}_capacity", capacity)
+
+    def _set_views(self):
+        for kind, (field, elem, _) in self._ARRAYS.items():
+            count = min(getattr(self.raw, f"{kind}_count"), getattr(self.raw, f"{kind}_capacity"))
+            setattr(self, field, (elem * count).from_buffer(self._buffers[kind]))
+
+    def read(self, engine):
+        while not lib.Engine_GetSnapshot(engine, ctypes.byref(self.raw)):
+            # False also means no engine; only retry when an array was actually too small.
+            grown = False
+            for kind in self._ARRAYS:
+                count, cap = getattr(self.raw, f"{kind}_count"), getattr(self.raw, f"{kind}_capacity")
+                if count > cap: self._reserve(kind, max(count, cap * 2)); grown = True
+            if not grown: raise ValueError("Engine_GetSnapshot failed with every array large enough")
+        self._set_views()
+        self.money = self.raw.money
+        self.lives = self.raw.lives
+        self.level_complete = bool(self.raw.level_complete)
+        self.game_over = bool(self.raw.game_over)
+        return self
@@ -5,22 +5,43 @@ import os
 import json
 import math
 import random
+import time
+
+import numpy as np
 
 import config as cfg
-from cpp_bridge import lib, C_Plant, C_Zombie, C_Projectile, C_Effect
+from cpp_bridge import lib, get_active_rows, save_state, restore_state
 from assets import AssetManager
 from save_system import load_progress, save_progress
+from simulation import SimulationThread
+from replay import Recorder, BUILD, REMOVE
+from profiler import FrameProfiler
+
+
+def build_plant(engine, x, y, card):
+    before = lib.Engine_GetPlantCount(engine)
+    lib.Engine_TryBuildPlant(engine, ctypes.c_float(x), ctypes.c_float(y), card)
+    return lib.Engine_GetPlantCount(engine) > before
+
+
+def remove_plant(engine, x, y):
+    before = lib.Engine_GetPlantCount(engine)
+    lib.Engine_RemovePlant(engine, ctypes.c_float(x), ctypes.c_float(y))
+    return lib.Engine_GetPlantCount(engine) < before
 
 
 class GameApp:
-    def __init__(self):
+    def __init__(self, size=None):
+        # size: window size instead of fullscreen at the desktop resolution (benchmark.py).
         pygame.init()
         pygame.mixer.init()
 
-        self.screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+        self.screen = pygame.display.set_mode(size) if size else pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
         self.W, self.H = self.screen.get_size()
 
         self.am = AssetManager(self.W, self.H)
+        self.am.prefetch("level_select")
+        self.am.prefetch("game")
 
         self.title_font = self.am.fonts["title"]
         self.menu_font = self.am.fonts["menu"]
@@ -30,6 +51,12 @@ class GameApp:
 
         self.clock = pygame.time.Clock()
         self.engine = lib.Engine_Create()
+        self.sim = SimulationThread(self.engine)
+        self.sim.start()
+        self.snapshot = self.prev_snapshot = self.sim.curr
+        self.alpha = 1.0
+        self.prof = FrameProfiler({"surface_allocs": self.am.surface_allocs})
+        self.sim.profiler = self.prof
 
         self.is_muted = False
         self.is_music_muted = False
@@ -40,6 +67,7 @@ class GameApp:
         self.unlocked_level = progress.get("unlocked_level", 1)
         self.available_plants_count = progress.get("plants_count", 1)
         self.is_shovel_unlocked = self.unlocked_level > 4
+        self.am.prefetch(f"level_{self.unlocked_level if self.unlocked_level <= 8 else 1}")
 
         self.state = "MAIN_MENU"
         self.current_level = 1
@@ -54,6 +82,22 @@ class GameApp:
         self.just_unlocked_item = None
         self.prev_zombie_count = 0
 
+        self.static_layer = pygame.Surface((self.W, self.H)).convert()
+        self.static_key = None
+        self.card_rects = []
+        self.card_price_txt = []
+        self.tile_highlight = {}
+        for shovel, col in ((False, (255, 255, 255)), (True, (255, 100, 100))):
+            s = pygame.Surface((cfg.PY_TILE_W, cfg.PY_TILE_H)); s.set_alpha(80); s.fill(col)
+            self.tile_highlight[shovel] = s
+        self.dirty_rects = None
+        self.record_dtypes = {}
+        self.frozen_frame = None
+        # (level, engine state right after loading it), for restarts.
+        self.level_start = None
+        self.money_shown = None
+        self.money_txt = None
+
         self.init_ui_elements()
         self.play_music("menu")
 
@@ -102,31 +146,54 @@ class GameApp:
         self.pause_btn = pygame.Rect(self.W - 70, 10, 60, 60)
         self.sound_btn = pygame.Rect(self.W - 140, 10, 60, 60)
         self.music_btn = pygame.Rect(self.W - 210, 10, 60, 60)
+        self.speed_btn = pygame.Rect(self.W - 280, 10, 60, 60)
         self.shovel_btn = pygame.Rect(self.W - 100, self.H - 100, 80, 80)
 
-    def load_level(self, lvl):
+    def load_level(self, lvl, restart=False):
+        # restart: PAUSE -> RESTART and GAMEOVER -> RETRY put the engine back to the state
+        # saved when the level was loaded instead of loading it again.
         safe_lvl = lvl
         if safe_lvl > 8: safe_lvl = 1
-
-        lib.Engine_LoadLevel(self.engine, safe_lvl)
-        p = f"levels/level_{safe_lvl}.json"
-        self.active_rows = []
-        if os.path.exists(p):
-            try:
-                import json
-                d = json.load(open(p))
-                self.active_rows = d.get("settings", {}).get("active_rows", list(range(5)))
-            except:
-                self.active_rows = list(range(5))
-        else:
-            self.active_rows = list(range(5))
-        self.map_w = lib.Engine_GetMapWidth(self.engine)
-        self.map_h = lib.Engine_GetMapHeight(self.engine)
+        self.am.load_group("game")
+        self.am.load_group(f"level_{lvl}")
+
+        self.sim.set_running(False)
+        self.sim.end_recording()
+        seed = random.getrandbits(32)
+        with self.sim.lock:
+            if restart and self.level_start and self.level_start[0] == safe_lvl \
+                    and restore_state(self.engine, self.level_start[1]):
+                # Nothing has drawn from the RNG yet at that point, so reseeding it gives
+                # the same state as loading the level with the new seed.
+                lib.Engine_SetSeed(self.engine, seed)
+            else:
+                lib.Engine_SetSeed(self.engine, seed)
+                # As before, a level that fails to load leaves the engine as it was and play goes
+                # on; that state is just not kept as the point RESTART and RETRY go back to.
+                if lib.Engine_LoadLevel(self.engine, safe_lvl):
+                    self.level_start = (safe_lvl, save_state(self.engine))
+                else:
+                    print(f"[WARN] Level {safe_lvl} failed to load.")
+                    self.level_start = None
+            self.active_rows = get_active_rows(self.engine)
+            self.map_w = lib.Engine_GetMapWidth(self.engine)
+            self.map_h = lib.Engine_GetMapHeight(self.engine)
+        self.sim.reset()
+        if cfg.RECORD_REPLAYS:
+            name = f"level{safe_lvl}_{time.strftime('%Y%m%d-%H%M%S')}_{seed:08x}.pvzr"
+            self.sim.recorder = Recorder(os.path.join(cfg.REPLAY_DIR, name), safe_lvl, seed, self.sim.dt,
+                                         keep=cfg.REPLAY_KEEP)
         self.is_shovel_active = False
         self.prev_zombie_count = 0
-        self.played_effects_timers = []
+        self.snapshot = self.prev_snapshot = self.sim.curr
+        self.alpha = 1.0
         self.play_music("game")
 
+    def cycle_speed(self):
+        speeds = cfg.GAME_SPEEDS
+        self.sim.speed = speeds[(speeds.index(self.sim.speed) + 1) % len(speeds)] if self.sim.speed in speeds else 1
+        self.play_sound("click")
+
     def get_screen_pos(self, cpp_x, cpp_y):
         grid_x = cpp_x / cfg.C_TILE_W
         grid_y = cpp_y / cfg.C_TILE_H
@@ -134,6 +201,31 @@ class GameApp:
         screen_y = cfg.GRID_OFFSET_Y + grid_y * cfg.PY_TILE_H
         return int(screen_x), int(screen_y)
 
+    def records(self, rows):
+        # Zero-copy numpy view of a snapshot array; the dtype is cached per struct type since
+        # building it from the ctypes fields costs more than the rest of the frame's math.
+        elem = rows._type_
+        dt = self.record_dtypes.get(elem)
+        if dt is None: dt = self.record_dtypes[elem] = np.dtype(elem)
+        return np.frombuffer(rows, dtype=dt)
+
+    def screen_positions(self, rows, prev=None):
+        # get_screen_pos for a whole snapshot array at once: (lanes, xs, ys) as int lists.
+        # With prev, entities found there by id are placed self.alpha of the way from their
+        # previous position; rows are in spawn order, so ids are ascending in both arrays.
+        if not len(rows): return [], [], []
+        a = self.records(rows)
+        x = a["x"].astype(np.float64); y = a["y"].astype(np.float64)
+        if prev is not None and len(prev) and self.alpha < 1.0:
+            b = self.records(prev)
+            j = np.minimum(np.searchsorted(b["id"], a["id"]), len(b) - 1)
+            seen = b["id"][j] == a["id"]
+            x = np.where(seen, b["x"][j] + (x - b["x"][j]) * self.alpha, x)
+            y = np.where(seen, b["y"][j] + (y - b["y"][j]) * self.alpha, y)
+        xs = (cfg.GRID_OFFSET_X + x / cfg.C_TILE_W * cfg.PY_TILE_W).astype(int)
+        ys = (cfg.GRID_OFFSET_Y + y / cfg.C_TILE_H * cfg.PY_TILE_H).astype(int)
+        return (y // cfg.C_TILE_H).astype(int).tolist(), xs.tolist(), ys.tolist()
+
     def get_cpp_pos_from_screen(self, mx, my):
         rel_x = mx - cfg.GRID_OFFSET_X
         rel_y = my - cfg.GRID_OFFSET_Y
@@ -176,7 +268,7 @@ class GameApp:
                 if self.btn_levels.collidepoint(mx, my):
                     self.play_sound("click");
                     self.state = "LEVEL_SELECT"
-                if self.btn_exit.collidepoint(mx, my): lib.Engine_Destroy(self.engine); pygame.quit(); sys.exit()
+                if self.btn_exit.collidepoint(mx, my): self.quit()
 
         elif self.state == "LEVEL_SELECT":
             if event.type == pygame.MOUSEBUTTONDOWN:
@@ -199,6 +291,8 @@ class GameApp:
                 if event.key == pygame.K_s and self.is_shovel_unlocked:
                     self.is_shovel_active = not self.is_shovel_active
                     self.play_sound("shovel" if self.is_shovel_active else "click")
+                if event.key == pygame.K_f:
+                    self.cycle_speed()
 
             if event.type == pygame.MOUSEBUTTONDOWN:
                 if event.button == 3: self.is_shovel_active = False; return
@@ -209,6 +303,10 @@ class GameApp:
                     pygame.mixer.music.pause()
                     return
 
+                if self.speed_btn.collidepoint(mx, my):
+                    self.cycle_speed()
+                    return
+
                 if self.is_shovel_unlocked and self.shovel_btn.collidepoint(mx, my):
                     self.is_shovel_active = not self.is_shovel_active
                     self.play_sound("shovel" if self.is_shovel_active else "click")
@@ -232,17 +330,13 @@ class GameApp:
                         c_y = gy * cfg.C_TILE_H + cfg.C_TILE_H / 2
 
                         if self.is_shovel_active:
-                            cnt_before = lib.Engine_GetPlantCount(self.engine)
-                            lib.Engine_RemovePlant(self.engine, ctypes.c_float(c_x), ctypes.c_float(c_y))
-                            cnt_after = lib.Engine_GetPlantCount(self.engine)
-                            if cnt_after < cnt_before: self.play_sound("dig")
+                            self.sim.submit(remove_plant, c_x, c_y, then=lambda ok: ok and self.play_sound("dig"),
+                                            record=(REMOVE, 0, gx, gy))
                             self.is_shovel_active = False
                         else:
-                            cnt_before = lib.Engine_GetPlantCount(self.engine)
-                            lib.Engine_TryBuildPlant(self.engine, ctypes.c_float(c_x), ctypes.c_float(c_y),
-                                                     self.selected_plant)
-                            cnt_after = lib.Engine_GetPlantCount(self.engine)
-                            if cnt_after > cnt_before: self.play_sound("plant")
+                            self.sim.submit(build_plant, c_x, c_y, self.selected_plant,
+                                            then=lambda ok: ok and self.play_sound("plant"),
+                                            record=(BUILD, self.selected_plant, gx, gy))
 
         elif self.state == "PAUSE":
             if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
@@ -257,7 +351,7 @@ class GameApp:
                     if not self.is_music_muted: pygame.mixer.music.unpause()
                 elif pygame.Rect(cx - 100, cy + 30, 200, 60).collidepoint(mx, my):
                     self.play_sound("click");
-                    self.load_level(self.current_level);
+                    self.load_level(self.current_level, restart=True);
                     self.state = "GAME"
                 elif pygame.Rect(cx - 100, cy + 110, 200, 60).collidepoint(mx, my):
                     self.play_sound("click"); self.state = "MAIN_MENU"; self.play_music("menu")
@@ -283,7 +377,7 @@ class GameApp:
                     if self.state == "WIN":
                         self.current_level += 1
                         if self.current_level > 8: self.current_level = 1
-                    self.load_level(self.current_level);
+                    self.load_level(self.current_level, restart=self.state == "GAMEOVER");
                     self.state = "GAME"
                 elif btn2.collidepoint(mx, my):
                     self.play_sound("click"); self.state = "MAIN_MENU"; self.play_music("menu")
@@ -293,14 +387,13 @@ class GameApp:
         c = hover_col if rect.collidepoint(mx, my) else col
 
         if "btn_generic" in self.am.imgs:
-            img = self.am.imgs["btn_generic"]
-            img = pygame.transform.scale(img, (rect.width, rect.height))
+            img = self.am.transformed("btn_generic", rect.size)
             self.screen.blit(img, rect)
         else:
             pygame.draw.rect(self.screen, c, rect, border_radius=10)
 
         txt_col = cfg.TEXT_GREEN if rect.collidepoint(mx, my) else cfg.COLOR_BTN_TEXT
-        ts = self.menu_font.render(text, True, txt_col)
+        ts = self.am.texts.render(self.menu_font, text, txt_col)
         self.screen.blit(ts, (rect.centerx - ts.get_width() // 2, rect.centery - ts.get_height() // 2))
 
     def draw_toggle_btn(self, rect, is_on, name_on, name_off):
@@ -311,7 +404,7 @@ class GameApp:
             col = (0, 200, 0) if is_on else (200, 0, 0)
             pygame.draw.rect(self.screen, col, rect, border_radius=10)
             txt = "ON" if is_on else "OFF"
-            ts = self.std_font.render(txt, True, cfg.TEXT_WHITE)
+            ts = self.am.texts.render(self.std_font, txt, cfg.TEXT_WHITE)
             self.screen.blit(ts, (rect.x + 10, rect.y + 15))
 
     def draw_common_bg(self, key):
@@ -322,7 +415,7 @@ class GameApp:
 
     def draw_main_menu(self):
         self.draw_common_bg("menu_bg")
-        t = self.title_font.render(cfg.GAME_TITLE, True, cfg.COLOR_HEADER)
+        t = self.am.texts.render(self.title_font, cfg.GAME_TITLE, cfg.COLOR_HEADER)
         self.screen.blit(t, (self.W // 2 - t.get_width() // 2, 100))
 
         disp_lvl = self.unlocked_level
@@ -336,20 +429,13 @@ class GameApp:
 
     def draw_level_select(self):
         self.draw_common_bg("level_select_bg")
-        t = self.title_font.render("SELECT LEVEL", True, cfg.COLOR_HEADER)
+        t = self.am.texts.render(self.title_font, "SELECT LEVEL", cfg.COLOR_HEADER)
         self.screen.blit(t, (self.W // 2 - t.get_width() // 2, 50))
         self.draw_button(self.btn_back, "BACK")
         for b in self.level_buttons:
             l = b["lvl"] > self.unlocked_level
             if "btn_generic" in self.am.imgs:
-                img = self.am.imgs["btn_generic"]
-                img = pygame.transform.scale(img, (b["rect"].width, b["rect"].height))
-
-                if l:
-                    s = pygame.Surface((b["rect"].width, b["rect"].height));
-                    s.set_alpha(150);
-                    s.fill((0, 0, 0))
-                    img.blit(s, (0, 0))
+                img = self.am.transformed("btn_generic_locked" if l else "btn_generic", b["rect"].size)
 
                 self.screen.blit(img, b["rect"])
             else:
@@ -359,14 +445,12 @@ class GameApp:
             mx, my = pygame.mouse.get_pos()
             hover = b["rect"].collidepoint(mx, my) and not l
             tcol = cfg.TEXT_GREEN if hover else cfg.COLOR_BTN_TEXT
-            ts = self.menu_font.render(str(b["lvl"]), True, tcol)
+            ts = self.am.texts.render(self.menu_font, str(b["lvl"]), tcol)
             self.screen.blit(ts, (b["rect"].centerx - ts.get_width() // 2, b["rect"].centery - ts.get_height() // 2))
 
     def draw_unlock_screen(self):
-        s = pygame.Surface((self.W, self.H));
-        s.fill((50, 50, 70));
-        self.screen.blit(s, (0, 0))
-        t = self.title_font.render("NEW ITEM UNLOCKED!", True, cfg.COLOR_HEADER)
+        self.screen.fill((50, 50, 70))
+        t = self.am.texts.render(self.title_font, "NEW ITEM UNLOCKED!", cfg.COLOR_HEADER)
         self.screen.blit(t, (self.W // 2 - t.get_width() // 2, 100))
         id = self.just_unlocked_item
         if id in cfg.UNLOCK_INFO:
@@ -374,278 +458,257 @@ class GameApp:
             ico = None
             if id == 4:
                 if "cursor_shovel" in self.am.imgs:
-                    ico = self.am.imgs["cursor_shovel"]
+                    ico = "cursor_shovel"
                 elif "btn_shovel" in self.am.imgs:
-                    ico = self.am.imgs["btn_shovel"]
+                    ico = "btn_shovel"
             else:
                 pid = id if id < 4 else id - 1
-                if f"plant_{pid}" in self.am.imgs: ico = self.am.imgs[f"plant_{pid}"]
+                if f"plant_{pid}" in self.am.imgs: ico = f"plant_{pid}"
             if ico:
-                sc = pygame.transform.scale(ico, (150, 150))
+                sc = self.am.transformed(ico, (150, 150))
                 ico_rect = sc.get_rect(center=(self.W // 2, self.H // 2 - 50))
                 self.screen.blit(sc, ico_rect)
 
-            n_txt = self.menu_font.render(n, True, cfg.TEXT_WHITE)
-            d_txt = self.std_font.render(d, True, (200, 200, 200))
+            n_txt = self.am.texts.render(self.menu_font, n, cfg.TEXT_WHITE)
+            d_txt = self.am.texts.render(self.std_font, d, (200, 200, 200))
             self.screen.blit(n_txt, (self.W // 2 - n_txt.get_width() // 2, self.H // 2 + 60))
             self.screen.blit(d_txt, (self.W // 2 - d_txt.get_width() // 2, self.H // 2 + 100))
         cx, cy = self.W // 2, self.H // 2 + 100
         self.draw_button(pygame.Rect(cx - 150, cy + 100, 140, 60), "NEXT LEVEL")
         self.draw_button(pygame.Rect(cx + 10, cy + 100, 140, 60), "MENU")
 
-    def draw_game_scene(self):
-        k = "bg_1"
-        if self.current_level == 2 or self.current_level == 3:
-            k = "bg_2"
-        elif self.current_level > 3:
-            k = "bg_3"
+    def update_static_layer(self):
+        # Background, card panel, card faces and prices only change with the level or the
+        # unlocked cards, so they are composited once and copied from here every frame.
+        k = AssetManager.level_background(self.current_level)
+        key = (k, self.available_plants_count)
+        if key == self.static_key: return False
+        self.static_key = key
 
+        layer = self.static_layer
         if k in self.am.imgs:
-            self.screen.blit(self.am.imgs[k], (0, 0))
+            layer.blit(self.am.imgs[k], (0, 0))
         else:
-            self.screen.fill((30, 30, 40))
+            layer.fill((30, 30, 40))
 
-        mx, my = pygame.mouse.get_pos()
-        gx, gy = self.get_cpp_pos_from_screen(mx, my)
-
-        for y in range(self.map_h):
-            for x in range(self.map_w):
-                if y in self.active_rows and x == gx and y == gy:
-                    col = (255, 100, 100) if self.is_shovel_active else (255, 255, 255)
-                    s = pygame.Surface((cfg.PY_TILE_W, cfg.PY_TILE_H))
-                    s.set_alpha(80);
-                    s.fill(col)
-                    self.screen.blit(s, (cfg.GRID_OFFSET_X + x * cfg.PY_TILE_W, cfg.GRID_OFFSET_Y + y * cfg.PY_TILE_H))
-
-        def draw_ent(key, obj, col, y_off=0, scale_f=1.0):
-            sx, sy = self.get_screen_pos(obj.x, obj.y)
-            if key in self.am.imgs:
-                img = self.am.imgs[key]
-                if scale_f != 1.0:
-                    w, h = img.get_size()
-                    img = pygame.transform.scale(img, (int(w * scale_f), int(h * scale_f)))
-                if "plant_1" in key:
-                    ang = math.sin(pygame.time.get_ticks() / 500.0) * 3
-                    img = pygame.transform.rotate(img, ang)
-                    if getattr(obj, 'timer', 0) > getattr(obj, 'max_timer', 0) - 1.0:
-                        if "plant_1_active" in self.am.imgs: img = self.am.imgs["plant_1_active"]
-                if "plant_2" in key:
-                    ang = math.sin(pygame.time.get_ticks() / 800.0) * 2
-                    img = pygame.transform.rotate(img, ang)
-                self.screen.blit(img, img.get_rect(center=(sx, sy + y_off)))
-            return sx, sy + y_off
-
-        cnt = lib.Engine_GetPlantCount(self.engine)
-        p = C_Plant()
-        current_time = pygame.time.get_ticks() / 1000.0
-        for i in range(cnt):
-            if lib.Engine_GetPlantData(self.engine, i, ctypes.byref(p)):
-                col = cfg.PLANT_COLS[p.type] if p.type < 6 else (255, 255, 255)
-                asset_key = f"plant_{p.type}"
-                sc = 1.0
-
-                if p.type == 0 and p.timer > p.max_timer - 0.2: sc = 1.15
-                if p.type == 2:
-                    if p.health < p.max_health * 0.33:
-                        asset_key = "plant_2_s3"
-                    elif p.health < p.max_health * 0.66:
-                        asset_key = "plant_2_s2"
-                    else:
-                        asset_key = "plant_2_s1"
-
-                if p.type == 3:
-                    if p.timer <= 0:
-                        asset_key = "plant_3_armed"
-                        if (
-                                int(current_time * 2) % 2 == 0) and "plant_3_blink" in self.am.imgs: asset_key = "plant_3_blink"
-                    else:
-                        if p.timer < 0.8 and self.am.imgs.get("anim_mine"):
-                            pct = 1.0 - (p.timer / 0.8)
-                            f = min(int(pct * 3), 2)
-                            img = self.am.imgs["anim_mine"][f]
-                            sx, sy = self.get_screen_pos(p.x, p.y)
-                            self.screen.blit(img, img.get_rect(center=(sx, sy)))
-                            continue
-                if p.type == 4:
-                    if self.am.imgs.get("anim_cherry_pulse"):
-                        pct = 1.0 - (p.timer / 0.8)
-                        f = min(int(pct * 5), 4)
-                        img = self.am.imgs["anim_cherry_pulse"][f]
-                        sx, sy = self.get_screen_pos(p.x, p.y)
-                        self.screen.blit(img, img.get_rect(center=(sx, sy)))
-                        continue
-                sx, sy = draw_ent(asset_key, p, col, 0, sc)
-
-        cnt = lib.Engine_GetZombieCount(self.engine)
-        z = C_Zombie()
+        card_gap = 10
+        ui_w = self.available_plants_count * (cfg.CARD_W + card_gap)
+        ui_x = (self.W - ui_w) // 2
+        if "ui_panel_bg" in self.am.imgs:
+            layer.blit(self.am.transformed("ui_panel_bg", (ui_w + 40, cfg.UI_HEIGHT)), (ui_x - 20, 0))
 
-        for i in range(cnt):
-            if lib.Engine_GetZombieData(self.engine, i, ctypes.byref(z)):
-                col = (100, 0, 150)
-                if z.type == 7: col = (255, 0, 0)
+        self.card_rects = []; self.card_price_txt = []
+        for i in range(self.available_plants_count):
+            r = pygame.Rect(ui_x + i * (cfg.CARD_W + card_gap), 10, cfg.CARD_W, cfg.CARD_H)
+            if "ui_card_bg" in self.am.imgs: layer.blit(self.am.imgs["ui_card_bg"], (r.x, r.y))
+            if f"icon_{i}" in self.am.imgs:
+                layer.blit(self.am.imgs[f"icon_{i}"], (r.x + cfg.CARD_ICON_OFF_X, r.y + cfg.CARD_ICON_OFF_Y))
+            txt = self.am.texts.render(self.small_font, str(cfg.PLANT_COSTS[i]), cfg.TEXT_BLACK)
+            layer.blit(txt, (r.x + cfg.CARD_COST_OFF_X, r.y + cfg.CARD_COST_OFF_Y))
+            self.card_rects.append(r); self.card_price_txt.append(txt)
 
-                is_frozen = (z.flags & 8) != 0
-                suffix = "norm"
-                if is_frozen:
-                    suffix = "frozen"
+        if "ui_sun_display" in self.am.imgs:
+            layer.blit(self.am.imgs["ui_sun_display"], (10, 10))
+            if "sun_icon" in self.am.imgs: layer.blit(self.am.imgs["sun_icon"], (15, 5))
+        return True
+
+    def draw_game_scene(self, restore=None):
+        # restore=None repaints the whole static layer; otherwise only those rects are
+        # repainted. Returns the rects drawn over the static layer this frame.
+        self.update_static_layer()
+        if restore is None:
+            self.screen.blit(self.static_layer, (0, 0))
+        else:
+            for r in restore: self.screen.blit(self.static_layer, r, r)
 
-                ak = f"zombie_{z.type}_{suffix}"
+        drawn = []
+        def blit(img, dest, area=None, special_flags=0):
+            drawn.append(self.screen.blit(img, dest, area, special_flags))
 
-                has_arm = (z.flags & 1)
-                has_paper = (z.flags & 2)
-                has_imp = (z.flags & 4)
-                armor = z.armor_state
+        mx, my = pygame.mouse.get_pos()
+        gx, gy = self.get_cpp_pos_from_screen(mx, my)
 
-                if z.type == 1:
-                    if armor == 1:
-                        ak = f"zombie_1_armor1_{suffix}"
-                    elif armor == 2:
-                        ak = f"zombie_1_armor2_{suffix}"
-                    else:
-                        ak = f"zombie_0_{suffix}"
-                elif z.type == 2:
-                    if armor == 1:
-                        ak = f"zombie_2_armor1_{suffix}"
-                    elif armor >= 2:
-                        ak = f"zombie_2_armor2_{suffix}"
-                    else:
-                        ak = f"zombie_0_{suffix}"
-                elif z.type == 3:
-                    if armor == 0:
-                        if not has_arm:
-                            ak = f"zombie_3_nohelm_noarm_{suffix}"
-                        else:
-                            ak = f"zombie_3_nohelm_{suffix}"
-                elif z.type == 4:
-                    if not has_paper:
-                        if not has_arm:
-                            ak = f"zombie_4_nopaper_noarm_{suffix}"
-                        else:
-                            ak = f"zombie_4_nopaper_{suffix}"
-                elif z.type == 6:
-                    ak = f"zombie_{z.type}_{suffix}"
+        if 0 <= gx < self.map_w and 0 <= gy < self.map_h and gy in self.active_rows:
+            s = self.tile_highlight[self.is_shovel_active]
+            blit(s, (cfg.GRID_OFFSET_X + gx * cfg.PY_TILE_W, cfg.GRID_OFFSET_Y + gy * cfg.PY_TILE_H))
+
+        def sprite(key, obj, scale_f=1.0):
+            if key not in self.am.imgs: return None
+            size, ang = None, 0.0
+            if scale_f != 1.0:
+                w, h = self.am.imgs[key].get_size()
+                size = (int(w * scale_f), int(h * scale_f))
+            if "plant_1" in key: ang = math.sin(pygame.time.get_ticks() / 500.0) * 3
+            if "plant_2" in key: ang = math.sin(pygame.time.get_ticks() / 800.0) * 2
+            img = self.am.transformed(key, size, ang)
+            if "plant_1" in key and getattr(obj, 'timer', 0) > getattr(obj, 'max_timer', 0) - 1.0:
+                if "plant_1_active" in self.am.imgs: img = self.am.imgs["plant_1_active"]
+            return img
+
+        # Render list: (lane, layer, surface, dest). Sorted by lane, then plants < zombies <
+        # projectiles, so lower rows overlap upper ones; drawn with one blits() call.
+        self.prof.lap("ui")
+        world = []
+        def add(lanes, xs, ys, i, layer, img, y_off=0):
+            world.append((lanes[i], layer, img, (xs[i] - img.get_width() // 2, ys[i] + y_off - img.get_height() // 2)))
+
+        snap = self.snapshot
+        plant_lut = self.am.plant_lut
+        current_time = pygame.time.get_ticks() / 1000.0
+        lanes, xs, ys = self.screen_positions(snap.plants)
+        for i, p in enumerate(snap.plants):
+            state = 0
+            sc = 1.0
+
+            if p.type == 0 and p.timer > p.max_timer - 0.2: sc = 1.15
+            if p.type == 2:
+                if p.health < p.max_health * 0.33: state = 2
+                elif p.health < p.max_health * 0.66: state = 1
+
+            if p.type == 3:
+                if p.timer <= 0:
+                    state = 2 if int(current_time * 2) % 2 == 0 else 1
                 else:
-                    if not has_arm: ak = f"zombie_{z.type}_noarm_{suffix}"
-
-                if ak not in self.am.imgs:
-                    if f"zombie_{z.type}_{suffix}" in self.am.imgs:
-                        ak = f"zombie_{z.type}_{suffix}"
-                    else:
-                        ak = f"zombie_{z.type}_norm"
-
-                sx, sy = draw_ent(ak, z, col, -20)
-
-        cnt = lib.Engine_GetProjectileCount(self.engine)
-        b = C_Projectile()
-        for i in range(cnt):
-            if lib.Engine_GetProjectileData(self.engine, i, ctypes.byref(b)):
-                k = "proj_0"
-                if b.is_frozen: k = "proj_1"
-                sx, sy = self.get_screen_pos(b.x, b.y)
-                if k in self.am.imgs: self.screen.blit(self.am.imgs[k], self.am.imgs[k].get_rect(center=(sx, sy)))
+                    if p.timer < 0.8 and self.am.imgs.get("anim_mine"):
+                        pct = 1.0 - (p.timer / 0.8)
+                        f = min(int(pct * 3), 2)
+                        add(lanes, xs, ys, i, 0, self.am.imgs["anim_mine"][f])
+                        continue
+            if p.type == 4:
+                if self.am.imgs.get("anim_cherry_pulse"):
+                    pct = 1.0 - (p.timer / 0.8)
+                    f = min(int(pct * 5), 4)
+                    add(lanes, xs, ys, i, 0, self.am.imgs["anim_cherry_pulse"][f])
+                    continue
+            asset_key = plant_lut[AssetManager.plant_index(p.type, state)] if p.type < 6 else None
+            img = sprite(asset_key, p, sc)
+            if img: add(lanes, xs, ys, i, 0, img)
+
+        self.prof.lap("plants")
+        zombie_lut = self.am.zombie_lut
+        lanes, xs, ys = self.screen_positions(snap.zombies, self.prev_snapshot.zombies)
+        if len(snap.zombies):
+            z = self.records(snap.zombies)
+            lut_idx = (z["type"] * AssetManager.ARMOR_STATES + z["armor_state"]) * AssetManager.ZOMBIE_FLAGS + (z["flags"] & 15)
+            for i, k in enumerate(lut_idx.tolist()):
+                img = zombie_lut[k]
+                if img: add(lanes, xs, ys, i, 1, img, -20)
+
+        self.prof.lap("zombies")
+        lanes, xs, ys = self.screen_positions(snap.projectiles, self.prev_snapshot.projectiles)
+        for i, b in enumerate(snap.projectiles):
+            k = "proj_0"
+            if b.is_frozen: k = "proj_1"
+            if k in self.am.imgs: add(lanes, xs, ys, i, 2, self.am.imgs[k])
+
+        self.prof.lap("projectiles")
+        world.sort(key=lambda e: (e[0], e[1]))
+        drawn.extend(self.screen.blits([(img, dest) for _, _, img, dest in world]))
+        self.prof.lap("world")
 
-        cnt = lib.Engine_GetEffectCount(self.engine)
-        eff = C_Effect()
         EXPLOSION_DURATION = 0.5
         CHERRY_DURATION = 1.2
         ICE_DURATION = 0.5
 
-        for i in range(cnt):
-            if lib.Engine_GetEffectData(self.engine, i, ctypes.byref(eff)):
-                sx, sy = self.get_screen_pos(eff.x, eff.y)
-                dur = EXPLOSION_DURATION
-                if eff.type == 1: dur = CHERRY_DURATION
-                if eff.type == 2: dur = ICE_DURATION
-
-                if eff.timer > dur - 0.05:
-                    if eff.type in [0, 1]: self.play_sound("cherry")
-                    if eff.type == 2: self.play_sound("freeze")
-
-                if eff.type == 0:
-                    if "expl_0" in self.am.imgs:
-                        sc = 1.0 + 0.5 * (1.0 - eff.timer / EXPLOSION_DURATION)
-                        im = pygame.transform.scale(self.am.imgs["expl_0"], (int(200 * sc), int(200 * sc)))
-                        self.screen.blit(im, im.get_rect(center=(sx, sy)))
-
-                elif eff.type == 1:
-                    if self.am.imgs.get("anim_cherry_expl"):
-                        tp = CHERRY_DURATION - eff.timer
-                        pct = max(0, min(1, tp / CHERRY_DURATION))
-                        f = min(int(pct * 8), 7)
-                        img = self.am.imgs["anim_cherry_expl"][f]
-                        self.screen.blit(img, img.get_rect(center=(sx, sy)))
-
-                elif eff.type == 2:
-                    s = pygame.Surface((150, 150), pygame.SRCALPHA)
-                    pygame.draw.circle(s, (0, 100, 255, 150), (75, 75),
-                                       int(60 * (1.0 + (1.0 - eff.timer / ICE_DURATION))))
-                    self.screen.blit(s, s.get_rect(center=(sx, sy)), special_flags=pygame.BLEND_RGBA_ADD)
-
-        card_gap = 10
-        ui_w = self.available_plants_count * (cfg.CARD_W + card_gap)
-        ui_x = (self.W - ui_w) // 2
-
-        if "ui_panel_bg" in self.am.imgs:
-            panel = pygame.transform.scale(self.am.imgs["ui_panel_bg"], (ui_w + 40, cfg.UI_HEIGHT))
-            self.screen.blit(panel, (ui_x - 20, 0))
-
-        for i in range(self.available_plants_count):
-            r = pygame.Rect(ui_x + i * (cfg.CARD_W + card_gap), 10, cfg.CARD_W, cfg.CARD_H)
-
-            if "ui_card_bg" in self.am.imgs: self.screen.blit(self.am.imgs["ui_card_bg"], (r.x, r.y))
-
-            if f"icon_{i}" in self.am.imgs:
-                self.screen.blit(self.am.imgs[f"icon_{i}"], (r.x + cfg.CARD_ICON_OFF_X, r.y + cfg.CARD_ICON_OFF_Y))
-
-            pct = lib.Engine_GetCardCooldownPct(self.engine, i)
+        # Effects go on top of every lane, also in one blits() call.
+        fx = []
+        _, xs, ys = self.screen_positions(snap.effects)
+        for i, eff in enumerate(snap.effects):
+            sx, sy = xs[i], ys[i]
+            if eff.type == 0:
+                if "expl_0" in self.am.imgs:
+                    sc = 1.0 + 0.5 * (1.0 - eff.timer / EXPLOSION_DURATION)
+                    d = int(200 * sc) // 4 * 4
+                    im = self.am.transformed("expl_0", (d, d))
+                    fx.append((im, im.get_rect(center=(sx, sy)), None, 0))
+
+            elif eff.type == 1:
+                if self.am.imgs.get("anim_cherry_expl"):
+                    tp = CHERRY_DURATION - eff.timer
+                    pct = max(0, min(1, tp / CHERRY_DURATION))
+                    f = min(int(pct * 8), 7)
+                    img = self.am.imgs["anim_cherry_expl"][f]
+                    fx.append((img, img.get_rect(center=(sx, sy)), None, 0))
+
+            elif eff.type == 2:
+                s = self.am.surfaces.scratch((150, 150), pygame.SRCALPHA)
+                s.fill((0, 0, 0, 0))
+                pygame.draw.circle(s, (0, 100, 255, 150), (75, 75),
+                                   int(60 * (1.0 + (1.0 - eff.timer / ICE_DURATION))))
+                fx.append((s, s.get_rect(center=(sx, sy)), None, pygame.BLEND_RGBA_ADD))
+        drawn.extend(self.screen.blits(fx))
+        self.prof.lap("effects")
+
+        for i, r in enumerate(self.card_rects):
+            pct = snap.card_cooldowns[i] if i < len(snap.card_cooldowns) else 0.0
             if pct > 0:
-                h = cfg.CARD_H * pct
-                s = pygame.Surface((cfg.CARD_W, h));
-                s.set_alpha(150);
-                s.fill((50, 50, 50))
-                self.screen.blit(s, r)
+                h = int(cfg.CARD_H * pct)
+                s = self.am.surfaces.overlay((cfg.CARD_W, cfg.CARD_H), (50, 50, 50), alpha=150)
+                blit(s, r, (0, 0, cfg.CARD_W, h))
+                blit(self.card_price_txt[i], (r.x + cfg.CARD_COST_OFF_X, r.y + cfg.CARD_COST_OFF_Y))
 
             if i == self.selected_plant and not self.is_shovel_active:
-                pygame.draw.rect(self.screen, (255, 255, 255), (r.x - 2, r.y - 2, r.width + 4, r.height + 4), 2)
+                drawn.append(pygame.draw.rect(self.screen, (255, 255, 255), (r.x - 2, r.y - 2, r.width + 4, r.height + 4), 2))
 
-            txt = self.small_font.render(str(cfg.PLANT_COSTS[i]), True, cfg.TEXT_BLACK)
-            self.screen.blit(txt, (r.x + cfg.CARD_COST_OFF_X, r.y + cfg.CARD_COST_OFF_Y))
-
-        money = lib.Engine_GetMoney(self.engine)
-        if "ui_sun_display" in self.am.imgs:
-            self.screen.blit(self.am.imgs["ui_sun_display"], (10, 10))
-            if "sun_icon" in self.am.imgs: self.screen.blit(self.am.imgs["sun_icon"], (15, 5))
-            mt = self.money_font.render(str(money), True, cfg.TEXT_WHITE)
-            self.screen.blit(mt, (80, 15))
-        else:
-            self.screen.blit(self.font.render(f"$: {money}", True, cfg.TEXT_WHITE), (20, 20))
+        if snap.money != self.money_shown:
+            self.money_shown = snap.money
+            label = str(snap.money) if "ui_sun_display" in self.am.imgs else f"$: {snap.money}"
+            self.money_txt = self.money_font.render(label, True, cfg.TEXT_WHITE)
+        blit(self.money_txt, (80, 15) if "ui_sun_display" in self.am.imgs else (20, 20))
 
         pi = self.am.imgs.get("btn_pause")
         if "btn_pause_hover" in self.am.imgs and self.pause_btn.collidepoint(mx, my): pi = self.am.imgs[
             "btn_pause_hover"]
-        if pi: self.screen.blit(pi, pi.get_rect(center=self.pause_btn.center))
+        if pi: blit(pi, pi.get_rect(center=self.pause_btn.center))
+
+        hover = self.speed_btn.collidepoint(mx, my)
+        if "btn_generic" in self.am.imgs:
+            blit(self.am.transformed("btn_generic", self.speed_btn.size), self.speed_btn)
+        else:
+            drawn.append(pygame.draw.rect(self.screen, (50, 255, 50) if hover else (0, 200, 0), self.speed_btn, border_radius=10))
+        ts = self.am.texts.render(self.std_font, f"{self.sim.speed}x", cfg.TEXT_GREEN if hover else cfg.COLOR_BTN_TEXT)
+        blit(ts, ts.get_rect(center=self.speed_btn.center))
 
         if self.is_shovel_unlocked:
             si = self.am.imgs.get("btn_shovel")
             if (self.is_shovel_active or self.shovel_btn.collidepoint(mx, my)) and "btn_shovel_hover" in self.am.imgs:
                 si = self.am.imgs["btn_shovel_hover"]
             if si:
-                self.screen.blit(si, si.get_rect(center=self.shovel_btn.center))
+                blit(si, si.get_rect(center=self.shovel_btn.center))
                 if self.is_shovel_active:
                     pygame.mouse.set_visible(False)
                     cur = self.am.imgs.get("cursor_shovel", si)
-                    self.screen.blit(cur, (mx - 30, my - 30))
+                    blit(cur, (mx - 30, my - 30))
                 else:
                     pygame.mouse.set_visible(True)
+        return drawn
+
+    def present_game_scene(self):
+        # Repaint and push to the display only what was drawn last frame and this frame.
+        restore = None if self.update_static_layer() else self.dirty_rects
+        drawn = self.draw_game_scene(restore)
+        if self.prof.visible: drawn.append(self.screen.blit(self.prof.overlay(), (10, cfg.UI_HEIGHT)))
+        self.prof.lap("ui")
+        if restore is None: pygame.display.flip()
+        else: pygame.display.update(restore + drawn)
+        self.prof.lap("present")
+        self.dirty_rects = drawn
+        self.frozen_frame = None
+
+    def draw_frozen_scene(self):
+        # PAUSE/WIN/GAMEOVER show the same scene under their overlays, so it is drawn once.
+        if self.frozen_frame is None:
+            self.draw_game_scene()
+            self.frozen_frame = self.screen.copy()
+        else:
+            self.screen.blit(self.frozen_frame, (0, 0))
 
     def draw_pause(self):
         if "pause_bg" in self.am.imgs:
             self.screen.blit(self.am.imgs["pause_bg"], (0, 0))
         else:
-            s = pygame.Surface((self.W, self.H), pygame.SRCALPHA);
-            s.fill((0, 0, 0, 180));
-            self.screen.blit(s, (0, 0))
-        t = self.title_font.render("PAUSED", True, cfg.COLOR_HEADER);
+            self.screen.blit(self.am.surfaces.overlay((self.W, self.H), (0, 0, 0, 180), pygame.SRCALPHA), (0, 0))
+        t = self.am.texts.render(self.title_font, "PAUSED", cfg.COLOR_HEADER);
         self.screen.blit(t, (self.W // 2 - t.get_width() // 2, self.H // 2 - 200))
         cx, cy = self.W // 2, self.H // 2
         self.draw_button(pygame.Rect(cx - 100, cy - 50, 200, 60), "RESUME")
@@ -655,32 +718,47 @@ class GameApp:
         self.draw_toggle_btn(self.music_btn, not self.is_music_muted, "btn_music_on", "btn_music_off")
 
     def draw_popup(self, t, b, c):
-        s = pygame.Surface((self.W, self.H), pygame.SRCALPHA);
-        s.fill((0, 0, 0, 200));
-        self.screen.blit(s, (0, 0))
-        tt = self.title_font.render(t, True, c);
+        self.screen.blit(self.am.surfaces.overlay((self.W, self.H), (0, 0, 0, 200), pygame.SRCALPHA), (0, 0))
+        tt = self.am.texts.render(self.title_font, t, c);
         self.screen.blit(tt, (self.W // 2 - tt.get_width() // 2, self.H // 3))
         cx, cy = self.W // 2, self.H // 2
         self.draw_button(pygame.Rect(cx - 150, cy, 140, 60), b)
         self.draw_button(pygame.Rect(cx + 10, cy, 140, 60), "MENU")
 
+    def quit(self):
+        self.sim.stop()
+        self.prof.close()
+        lib.Engine_Destroy(self.engine)
+        pygame.quit()
+        sys.exit()
+
     def run(self):
         while True:
-            dt = self.clock.tick(60) / 1000.0
+            self.prof.next_frame()
+            self.clock.tick(cfg.FPS_LIMIT)
+            self.prof.lap("wait")
+            self.am.poll()
+            self.am.surfaces.release()
             for e in pygame.event.get():
-                if e.type == pygame.QUIT: lib.Engine_Destroy(self.engine); pygame.quit(); sys.exit()
+                if e.type == pygame.QUIT: self.quit()
+                if e.type == pygame.KEYDOWN and e.key == pygame.K_F3: self.prof.toggle(); continue
                 self.handle_input(e)
+            self.prof.lap("events")
+
+            # The engine ticks on the simulation thread only while a level is being played.
+            self.sim.set_running(self.state == "GAME")
+            sounds = self.sim.poll()
 
             if self.state == "GAME":
-                lib.Engine_Update(self.engine, ctypes.c_float(dt))
+                self.prev_snapshot, snap, self.alpha = self.sim.frame()
+                self.snapshot = snap
+                self.prof.lap("bridge")
 
                 if pygame.time.get_ticks() > self.next_groan_time:
                     self.play_random_zombie()
                     self.next_groan_time = pygame.time.get_ticks() + random.randint(5000, 12000)
 
-                snd_cnt = lib.Engine_GetSoundCount(self.engine)
-                for i in range(snd_cnt):
-                    s_id = lib.Engine_GetSoundData(self.engine, i)
+                for s_id in sounds:
                     if s_id == 1:
                         self.play_sound("pea_hit")
                     elif s_id == 2:
@@ -698,8 +776,10 @@ class GameApp:
                         self.play_sound("paper_rip")
                     elif s_id == 8:
                         self.play_sound("zombie_angry")
+                    elif s_id == 9:
+                        self.play_sound("freeze")
 
-                if lib.Engine_IsLevelComplete(self.engine):
+                if snap.level_complete:
                     is_new_clear = (self.current_level == self.unlocked_level)
 
                     save_progress(self.current_level)
@@ -717,23 +797,30 @@ class GameApp:
                     self.available_plants_count = p.get("plants_count", 1)
                     self.is_shovel_unlocked = self.unlocked_level > 4
 
-                if lib.Engine_IsGameOver(self.engine):
+                if snap.game_over:
                     self.state = "GAMEOVER"
                     self.play_sound("lose")
+                self.prof.lap("events")
+
+            if self.state == "GAME":
+                self.present_game_scene()
+                continue
 
+            self.dirty_rects = None
             self.screen.fill((30, 30, 40))
             if self.state == "MAIN_MENU":
                 self.draw_main_menu()
             elif self.state == "LEVEL_SELECT":
                 self.draw_level_select()
-            elif self.state == "GAME":
-                self.draw_game_scene()
             elif self.state == "PAUSE":
-                self.draw_game_scene(); self.draw_pause()
+                self.draw_frozen_scene(); self.draw_pause()
             elif self.state == "WIN":
-                self.draw_game_scene(); self.draw_popup("LEVEL COMPLETE!", "NEXT", cfg.COLOR_HEADER)
+                self.draw_frozen_scene(); self.draw_popup("LEVEL COMPLETE!", "NEXT", cfg.COLOR_HEADER)
             elif self.state == "GAMEOVER":
-                self.draw_game_scene(); self.draw_popup("GAME OVER", "RETRY", (255, 0, 0))
+                self.draw_frozen_scene(); self.draw_popup("GAME OVER", "RETRY", (255, 0, 0))
             elif self.state == "UNLOCK":
                 self.draw_unlock_screen()
-            pygame.display.flip()
\ No newline at end of file
+            if self.prof.visible: self.screen.blit(self.prof.overlay(), (10, cfg.UI_HEIGHT))
+            self.prof.lap("ui")
+            pygame.display.flip()
+            self.prof.lap("present")
\ No newline at end of file
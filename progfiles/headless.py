@@ -0,0 +1,166 @@
+"""Runs levels without a display, audio or assets, as fast as the engine allows.
+
+Run it from this folder, the same way as main.py:
+
+    python headless.py 1 2 3
+    python headless.py --all --actions actions.json
+
+An actions file is a JSON list, or a dict of lists keyed by level number:
+
+    [{"time": 0.5, "action": "build", "card": 1, "col": 0, "row": 2, "wait": true},
+     {"time": 30.0, "action": "remove", "col": 0, "row": 2}]
+
+A build with "wait" set is retried every tick until it succeeds (not enough
+money or the card still cooling down), otherwise it is tried once.
+"""
+import argparse
+import ctypes
+import glob
+import json
+import os
+import re
+import sys
+import time
+
+import config as cfg
+from cpp_bridge import lib, C_Stats, get_stats
+
+DEFAULT_DT = 1.0 / 60.0
+DEFAULT_MAX_TIME = 600.0
+
+
+def cell_center(col, row):
+    return col * cfg.C_TILE_W + cfg.C_TILE_W / 2, row * cfg.C_TILE_H + cfg.C_TILE_H / 2
+
+
+def level_ids():
+    ids = []
+    for p in glob.glob("levels/level_*.json"):
+        m = re.search(r"level_(\d+)\.json$", p)
+        if m: ids.append(int(m.group(1)))
+    return sorted(ids)
+
+
+def load_actions(path, level):
+    with open(path) as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        return data.get(str(level), [])
+    return data
+
+
+def apply_action(engine, action):
+    """Returns True once the action is finished with, False to retry it next tick."""
+    x, y = cell_center(action["col"], action["row"])
+    if action["action"] == "build":
+        before = lib.Engine_GetPlantCount(engine)
+        lib.Engine_TryBuildPlant(engine, ctypes.c_float(x), ctypes.c_float(y), action.get("card", 0))
+        return lib.Engine_GetPlantCount(engine) > before or not action.get("wait", False)
+    if action["action"] == "remove":
+        lib.Engine_RemovePlant(engine, ctypes.c_float(x), ctypes.c_float(y))
+        return True
+    raise ValueError(f"unknown action: {action['action']}")
+
+
+# Engine_GetStats fields summed over a run by run_level(stats=True).
+SUMMED_STATS = ("collision_tests", "target_scans", "allocations", "erased",
+                "time_waves", "time_zombies", "time_plants", "time_projectiles", "time_compact", "time_total")
+
+
+def run_level(level, actions=(), dt=DEFAULT_DT, max_time=DEFAULT_MAX_TIME, engine=None, level_text=None, stats=False):
+    # level_text (bytes of a level file) is loaded from memory instead of levels/level_N.json.
+    # stats: also sum the engine's per-tick counters and phase times into the result.
+    own_engine = engine is None
+    if own_engine: engine = lib.Engine_Create()
+    try:
+        if level_text is not None: loaded = lib.Engine_LoadLevelFromMemory(engine, level_text, len(level_text))
+        else: loaded = lib.Engine_LoadLevel(engine, level)
+        if not loaded: raise ValueError(f"level {level} could not be loaded")
+        script = sorted(actions, key=lambda a: a.get("time", 0.0))
+        cursor = 0
+        waiting = []
+        max_ticks = int(max_time / dt)
+        c_dt = ctypes.c_float(dt)
+        ticks = 0
+        done = False
+        tick_stats = C_Stats()
+        totals = dict.fromkeys(SUMMED_STATS, 0)
+        peak = 0
+
+        start = time.perf_counter()
+        while ticks < max_ticks:
+            now = ticks * dt
+            while cursor < len(script) and script[cursor].get("time", 0.0) <= now:
+                waiting.append(script[cursor]); cursor += 1
+            if waiting:
+                waiting = [a for a in waiting if not apply_action(engine, a)]
+
+            lib.Engine_Update(engine, c_dt)
+            ticks += 1
+            if stats:
+                get_stats(engine, tick_stats)
+                for k in SUMMED_STATS: totals[k] += getattr(tick_stats, k)
+                peak = max(peak, tick_stats.zombies + tick_stats.plants + tick_stats.projectiles)
+            if lib.Engine_IsLevelComplete(engine) or lib.Engine_IsGameOver(engine):
+                done = True
+                break
+        elapsed = time.perf_counter() - start
+
+        if lib.Engine_IsLevelComplete(engine): outcome = "win"
+        elif done: outcome = "lose"
+        else: outcome = "timeout"
+
+        result = {
+            "level": level,
+            "outcome": outcome,
+            "time": ticks * dt,
+            "lives": lib.Engine_GetLives(engine),
+            "money": lib.Engine_GetMoney(engine),
+            "ticks": ticks,
+            "ticks_per_sec": ticks / elapsed if elapsed > 0 else float("inf"),
+        }
+        if stats: result["stats"] = dict(totals, peak_entities=peak)
+        return result
+    finally:
+        if own_engine: lib.Engine_Destroy(engine)
+
+
+def format_result(r):
+    line = (f"level {r['level']:>3}  {r['outcome']:<7}  t={r['time']:8.2f}s  lives={r['lives']:<3}"
+            f"  money={r['money']:<6}  {r['ticks_per_sec']:12.0f} ticks/s")
+    if "stats" in r:
+        s, n = r["stats"], max(r["ticks"], 1)
+        total = s["time_total"] or 1.0
+        phases = "  ".join(f"{k[5:]} {s[k] / total:4.0%}" for k in SUMMED_STATS[4:-1])
+        line += (f"\n          {s['time_total'] / n * 1e6:8.1f} us/tick  {phases}"
+                 f"\n          per tick: {s['collision_tests'] / n:.1f} pair tests  {s['target_scans'] / n:.1f} target scans"
+                 f"  {s['allocations'] / n:.2f} allocs  {s['erased'] / n:.2f} erased  peak {s['peak_entities']} entities")
+    return line
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run levels headless at a fixed timestep.")
+    parser.add_argument("levels", nargs="*", type=int, help="level numbers to run")
+    parser.add_argument("--all", action="store_true", help="run every levels/level_*.json")
+    parser.add_argument("--actions", help="JSON file with scripted build/remove actions")
+    parser.add_argument("--dt", type=float, default=DEFAULT_DT, help="fixed timestep in seconds")
+    parser.add_argument("--max-time", type=float, default=DEFAULT_MAX_TIME, help="give up after this much game time")
+    parser.add_argument("--stats", action="store_true", help="print the engine's phase times and counters per level")
+    args = parser.parse_args(argv)
+
+    levels = level_ids() if args.all else args.levels
+    if not levels:
+        parser.error("no levels given (pass level numbers or --all)")
+
+    engine = lib.Engine_Create()
+    try:
+        for lvl in levels:
+            actions = load_actions(args.actions, lvl) if args.actions else []
+            print(format_result(run_level(lvl, actions, args.dt, args.max_time, engine, stats=args.stats)))
+    finally:
+        lib.Engine_Destroy(engine)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+"""Per-frame phase timings for the game loop, with an overlay and a rolling export.
+
+The render loop calls next_frame() once per frame and lap(phase) after each phase;
+a lap charges the time since the previous lap to that phase. The simulation thread
+reports its own work with add(); it is charged to the frame in which it finished.
+Counters (ctypes calls, surface allocations) are sampled as totals once per frame
+and stored as per-frame deltas. The simulation thread also hands over the engine's
+own Engine_GetStats after every tick (add_stats): its phase times and counters are
+summed per frame, and the entity count is the last one seen.
+
+Nothing is measured while the profiler is neither shown (F3) nor exporting
+(cfg.PROFILE_EXPORT = "csv" or "jsonl").
+"""
+import csv
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import pygame
+
+import config as cfg
+import cpp_bridge
+
+PHASES = ("wait", "events", "bridge", "plants", "zombies", "projectiles", "world", "effects", "ui", "present",
+          "engine", "snapshot")
+ENGINE_PHASES = ("sim_waves", "sim_zombies", "sim_plants", "sim_projectiles", "sim_compact")
+COUNTERS = ("ctypes_calls", "surface_allocs")
+ENGINE_COUNTERS = ("entities", "collision_tests", "target_scans", "allocations", "erased")
+TIMES = ("frame",) + PHASES + ENGINE_PHASES
+COUNTS = COUNTERS + ENGINE_COUNTERS
+
+
+class CallCounter:
+    """Wraps every Engine_* function of cpp_bridge.lib in place to count the calls made."""
+    def __init__(self):
+        self.calls = 0
+        self.originals = {}
+        # The simulation and main threads both call into the engine; += alone can lose counts.
+        self.lock = threading.Lock()
+
+    def install(self):
+        # A CDLL only holds the functions looked up so far, but cpp_bridge sets argtypes on
+        # every one the game uses; for py_engine these are the module's own functions.
+        lib = cpp_bridge.lib
+        for name in list(vars(lib)):
+            if not name.startswith("Engine_") or name in self.originals: continue
+            fn = getattr(lib, name)
+            self.originals[name] = fn
+            setattr(lib, name, self._wrap(fn))
+
+    def uninstall(self):
+        for name, fn in self.originals.items(): setattr(cpp_bridge.lib, name, fn)
+        self.originals.clear()
+
+    def _wrap(self, fn):
+        def counted(*args):
+            with self.lock: self.calls += 1
+            return fn(*args)
+        return counted
+
+
+class FrameProfiler:
+    def __init__(self, counters, window=cfg.PROFILE_WINDOW, export=cfg.PROFILE_EXPORT):
+        # counters: name -> callable returning a running total.
+        self.calls = CallCounter()
+        self.counters = dict(counters, ctypes_calls=lambda: self.calls.calls)
+        self.frames = deque(maxlen=window)
+        self.visible = False
+        self.export = export
+        self.font = None
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.current = None
+        self.last = 0.0
+        self.totals = {}
+        self.overlay_surf = None
+        self.overlay_age = 0
+        self.writer = None
+        self.rows = 0
+        self._sync()
+
+    @property
+    def enabled(self):
+        return self.visible or bool(self.export)
+
+    def toggle(self):
+        self.visible = not self.visible
+        self._sync()
+
+    def _sync(self):
+        if self.enabled and not self.calls.originals: self.calls.install()
+        elif not self.enabled and self.calls.originals: self.calls.uninstall()
+        self.current = None
+        self.totals = {k: f() for k, f in self.counters.items()}
+
+    def next_frame(self):
+        if not self.enabled: return
+        now = time.perf_counter()
+        if self.current is not None:
+            with self.lock:
+                pending, self.pending = self.pending, {}
+            for k, v in pending.items(): self.current[k] = self.current.get(k, 0) + v
+            for k, f in self.counters.items():
+                total = f()
+                self.current[k] = total - self.totals.get(k, total)
+                self.totals[k] = total
+            self.current["frame"] = now - self.start
+            self.frames.append(self.current)
+            if self.export: self._write(self.current)
+        self.current = {}
+        self.start = self.last = now
+
+    def lap(self, phase):
+        if self.current is None: return
+        now = time.perf_counter()
+        self.current[phase] = self.current.get(phase, 0.0) + (now - self.last)
+        self.last = now
+
+    def add(self, phase, seconds):
+        """Any thread: charges work done outside the render loop to the current frame."""
+        if not self.enabled: return
+        with self.lock:
+            self.pending[phase] = self.pending.get(phase, 0.0) + seconds
+
+    def add_stats(self, stats):
+        """Any thread: adds one tick's C_Stats to the current frame."""
+        if not self.enabled: return
+        with self.lock:
+            p = self.pending
+            for name in ENGINE_PHASES: p[name] = p.get(name, 0.0) + getattr(stats, "time_" + name[4:])
+            for name in ENGINE_COUNTERS[1:]: p[name] = p.get(name, 0) + getattr(stats, name)
+            p["entities"] = stats.zombies + stats.plants + stats.projectiles
+
+    def stats(self):
+        """{name: (p50, p95, p99)} over the window; times in ms, counters per frame."""
+        out = {}
+        if not self.frames: return out
+        for name in TIMES + COUNTS:
+            vals = np.array([f.get(name, 0.0) for f in self.frames], np.float64)
+            if name not in COUNTS: vals *= 1000.0
+            out[name] = tuple(np.percentile(vals, (50, 95, 99)))
+        return out
+
+    def overlay(self):
+        """The overlay surface, re-rendered every cfg.PROFILE_OVERLAY_EVERY frames."""
+        self.overlay_age -= 1
+        if self.overlay_surf is not None and self.overlay_age > 0: return self.overlay_surf
+        self.overlay_age = cfg.PROFILE_OVERLAY_EVERY
+        if self.font is None: self.font = pygame.font.SysFont("consolas,dejavusansmono,monospace", 14)
+        font = self.font
+
+        lines = [f"{'phase':<16}{'p50':>8}{'p95':>8}{'p99':>8}"]
+        for name, (p50, p95, p99) in self.stats().items():
+            unit = "" if name in COUNTS else " ms"
+            lines.append(f"{name:<16}{p50:8.2f}{p95:8.2f}{p99:8.2f}{unit}")
+        line_h = font.get_linesize()
+        surf = pygame.Surface((max(font.size(l)[0] for l in lines) + 16, line_h * len(lines) + 12))
+        surf.set_alpha(200)
+        for i, line in enumerate(lines):
+            surf.blit(font.render(line, True, (255, 255, 255)), (8, 6 + i * line_h))
+        self.overlay_surf = surf
+        return surf
+
+    def _write(self, frame):
+        if self.writer is None or self.rows >= cfg.PROFILE_MAX_ROWS: self._open()
+        row = {"t": round(time.time(), 3)}
+        row.update({k: round(frame.get(k, 0.0) * (1 if k in COUNTS else 1000.0), 4) for k in TIMES + COUNTS})
+        if self.export == "csv": self.writer.writerow(row)
+        else: self.file.write(json.dumps(row) + "\n")
+        self.rows += 1
+
+    def _open(self):
+        # Rolling: the previous file is kept as .old, so at most two files of PROFILE_MAX_ROWS rows exist.
+        if self.writer is not None: self.file.close()
+        os.makedirs(cfg.PROFILE_DIR, exist_ok=True)
+        path = os.path.join(cfg.PROFILE_DIR, f"frames.{self.export}")
+        if os.path.exists(path): os.replace(path, path + ".old")
+        self.file = open(path, "w", newline="")
+        self.rows = 0
+        if self.export == "csv":
+            self.writer = csv.DictWriter(self.file, ["t"] + list(TIMES + COUNTS))
+            self.writer.writeheader()
+        else:
+            self.writer = self.file
+
+    def close(self):
+        if self.writer is not None: self.file.close()
+        self.writer = None
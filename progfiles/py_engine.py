@@ -0,0 +1,807 @@
+"""Pure-Python TowerEngine, used by cpp_bridge when the native library is missing.
+
+It follows GameEngine.h tick for tick. Zombies, plants, projectiles and effects
+are kept as NumPy columns (struct of arrays), and every phase of update() runs
+over whole columns. The module exposes the same Engine_* functions as bridge.cpp,
+so cpp_bridge can hand it out as `lib` unchanged.
+
+Where the native loops depend on entity order inside one tick, this version
+resolves everything at once. The results can differ for that one tick:
+- all zombies that reach a plant this tick eat it, even if an earlier one
+  already killed it;
+- area plants (mine, cherry, ice) act before peashooters pick their targets.
+"""
+import ctypes
+import hashlib
+import heapq
+import io
+import json
+import pickle
+import time
+
+import numpy as np
+
+# Enums.h
+NORMAL, CONEHEAD, BUCKETHEAD, FOOTBALL, NEWSPAPER, IMP, GARGANTUAR, FLAG = range(8)
+PEASHOOTER, SUNFLOWER, WALLNUT, POTATO_MINE, CHERRY_BOMB, ICE_LETTUCE = range(6)
+SND_PEA_HIT, SND_ZOMBIE_EAT, SND_CHERRY_EXPLODE, SND_IMP_THROW, SND_CONE_HIT, SND_BUCKET_HIT, \
+    SND_PAPER_RIP, SND_ZOMBIE_ANGRY, SND_FREEZE = range(1, 10)
+EFFECT_MINE, EFFECT_CHERRY, EFFECT_ICE = range(3)
+
+# GameObjects.h constructors, indexed by type
+# ZombieType: body_health, max_health, speed_base, radius, damage, armor_state, has_newspaper
+ZOMBIE_STATS = [
+    (125.0, 125.0, 30.0, 40.0, 30.0, 0, False),
+    (125.0, 275.0, 30.0, 40.0, 30.0, 1, False),
+    (125.0, 450.0, 30.0, 40.0, 30.0, 1, False),
+    (125.0, 450.0, 35.0, 40.0, 30.0, 1, False),
+    (125.0, 225.0, 30.0, 40.0, 30.0, 0, True),
+    (125.0, 100.0, 40.0, 40.0, 30.0, 0, False),
+    (125.0, 3000.0, 20.0, 80.0, 5000.0, 0, False),
+    (125.0, 125.0, 45.0, 40.0, 30.0, 0, False),
+]
+# PlantType: health, max_health, action_cooldown, initial cooldown_timer
+PLANT_STATS = [
+    (100.0, 100.0, 1.5, 0.0),
+    (100.0, 100.0, 10.0, 5.0),
+    (2000.0, 2000.0, 1.5, 0.0),
+    (100.0, 100.0, 12.0, 12.0),
+    (1000.0, 100.0, 1.2, 1.2),
+    (50.0, 100.0, 1.5, 0.0),
+]
+# GameEngine(): type, cost, max_cooldown
+CARDS = [(PEASHOOTER, 100, 5.0), (SUNFLOWER, 50, 5.0), (WALLNUT, 50, 20.0),
+         (POTATO_MINE, 25, 20.0), (CHERRY_BOMB, 150, 30.0), (ICE_LETTUCE, 0, 15.0)]
+
+ZOMBIE_COLUMNS = {"x": np.float32, "y": np.float32, "type": np.int32, "health": np.float32,
+                  "max_health": np.float32, "body_health": np.float32, "speed_base": np.float32,
+                  "current_speed": np.float32, "freeze_timer": np.float32, "damage": np.float32,
+                  "radius": np.float32, "id": np.int32, "armor_state": np.int32,
+                  "has_arm": np.bool_, "has_newspaper": np.bool_, "to_delete": np.bool_}
+PLANT_COLUMNS = {"x": np.float32, "y": np.float32, "type": np.int32, "health": np.float32,
+                 "max_health": np.float32, "cooldown_timer": np.float32, "action_cooldown": np.float32,
+                 "is_armed": np.bool_, "to_delete": np.bool_}
+PROJECTILE_COLUMNS = {"x": np.float32, "y": np.float32, "vx": np.float32, "vy": np.float32,
+                      "damage": np.float32, "id": np.int32, "to_delete": np.bool_}
+EFFECT_COLUMNS = {"x": np.float32, "y": np.float32, "type": np.int32, "timer": np.float32}
+
+# EngineStats.h. Pair tests and target scans count the pairs the vectorised phases
+# compare, which are more than the native lane index looks at.
+STATS_FIELDS = ("steps", "zombies", "plants", "projectiles", "effects", "collision_tests", "target_scans",
+                "allocations", "erased", "time_waves", "time_zombies", "time_plants", "time_projectiles",
+                "time_compact", "time_total")
+
+# GameEngine::MAX_STEP, in float32 so that dt = 1/60 is exactly one step as in C++.
+MAX_STEP = np.float32(1.0 / 60.0)
+
+STATE_VERSION = 1
+# GameEngine attributes that save_state copies as they are (see GameEngine.h save_state).
+STATE_VARS = ("level_time", "auto_sun_timer", "auto_sun_interval", "auto_sun_amount", "money", "lives",
+              "level_completed", "game_over", "seed", "rng", "sound_events", "card_cooldown")
+STATE_TABLES = ("zombies", "plants", "projectiles", "effects")
+# The only globals a saved state refers to: the wave sources, and what NumPy arrays and the
+# RNG pickle to (under both the numpy.core and numpy._core module names).
+STATE_GLOBALS = {(__name__, "ListWaves"), (__name__, "StreamWaves"), (__name__, "GeneratedWaves"),
+                 ("numpy", "dtype"), ("numpy", "ndarray"),
+                 ("numpy.core.numeric", "_frombuffer"), ("numpy._core.numeric", "_frombuffer"),
+                 ("numpy.core.multiarray", "_reconstruct"), ("numpy._core.multiarray", "_reconstruct"),
+                 ("numpy.random._pickle", "__generator_ctor"), ("numpy.random._pickle", "__bit_generator_ctor"),
+                 ("numpy.random._pcg64", "PCG64"), ("numpy.random.bit_generator", "SeedSequence"),
+                 ("numpy.random.bit_generator", "__pyx_unpickle_SeedSequence")}
+
+
+class StateUnpickler(pickle.Unpickler):
+    """Loads save_state buffers only: any other global in the pickle is an error."""
+
+    def find_class(self, module, name):
+        if (module, name) not in STATE_GLOBALS: raise pickle.UnpicklingError(f"{module}.{name} is not engine state")
+        return super().find_class(module, name)
+
+
+class Columns:
+    """Growable struct-of-arrays table. Column views are only valid until the next append."""
+
+    def __init__(self, spec, capacity=64):
+        self.n = 0
+        self._data = {k: np.zeros(capacity, dt) for k, dt in spec.items()}
+
+    def __getitem__(self, name):
+        return self._data[name][:self.n]
+
+    def __len__(self):
+        return self.n
+
+    def append(self, **values):
+        cap = len(next(iter(self._data.values())))
+        if self.n == cap:
+            for k, col in self._data.items():
+                grown = np.zeros(cap * 2, col.dtype)
+                grown[:cap] = col
+                self._data[k] = grown
+        for k, v in values.items():
+            self._data[k][self.n] = v
+        self.n += 1
+
+    def keep(self, mask):
+        cnt = int(np.count_nonzero(mask))
+        if cnt == self.n: return
+        for col in self._data.values():
+            col[:cnt] = col[:self.n][mask]
+        self.n = cnt
+
+    def clear(self):
+        self.n = 0
+
+    def state(self):
+        return self.n, {k: col[:self.n].copy() for k, col in self._data.items()}
+
+    def load(self, state):
+        n, cols = state
+        for k, values in cols.items():
+            if len(self._data[k]) < n: self._data[k] = np.zeros(n * 2, values.dtype)
+            self._data[k][:n] = values
+        self.n = n
+
+
+class GameMap:
+    def __init__(self):
+        self.width, self.height = 9, 5
+        self.tile_w, self.tile_h = 110.0, 141.0
+        self.grid = np.zeros((self.height, self.width), np.int32)
+        self.active_rows = list(range(self.height))
+
+    def load_from_json(self, settings):
+        self.width = settings.get("width", 9)
+        self.height = settings.get("height", 5)
+        self.grid = np.zeros((self.height, self.width), np.int32)
+        self.active_rows = list(settings.get("active_rows", range(self.height)))
+
+    def spawn_x(self):
+        return self.width * self.tile_w + 100.0
+
+    def is_buildable(self, x, y):
+        gx, gy = int(x / self.tile_w), int(y / self.tile_h)
+        if gx < 0 or gx >= self.width or gy < 0 or gy >= self.height: return False
+        if gy not in self.active_rows: return False
+        return self.grid[gy, gx] == 0
+
+
+# WaveScheduler.h: every source is an iterator of (time, type, row) in time order.
+# They pickle to their current position, which is how save_state keeps pending waves.
+class ListWaves:
+    def __init__(self, waves):
+        self.events = [(float(np.float32(w["time"])), int(w["type"]), int(w["row"]))
+                       for w in sorted(waves, key=lambda w: w["time"])]
+        self.cursor = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.cursor >= len(self.events): raise StopIteration
+        self.cursor += 1
+        return self.events[self.cursor - 1]
+
+    def __getstate__(self):
+        return {"events": self.events[self.cursor:], "cursor": 0}
+
+
+class StreamWaves:
+    def __init__(self, path, offset=0):
+        self.path = path
+        self.f = open(path)
+        if offset < 0: self.f.close()
+        else: self.f.seek(offset)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while not self.f.closed:
+            line = self.f.readline()
+            if not line:
+                self.f.close()
+                break
+            parts = line.split()
+            if not parts or parts[0].startswith("#") or len(parts) < 3: continue
+            try: return float(np.float32(parts[0])), int(parts[1]), int(parts[2])
+            except ValueError: continue
+        raise StopIteration
+
+    def __getstate__(self):
+        return {"path": self.path, "offset": -1 if self.f.closed else self.f.tell()}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"], state["offset"])
+
+
+class GeneratedWaves:
+    def __init__(self, g, rows):
+        self.t = float(g.get("start", 0.0)); self.interval = float(g.get("interval", 5.0))
+        self.min_interval = float(g.get("min_interval", self.interval)); self.ramp = float(g.get("ramp", 1.0))
+        self.count = g.get("count", 0); self.types = g.get("types", [0]); self.rows = list(rows)
+        self.rng = np.random.default_rng(g.get("seed", 0))
+        self.made = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self.types or not self.rows or (self.count > 0 and self.made >= self.count): raise StopIteration
+        ev = (float(np.float32(self.t)), int(self.types[self.rng.integers(len(self.types))]),
+              int(self.rows[self.rng.integers(len(self.rows))]))
+        self.made += 1
+        self.t += self.interval
+        self.interval = max(self.min_interval, self.interval * self.ramp)
+        return ev
+
+
+class WaveScheduler:
+    """Keeps only the next spawn of each source, in a heap ordered by (time, source)."""
+
+    def __init__(self):
+        self.sources = []; self.heap = []
+
+    def clear(self):
+        self.sources.clear(); self.heap.clear()
+
+    def add(self, source):
+        self.sources.append(source)
+        self._pull(len(self.sources) - 1)
+
+    def empty(self):
+        return not self.heap
+
+    def _pull(self, i):
+        ev = next(self.sources[i], None)
+        if ev is not None: heapq.heappush(self.heap, (ev[0], i, ev))
+
+    def pop_due(self, now):
+        while self.heap and self.heap[0][0] <= now:
+            _, i, ev = heapq.heappop(self.heap)
+            yield ev
+            self._pull(i)
+
+
+class GameEngine:
+    next_id = 0
+
+    def __init__(self):
+        self.map = GameMap()
+        self.zombies = Columns(ZOMBIE_COLUMNS, 256)
+        self.plants = Columns(PLANT_COLUMNS, 64)
+        self.projectiles = Columns(PROJECTILE_COLUMNS, 256)
+        self.effects = Columns(EFFECT_COLUMNS, 16)
+        self.card_cooldown = np.zeros(len(CARDS), np.float32)
+        self.card_max_cooldown = np.array([c[2] for c in CARDS], np.float32)
+        self.sound_events = []
+        self.seed = 0
+        self.rng = np.random.default_rng(self.seed)
+
+        self.level_time = 0.0
+        self.auto_sun_timer = 0.0; self.auto_sun_interval = 10.0; self.auto_sun_amount = 25
+        self.money = 0; self.lives = 0
+        self.waves = WaveScheduler()
+        self.level_cache = {}
+        self.level_completed = False; self.game_over = False
+        self.stats = dict.fromkeys(STATS_FIELDS, 0)
+        self.build_allocations = 0
+
+    def _new_id(self):
+        GameEngine.next_id += 1
+        return GameEngine.next_id - 1
+
+    def set_seed(self, seed):
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+
+    def state_hash(self):
+        """GameEngine::state_hash over the same fields. The value is not comparable with
+        the native engine's, only between runs of this one."""
+        h = hashlib.blake2b(digest_size=8)
+        h.update(np.array([self.level_time, self.auto_sun_timer], np.float32).tobytes())
+        h.update(np.array([self.money, self.lives, self.level_completed, self.game_over], np.int64).tobytes())
+        h.update(self.card_cooldown.tobytes())
+        for table, cols in ((self.zombies, ("type", "x", "y", "health", "freeze_timer", "armor_state", "has_arm", "has_newspaper")),
+                            (self.plants, ("type", "x", "y", "health", "cooldown_timer")),
+                            (self.projectiles, ("x", "y")), (self.effects, ("type", "x", "y", "timer"))):
+            for c in cols: h.update(table[c].tobytes())
+        return int.from_bytes(h.digest(), "little")
+
+    def save_state(self):
+        """Everything a level run depends on, pickled. Only this module reads it back."""
+        m = self.map
+        return pickle.dumps((STATE_VERSION, {
+            "map": (m.width, m.height, m.tile_w, m.tile_h, m.grid, m.active_rows),
+            "vars": {k: getattr(self, k) for k in STATE_VARS},
+            "tables": {k: getattr(self, k).state() for k in STATE_TABLES},
+            "waves": (self.waves.sources, self.waves.heap),
+        }), pickle.HIGHEST_PROTOCOL)
+
+    def restore_state(self, data):
+        # Like GameEngine::restore_state, the buffer must be one whole state and nothing more.
+        f = io.BytesIO(data)
+        try:
+            version, state = StateUnpickler(f).load()
+        except Exception:
+            return False
+        if version != STATE_VERSION or f.tell() != len(data): return False
+        m = self.map
+        m.width, m.height, m.tile_w, m.tile_h, m.grid, m.active_rows = state["map"]
+        for k, v in state["vars"].items(): setattr(self, k, v)
+        for k, v in state["tables"].items(): getattr(self, k).load(v)
+        self.waves.sources, self.waves.heap = state["waves"]
+        self.stats = dict.fromkeys(STATS_FIELDS, 0); self.build_allocations = 0
+        return True
+
+    def clone(self):
+        copy = GameEngine()
+        copy.restore_state(self.save_state())
+        copy.level_cache = dict(self.level_cache)
+        return copy
+
+    def get_card_cooldown_pct(self, index):
+        if index < 0 or index >= len(CARDS): return 0.0
+        if self.card_cooldown[index] <= 0: return 0.0
+        return float(self.card_cooldown[index] / self.card_max_cooldown[index])
+
+    def remove_plant_at(self, x, y):
+        gx, gy = int(x / self.map.tile_w), int(y / self.map.tile_h)
+        cx = gx * self.map.tile_w + self.map.tile_w / 2.0
+        cy = gy * self.map.tile_h + self.map.tile_h / 2.0
+        p = self.plants
+        hit = np.flatnonzero(~p["to_delete"] & (np.abs(p["x"] - cx) < 20.0) & (np.abs(p["y"] - cy) < 20.0))
+        if len(hit): p["to_delete"][hit[0]] = True
+
+    def load_level(self, level_id):
+        if level_id not in self.level_cache:
+            try:
+                with open(f"levels/level_{level_id}.json") as f: j = json.load(f)
+            except (OSError, ValueError): return False
+            if not isinstance(j, dict) or not isinstance(j.get("settings"), dict): return False
+            self.level_cache[level_id] = j
+        self.load_level_data(self.level_cache[level_id])
+        return True
+
+    def load_level_from_memory(self, text):
+        try: j = json.loads(text)
+        except ValueError: return False
+        if not isinstance(j, dict) or not isinstance(j.get("settings"), dict): return False
+        self.load_level_data(j)
+        return True
+
+    def load_level_data(self, j):
+        for t in (self.zombies, self.plants, self.projectiles, self.effects): t.clear()
+        self.sound_events.clear()
+        self.card_cooldown[:] = 0.0
+        self.level_time = 0.0; self.level_completed = False; self.game_over = False
+        self.rng = np.random.default_rng(self.seed)
+        self.stats = dict.fromkeys(STATS_FIELDS, 0); self.build_allocations = 0
+
+        settings = j["settings"]
+        self.money = settings.get("start_money", 50)
+        self.lives = settings.get("lives", 5)
+        self.auto_sun_amount = settings.get("auto_sun_amount", 25)
+        self.auto_sun_interval = float(settings.get("auto_sun_interval", 10.0))
+        self.auto_sun_timer = self.auto_sun_interval
+
+        self.map.load_from_json(settings)
+
+        self.waves.clear()
+        self.waves.add(ListWaves(j.get("waves", [])))
+        if "wave_stream" in j: self.waves.add(StreamWaves(j["wave_stream"]))
+        if "wave_generator" in j: self.waves.add(GeneratedWaves(j["wave_generator"], self.map.active_rows))
+
+    def waves_pending(self):
+        return not self.waves.empty()
+
+    # --- zombies -------------------------------------------------------------
+
+    def spawn_zombie_at_row(self, ztype, row):
+        if row < 0 or row >= self.map.height: return
+        body, max_hp, speed, radius, damage, armor, paper = ZOMBIE_STATS[ztype]
+        self.zombies.append(
+            x=self.map.spawn_x(), y=row * self.map.tile_h + self.map.tile_h / 2.0,
+            type=ztype, health=max_hp, max_health=max_hp, body_health=body, speed_base=speed,
+            current_speed=speed, freeze_timer=0.0, damage=damage, radius=radius, id=self._new_id(),
+            armor_state=armor, has_arm=True, has_newspaper=paper, to_delete=False)
+        self.stats["allocations"] += 1
+
+    def damage_zombies(self, idx, amount):
+        """Zombie::take_damage for every index in idx (repeats allowed), then update_visual_state."""
+        z = self.zombies
+        health = z["health"]
+        np.subtract.at(health, idx, amount)
+        idx = np.unique(idx)
+        h, body, t = health[idx], z["body_health"][idx], z["type"][idx]
+        armor = h - body
+
+        z["to_delete"][idx[h <= 0]] = True
+
+        cone = t == CONEHEAD
+        z["armor_state"][idx[cone]] = np.select(
+            [armor[cone] <= 0, armor[cone] < 50, armor[cone] < 100], [0, 3, 2], 1)
+        bucket = t == BUCKETHEAD
+        z["armor_state"][idx[bucket]] = np.select(
+            [armor[bucket] <= 0, armor[bucket] < 125, armor[bucket] < 275], [0, 3, 2], 1)
+        z["armor_state"][idx[(t == FOOTBALL) & (h <= body)]] = 0
+
+        lost_paper = idx[(t == NEWSPAPER) & (h <= body) & z["has_newspaper"][idx]]
+        z["has_newspaper"][lost_paper] = False
+        z["speed_base"][lost_paper] = 40.0
+
+        z["has_arm"][idx[(t != GARGANTUAR) & (h < body * 0.5)]] = False
+
+    # --- plants --------------------------------------------------------------
+
+    def try_build_plant(self, x, y, card_index):
+        if card_index < 0 or card_index >= len(CARDS): return
+        ptype, cost, max_cd = CARDS[card_index]
+        if self.card_cooldown[card_index] > 0: return
+        if self.money < cost: return
+        if not self.map.is_buildable(x, y): return
+
+        gx, gy = int(x / self.map.tile_w), int(y / self.map.tile_h)
+        cx = gx * self.map.tile_w + self.map.tile_w / 2.0
+        cy = gy * self.map.tile_h + self.map.tile_h / 2.0
+        p = self.plants
+        if np.any(np.hypot(p["x"] - cx, p["y"] - cy) < 30.0): return
+
+        health, max_hp, action_cd, timer = PLANT_STATS[ptype]
+        self._new_id()
+        p.append(x=cx, y=cy, type=ptype, health=health, max_health=max_hp, cooldown_timer=timer,
+                 action_cooldown=action_cd, is_armed=False, to_delete=False)
+        self.money -= cost
+        self.card_cooldown[card_index] = max_cd
+        self.build_allocations += 1
+
+    def _live_near(self, x, y, dist):
+        z = self.zombies
+        return ~z["to_delete"] & (np.hypot(z["x"] - x, z["y"] - y) < dist)
+
+    def _add_effect(self, x, y, etype, timer):
+        self.effects.append(x=x, y=y, type=etype, timer=timer)
+
+    def _area_plants(self):
+        p, z = self.plants, self.zombies
+        ptype, timer = p["type"], p["cooldown_timer"]
+        pending_arm = (ptype == POTATO_MINE) & ~p["is_armed"] & (timer <= 0)
+        act = np.flatnonzero(((ptype == POTATO_MINE) & p["is_armed"])
+                             | ((ptype == CHERRY_BOMB) & (timer <= 0)) | (ptype == ICE_LETTUCE))
+
+        for i in act:
+            px, py = p["x"][i], p["y"][i]
+            if ptype[i] == POTATO_MINE:
+                if not self._live_near(px, py, 60.0).any(): continue
+                self.damage_zombies(np.flatnonzero(self._live_near(px, py, 150.0)), 1000.0)
+                self._add_effect(px, py, EFFECT_MINE, 0.5)
+                self.sound_events.append(SND_CHERRY_EXPLODE)
+                p["to_delete"][i] = True
+            elif ptype[i] == CHERRY_BOMB:
+                self.damage_zombies(np.flatnonzero(np.hypot(z["x"] - px, z["y"] - py) < 200.0), 1800.0)
+                self._add_effect(px, py, EFFECT_CHERRY, 1.2)
+                self.sound_events.append(SND_CHERRY_EXPLODE)
+                p["to_delete"][i] = True
+            else:
+                near = np.flatnonzero(self._live_near(px, py, 90.0))
+                if not len(near): continue
+                self.damage_zombies(near[:1], 20.0)
+                z["freeze_timer"][near[0]] = 10.0
+                self._add_effect(px, py, EFFECT_ICE, 0.5)
+                self.sound_events.append(SND_FREEZE)
+                p["to_delete"][i] = True
+
+        p["is_armed"][pending_arm] = True
+
+    def _peashooters(self):
+        p, z = self.plants, self.zombies
+        ready = np.flatnonzero((p["type"] == PEASHOOTER) & (p["cooldown_timer"] <= 0))
+        if not len(ready) or not len(z): return
+        px, py = p["x"][ready], p["y"][ready]
+        my_row = (py / self.map.tile_h).astype(np.int32)
+        z_row = (z["y"] / self.map.tile_h).astype(np.int32)
+        zx = z["x"]
+
+        # Nearest live zombie ahead in the same lane, up to the spawn line.
+        valid = (~z["to_delete"])[None, :] & (my_row[:, None] == z_row[None, :]) \
+            & (zx[None, :] > px[:, None]) & (zx[None, :] <= self.map.spawn_x())
+        self.stats["target_scans"] += valid.size
+        has = valid.any(axis=1)
+        if not has.any(): return
+        shooters = ready[has]
+        target_x = np.where(valid[has], zx[None, :], np.inf).min(axis=1)
+        sx, sy = px[has] + 60.0, py[has] - 25.0
+        direction = np.sign(target_x - sx)
+
+        for i in range(len(shooters)):
+            self.projectiles.append(x=sx[i], y=sy[i], vx=direction[i] * 500.0, vy=0.0,
+                                    damage=20.0, id=self._new_id(), to_delete=False)
+        p["cooldown_timer"][shooters] = p["action_cooldown"][shooters]
+        self.stats["allocations"] += len(shooters)
+
+    # --- projectiles ---------------------------------------------------------
+
+    def _projectile_hits(self, x0, y0):
+        """Swept test: a shot hits a zombie if its path from (x0, y0) this step passes within the radius."""
+        pr, z = self.projectiles, self.zombies
+        active = ~pr["to_delete"]
+        max_r = z["radius"].max() if len(z) else 0.0
+        while active.any() and len(z):
+            shots = np.flatnonzero(active)
+            ax, ay, bx, by = x0[shots], y0[shots], pr["x"][shots], pr["y"][shots]
+            live = np.flatnonzero(~z["to_delete"] & (z["x"] > np.minimum(ax, bx).min() - max_r)
+                                  & (z["x"] < np.maximum(ax, bx).max() + max_r))
+            if not len(live): break
+            # Closest point of each path to each zombie.
+            vx, vy = (bx - ax)[:, None], (by - ay)[:, None]
+            px, py = z["x"][live][None, :] - ax[:, None], z["y"][live][None, :] - ay[:, None]
+            len2 = vx * vx + vy * vy
+            t = np.clip((px * vx + py * vy) / np.where(len2 > 0, len2, 1.0), 0.0, 1.0)
+            dx, dy = px - t * vx, py - t * vy
+            r = z["radius"][live][None, :]
+            hit = dx * dx + dy * dy < r * r
+            self.stats["collision_tests"] += hit.size
+            has = hit.any(axis=1)
+            active[shots[~has]] = False
+            if not has.any(): break
+
+            # Apply the hits in projectile order per zombie; shots landing after
+            # their target already died fly on and are retried next round.
+            shots = shots[has]
+            target = live[hit[has].argmax(axis=1)]
+            order = np.argsort(target, kind="stable")
+            shots, target = shots[order], target[order]
+            dmg = pr["damage"][shots]
+            cum = np.cumsum(dmg)
+            group_start = np.r_[0, np.flatnonzero(np.diff(target)) + 1]
+            group_base = np.repeat(cum[group_start] - dmg[group_start], np.diff(np.r_[group_start, len(target)]))
+            before = z["health"][target] - (cum - dmg - group_base)
+            landed = before > 0
+            shots, target, dmg, before = shots[landed], target[landed], dmg[landed], before[landed]
+            after = before - dmg
+
+            body, ztype = z["body_health"][target], z["type"][target]
+            armor_hit = after > body
+            self.sound_events.extend([SND_CONE_HIT] * int(np.count_nonzero(armor_hit & (ztype == CONEHEAD))))
+            self.sound_events.extend([SND_BUCKET_HIT] * int(np.count_nonzero(
+                armor_hit & ((ztype == BUCKETHEAD) | (ztype == FOOTBALL)))))
+            self.sound_events.extend([SND_PEA_HIT] * int(np.count_nonzero(
+                ~(armor_hit & ((ztype == CONEHEAD) | (ztype == BUCKETHEAD) | (ztype == FOOTBALL))))))
+            ripped = int(np.count_nonzero(z["has_newspaper"][target] & (before > body) & (after <= body)))
+            self.sound_events.extend([SND_PAPER_RIP, SND_ZOMBIE_ANGRY] * ripped)
+
+            pr["to_delete"][shots] = True
+            active[shots] = False
+            self.damage_zombies(target, dmg)
+
+    # --- tick ----------------------------------------------------------------
+
+    def update(self, dt):
+        start = time.perf_counter()
+        stats = self.stats = dict.fromkeys(STATS_FIELDS, 0)
+        stats["allocations"], self.build_allocations = self.build_allocations, 0
+
+        self.sound_events.clear()
+        steps = max(1, int(np.ceil(np.float32(dt) / MAX_STEP)))
+        for _ in range(steps): self.step(float(np.float32(dt) / steps))
+
+        stats["zombies"], stats["plants"] = len(self.zombies), len(self.plants)
+        stats["projectiles"], stats["effects"] = len(self.projectiles), len(self.effects)
+        stats["time_total"] = time.perf_counter() - start
+
+    def _lap(self, phase, last):
+        now = time.perf_counter()
+        self.stats[phase] += now - last
+        return now
+
+    def step(self, dt):
+        if self.game_over or self.level_completed: return
+        t = time.perf_counter()
+        stats = self.stats
+        stats["steps"] += 1
+        self.level_time += dt
+
+        self.card_cooldown[self.card_cooldown > 0] -= dt
+        e = self.effects
+        e["timer"][:] -= dt
+        effect_count = len(e)
+        e.keep(e["timer"] > 0)
+        stats["erased"] += effect_count - len(e)
+
+        self.auto_sun_timer -= dt
+        if self.auto_sun_timer <= 0:
+            self.money += self.auto_sun_amount; self.auto_sun_timer = self.auto_sun_interval
+
+        for _, ztype, row in self.waves.pop_due(self.level_time):
+            self.spawn_zombie_at_row(ztype, row)
+        t = self._lap("time_waves", t)
+
+        z, p = self.zombies, self.plants
+        live = ~z["to_delete"]
+        speed_mult = 1.3 if np.any(live & (z["type"] == FLAG)) else 1.0
+
+        # Each zombie eats the first plant in its lane within reach.
+        eating = np.zeros(len(z), np.bool_)
+        edible = np.flatnonzero(~p["to_delete"] & ~((p["type"] == POTATO_MINE) & p["is_armed"]))
+        if len(edible) and len(z):
+            ex, ey = p["x"][edible], p["y"][edible]
+            near = np.flatnonzero(live & (z["x"] > ex.min() - 50.0) & (z["x"] < ex.max() + 50.0))
+            z_row = (z["y"][near] / self.map.tile_h).astype(np.int32)
+            p_row = (ey / self.map.tile_h).astype(np.int32)
+            reach = (z_row[:, None] == p_row[None, :]) & (np.abs(z["x"][near][:, None] - ex[None, :]) < 50.0)
+            stats["collision_tests"] += reach.size
+            chewing = reach.any(axis=1)
+            if chewing.any():
+                eaten = edible[reach[chewing].argmax(axis=1)]
+                eating[near[chewing]] = True
+                p["health"][:] -= np.bincount(eaten, z["damage"][near[chewing]] * dt, len(p)).astype(np.float32)
+                p["to_delete"][p["health"] <= 0] = True
+                chomps = int(np.count_nonzero(self.rng.random(len(eaten)) < 0.05))
+                self.sound_events.extend([SND_ZOMBIE_EAT] * chomps)
+
+        frozen = live & (z["freeze_timer"] > 0)
+        z["freeze_timer"][frozen] -= dt
+        speed = np.where(frozen, 0.0, z["speed_base"]) * np.where(eating, 0.0, 1.0) * speed_mult
+        z["current_speed"][live] = speed[live]
+        z["x"][live] -= speed[live] * dt
+
+        escaped = live & (z["x"] < -50.0)
+        if escaped.any():
+            z["to_delete"][escaped] = True
+            self.lives -= int(np.count_nonzero(escaped))
+            if self.lives <= 0: self.game_over = True
+        t = self._lap("time_zombies", t)
+
+        # Plant::update, then update_logic and produce_money.
+        timer = p["cooldown_timer"]
+        timer[timer > 0] -= dt
+        self._area_plants()
+        self._peashooters()
+        suns = np.flatnonzero((p["type"] == SUNFLOWER) & (p["cooldown_timer"] <= 0))
+        p["cooldown_timer"][suns] = p["action_cooldown"][suns]
+        self.money += 25 * len(suns)
+        t = self._lap("time_plants", t)
+
+        pr = self.projectiles
+        x0, y0 = pr["x"].copy(), pr["y"].copy()
+        pr["x"][:] += pr["vx"] * dt
+        pr["y"][:] += pr["vy"] * dt
+        pr["to_delete"][(pr["x"] > 2000) | (pr["x"] < -200)] = True
+        self._projectile_hits(x0, y0)
+        t = self._lap("time_projectiles", t)
+
+        entity_count = len(z) + len(p) + len(pr)
+        z.keep(~z["to_delete"])
+        p.keep(~p["to_delete"])
+        pr.keep(~pr["to_delete"])
+        stats["erased"] += entity_count - len(z) - len(p) - len(pr)
+        self._lap("time_compact", t)
+
+        if not self.waves_pending() and len(z) == 0 and self.lives > 0: self.level_completed = True
+
+
+# --- bridge.cpp surface ------------------------------------------------------
+
+def _val(x):
+    return getattr(x, "value", x)
+
+
+def _out(ref):
+    return getattr(ref, "_obj", ref)
+
+
+def _fill_zombies(z, out, sl):
+    out["x"], out["y"], out["type"] = z["x"][sl], z["y"][sl], z["type"][sl]
+    out["health"], out["max_health"] = z["health"][sl], z["max_health"][sl]
+    out["speed"], out["id"], out["armor_state"] = z["current_speed"][sl], z["id"][sl], z["armor_state"][sl]
+    out["flags"] = z["has_arm"][sl] * 1 | z["has_newspaper"][sl] * 2 | (z["freeze_timer"][sl] > 0) * 8
+
+
+def _fill_plants(p, out, sl):
+    out["x"], out["y"], out["type"] = p["x"][sl], p["y"][sl], p["type"][sl]
+    out["health"], out["max_health"] = p["health"][sl], p["max_health"][sl]
+    out["timer"], out["max_timer"] = p["cooldown_timer"][sl], p["action_cooldown"][sl]
+
+
+def _fill_projectiles(pr, out, sl):
+    out["x"], out["y"], out["is_frozen"], out["id"] = pr["x"][sl], pr["y"][sl], 0, pr["id"][sl]
+
+
+def _fill_effects(e, out, sl):
+    out["x"], out["y"], out["type"], out["timer"] = e["x"][sl], e["y"][sl], e["type"][sl], e["timer"][sl]
+
+
+def _fill_one(fill, table, i, ref):
+    out = _out(ref)
+    if out is None or i < 0 or i >= len(table): return False
+    row = np.ctypeslib.as_array(ctypes.pointer(out), shape=(1,))
+    fill(table, row, slice(i, i + 1))
+    return True
+
+
+def Engine_Create(): return GameEngine()
+def Engine_Destroy(engine): pass
+def Engine_LoadLevel(engine, lvl): return bool(engine) and engine.load_level(_val(lvl))
+def Engine_LoadLevelFromMemory(engine, text, n):
+    n = _val(n)
+    return bool(engine) and n >= 0 and engine.load_level_from_memory(_val(text)[:n])
+def Engine_Update(engine, dt):
+    if engine: engine.update(_val(dt))
+def Engine_SetSeed(engine, seed):
+    if engine: engine.set_seed(_val(seed))
+def Engine_GetStateHash(engine): return engine.state_hash() if engine else 0
+def Engine_SaveState(engine, out, capacity):
+    if not engine: return 0
+    data = engine.save_state()
+    if out is not None and _val(capacity) >= len(data): ctypes.memmove(out, data, len(data))
+    return len(data)
+def Engine_RestoreState(engine, data, n):
+    n = _val(n)
+    return bool(engine) and n >= 0 and engine.restore_state(_val(data)[:n])
+def Engine_Clone(engine): return engine.clone() if engine else None
+def Engine_GetStats(engine, ref):
+    out = _out(ref)
+    if not engine or out is None: return False
+    for k, v in engine.stats.items(): setattr(out, k, v)
+    return True
+def Engine_TryBuildPlant(engine, x, y, card):
+    if engine: engine.try_build_plant(_val(x), _val(y), _val(card))
+def Engine_RemovePlant(engine, x, y):
+    if engine: engine.remove_plant_at(_val(x), _val(y))
+
+def Engine_GetMoney(engine): return engine.money if engine else 0
+def Engine_GetLives(engine): return engine.lives if engine else 0
+def Engine_GetMapWidth(engine): return engine.map.width if engine else 0
+def Engine_GetMapHeight(engine): return engine.map.height if engine else 0
+def Engine_GetActiveRows(engine, out, capacity):
+    if not engine: return 0
+    rows = engine.map.active_rows
+    if out is not None:
+        for i, r in enumerate(rows[:_val(capacity)]): out[i] = r
+    return len(rows)
+def Engine_IsLevelComplete(engine): return engine.level_completed if engine else False
+def Engine_IsGameOver(engine): return engine.game_over if engine else False
+
+def Engine_GetZombieCount(engine): return len(engine.zombies) if engine else 0
+def Engine_GetZombieData(engine, i, out): return bool(engine) and _fill_one(_fill_zombies, engine.zombies, i, out)
+def Engine_GetPlantCount(engine): return len(engine.plants) if engine else 0
+def Engine_GetPlantData(engine, i, out): return bool(engine) and _fill_one(_fill_plants, engine.plants, i, out)
+def Engine_GetProjectileCount(engine): return len(engine.projectiles) if engine else 0
+def Engine_GetProjectileData(engine, i, out): return bool(engine) and _fill_one(_fill_projectiles, engine.projectiles, i, out)
+def Engine_GetEffectCount(engine): return len(engine.effects) if engine else 0
+def Engine_GetEffectData(engine, i, out): return bool(engine) and _fill_one(_fill_effects, engine.effects, i, out)
+def Engine_GetCardCooldownPct(engine, i): return engine.get_card_cooldown_pct(_val(i)) if engine else 0.0
+def Engine_GetSoundCount(engine): return len(engine.sound_events) if engine else 0
+def Engine_GetSoundData(engine, i):
+    if not engine or i < 0 or i >= len(engine.sound_events): return 0
+    return engine.sound_events[i]
+
+
+def Engine_GetSnapshot(engine, ref):
+    out = _out(ref)
+    if not engine or out is None: return False
+    fits = True
+
+    for kind, table, fill in (("zombie", engine.zombies, _fill_zombies), ("plant", engine.plants, _fill_plants),
+                              ("projectile", engine.projectiles, _fill_projectiles),
+                              ("effect", engine.effects, _fill_effects)):
+        n = len(table)
+        setattr(out, f"{kind}_count", n)
+        if n > getattr(out, f"{kind}_capacity"): fits = False
+        elif n: fill(table, np.ctypeslib.as_array(getattr(out, f"{kind}s"), shape=(n,)), slice(0, n))
+
+    out.card_count = len(CARDS)
+    if out.card_count > out.card_capacity: fits = False
+    else:
+        for i in range(len(CARDS)): out.card_cooldowns[i] = engine.get_card_cooldown_pct(i)
+
+    out.sound_count = len(engine.sound_events)
+    if out.sound_count > out.sound_capacity: fits = False
+    else:
+        for i, s in enumerate(engine.sound_events): out.sounds[i] = s
+
+    out.money = engine.money
+    out.lives = engine.lives
+    out.level_complete = engine.level_completed
+    out.game_over = engine.game_over
+    return fits
@@ -0,0 +1,146 @@
+"""Records play sessions and replays them headless as fast as the engine allows.
+
+Run it from this folder, the same way as main.py:
+
+    python replay.py replays/level3_20260101-120000_5f3a9c01.pvzr
+    python replay.py replays/*.pvzr
+
+A log holds the engine kind, level id, RNG seed and fixed dt of the session, then one
+8-byte event per build/remove with the engine tick it was applied before. The
+game writes one log per level attempt to cfg.REPLAY_DIR when cfg.RECORD_REPLAYS
+is set, and keeps only the newest cfg.REPLAY_KEEP of them. The last event is an END record with the final tick and
+Engine_GetStateHash; a replay must reach the same hash on the same engine
+(native and Python engines hash differently).
+"""
+import argparse
+import ctypes
+import glob
+import os
+import struct
+import sys
+import time
+
+import headless
+from cpp_bridge import lib, NATIVE
+
+MAGIC = b"PVZR"
+VERSION = 1
+HEADER = struct.Struct("<4sBBiIf")    # magic, version, native engine, level, seed, dt
+EVENT = struct.Struct("<IBBBB")       # tick, op, card, col, row
+HASH = struct.Struct("<Q")            # follows the END event
+
+END, BUILD, REMOVE = 0, 1, 2
+
+
+class Recorder:
+    def __init__(self, path, level, seed, dt, keep=0):
+        # keep > 0: delete the oldest logs next to path so that, with this one, at most keep remain.
+        folder = os.path.dirname(path) or "."
+        os.makedirs(folder, exist_ok=True)
+        if keep > 0:
+            logs = sorted(glob.glob(os.path.join(folder, "*.pvzr")), key=os.path.getmtime)
+            for old in logs[:max(0, len(logs) - keep + 1)]:
+                os.remove(old)
+        self.path = path
+        self.f = open(path, "wb")
+        self.f.write(HEADER.pack(MAGIC, VERSION, NATIVE, level, seed, dt))
+
+    def record(self, tick, op, card, col, row):
+        self.f.write(EVENT.pack(tick, op, card, col, row))
+
+    def finish(self, tick, state_hash):
+        if self.f.closed: return
+        self.f.write(EVENT.pack(tick, END, 0, 0, 0) + HASH.pack(state_hash))
+        self.f.close()
+
+
+def read_log(path):
+    """Returns (native, level, seed, dt, events, end): events is a list of (tick, op, card,
+    col, row), end is (tick, hash) or None for a log cut short."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < HEADER.size: raise ValueError(f"{path}: not a replay log")
+    magic, version, native, level, seed, dt = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION: raise ValueError(f"{path}: not a replay log")
+
+    events, end = [], None
+    pos = HEADER.size
+    while pos + EVENT.size <= len(data):
+        ev = EVENT.unpack_from(data, pos)
+        pos += EVENT.size
+        if ev[1] == END:
+            if pos + HASH.size <= len(data): end = (ev[0], HASH.unpack_from(data, pos)[0])
+            break
+        events.append(ev)
+    return bool(native), level, seed, dt, events, end
+
+
+def apply_event(engine, event):
+    _, op, card, col, row = event
+    x, y = headless.cell_center(col, row)
+    if op == BUILD: lib.Engine_TryBuildPlant(engine, ctypes.c_float(x), ctypes.c_float(y), card)
+    elif op == REMOVE: lib.Engine_RemovePlant(engine, ctypes.c_float(x), ctypes.c_float(y))
+
+
+def replay(path, engine=None):
+    native, level, seed, dt, events, end = read_log(path)
+    own_engine = engine is None
+    if own_engine: engine = lib.Engine_Create()
+    try:
+        lib.Engine_SetSeed(engine, seed)
+        if not lib.Engine_LoadLevel(engine, level): raise ValueError(f"level {level} could not be loaded")
+        last = end[0] if end else (events[-1][0] if events else 0)
+        c_dt = ctypes.c_float(dt)
+        cursor = 0
+
+        start = time.perf_counter()
+        for tick in range(last + 1):
+            while cursor < len(events) and events[cursor][0] <= tick:
+                apply_event(engine, events[cursor])
+                cursor += 1
+            if tick < last: lib.Engine_Update(engine, c_dt)
+        elapsed = time.perf_counter() - start
+
+        state_hash = lib.Engine_GetStateHash(engine)
+        return {
+            "path": path,
+            "level": level,
+            "ticks": last,
+            "hash": state_hash,
+            "expected": end[1] if end and native == NATIVE else None,
+            "ok": end is not None and native == NATIVE and end[1] == state_hash,
+            "engine_mismatch": native != NATIVE,
+            "ticks_per_sec": last / elapsed if elapsed > 0 else float("inf"),
+        }
+    finally:
+        if own_engine: lib.Engine_Destroy(engine)
+
+
+def format_result(r):
+    if r["ok"]: status = "ok"
+    elif r["engine_mismatch"]: status = "other engine"
+    else: status = "no end" if r["expected"] is None else "DIVERGED"
+    return (f"{os.path.basename(r['path'])}  level {r['level']:>3}  ticks={r['ticks']:<7}"
+            f"  hash={r['hash']:016x}  {status:<12}  {r['ticks_per_sec']:12.0f} ticks/s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded sessions and check their final state.")
+    parser.add_argument("logs", nargs="+", help="replay log files (globs are expanded)")
+    args = parser.parse_args(argv)
+
+    paths = [p for pattern in args.logs for p in (sorted(glob.glob(pattern)) or [pattern])]
+    failed = 0
+    engine = lib.Engine_Create()
+    try:
+        for path in paths:
+            r = replay(path, engine)
+            print(format_result(r))
+            if r["expected"] is not None and not r["ok"]: failed += 1
+    finally:
+        lib.Engine_Destroy(engine)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""Runs the engine on its own thread at a fixed tick rate.
+
+The render thread never calls into the engine while a level is playing. Input is
+queued with submit() and applied by the simulation thread between ticks; after
+every tick the thread reads a Snapshot and publishes it. The renderer takes the
+last two published snapshots with frame() and draws positions interpolated
+between them, one tick behind the engine.
+
+ctypes.CDLL releases the GIL for the duration of every foreign call, so a long
+Engine_Update does not block event handling or drawing on the main thread.
+"""
+import ctypes
+import threading
+import time
+
+import config as cfg
+from cpp_bridge import lib, Snapshot, C_Stats, get_stats
+
+
+class SimulationThread(threading.Thread):
+    def __init__(self, engine, hz=cfg.SIM_HZ, max_steps=cfg.SIM_MAX_STEPS):
+        super().__init__(daemon=True, name="simulation")
+        self.engine = engine
+        self.dt = 1.0 / hz
+        self.max_steps = max_steps
+        # Fast-forward: each period runs `speed` engine ticks and publishes one snapshot.
+        self.speed = 1
+        self.recorder = None
+        self.profiler = None
+        self.stats = C_Stats()
+        # Held while the engine is touched. The main thread only takes it around
+        # level loads, with the simulation paused.
+        self.lock = threading.Lock()
+        self.cond = threading.Condition()
+        self.running = False
+        self.stopped = False
+        # Engine_Update calls of dt since the last reset(); replay logs count in these.
+        self.ticks = 0
+        self.next_tick = 0.0
+
+        self.commands = []
+        self.results = []
+        self.sounds = []
+
+        # prev/curr are the published pair and the renderer may still be drawing the pair
+        # it took last (held); the writer must stay away from all four, so it needs a fifth.
+        self.buffers = [Snapshot() for _ in range(5)]
+        self.prev = self.curr = self.buffers[0]
+        self.curr_time = 0.0
+        self.held = ()
+
+    def reset(self):
+        """Publishes the engine's current state as both snapshots. Call with the simulation paused."""
+        with self.lock:
+            snap = self.buffers[0].read(self.engine)
+            with self.cond:
+                self.prev = self.curr = snap
+                self.curr_time = time.perf_counter()
+                self.held = ()
+                self.ticks = 0
+                self.commands.clear(); self.results.clear(); self.sounds.clear()
+
+    def set_running(self, running):
+        with self.cond:
+            if running and not self.running: self.next_tick = time.perf_counter()
+            self.running = running
+            self.cond.notify()
+
+    def stop(self):
+        with self.cond:
+            self.stopped = True
+            self.cond.notify()
+        if self.is_alive(): self.join()
+        self.end_recording()
+
+    def end_recording(self):
+        """Closes the replay log with the current tick and state hash."""
+        with self.lock:
+            if self.recorder: self.recorder.finish(self.ticks, lib.Engine_GetStateHash(self.engine))
+            self.recorder = None
+
+    def submit(self, fn, *args, then=None, record=None):
+        """Runs fn(engine, *args) on the simulation thread before the next tick.
+        then(result) is called from poll() on the main thread. record is the
+        (op, card, col, row) replay event for the command, if it is an input."""
+        with self.cond:
+            self.commands.append((fn, args, then, record))
+            self.cond.notify()
+
+    def poll(self):
+        """Main thread: runs finished command callbacks, returns the sounds of the ticks since the last call."""
+        with self.cond:
+            results, self.results = self.results, []
+            sounds, self.sounds = self.sounds, []
+        for then, res in results: then(res)
+        return sounds
+
+    def frame(self):
+        """Main thread: (prev, curr, alpha) to draw this frame. Both snapshots stay
+        untouched until the next call."""
+        with self.cond:
+            self.held = (self.prev, self.curr)
+            alpha = (time.perf_counter() - self.curr_time) / self.dt
+            return self.prev, self.curr, min(max(alpha, 0.0), 1.0)
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.stopped and not self.commands and not self.running:
+                    self.cond.wait()
+                if self.stopped: return
+                commands, self.commands = self.commands, []
+                wait = self.next_tick - time.perf_counter() if self.running else None
+
+            if commands:
+                with self.lock:
+                    done = []
+                    for fn, args, then, record in commands:
+                        if record and self.recorder: self.recorder.record(self.ticks, *record)
+                        done.append((then, fn(self.engine, *args)))
+                with self.cond:
+                    self.results.extend((then, res) for then, res in done if then)
+                continue
+
+            if wait > 0:
+                with self.cond:
+                    if not self.commands and not self.stopped: self.cond.wait(wait)
+                continue
+
+            steps = 0
+            while self.running and time.perf_counter() >= self.next_tick and steps < self.max_steps:
+                self._step()
+                self.next_tick += self.dt
+                steps += 1
+            # Too far behind to catch up: drop the backlog instead of spiralling.
+            if steps == self.max_steps and time.perf_counter() >= self.next_tick:
+                self.next_tick = time.perf_counter()
+
+    def _back_buffer(self):
+        """The buffer the next tick is read into: neither published nor held by the renderer."""
+        with self.cond:
+            busy = (self.prev, self.curr) + tuple(self.held)
+            return next(b for b in self.buffers if all(b is not o for o in busy))
+
+    def _step(self):
+        back = self._back_buffer()
+        with self.lock:
+            if not self.running: return
+            sounds = []
+            t_engine = t_read = 0.0
+            for _ in range(self.speed):
+                t0 = time.perf_counter()
+                lib.Engine_Update(self.engine, ctypes.c_float(self.dt))
+                self.ticks += 1
+                t1 = time.perf_counter()
+                back.read(self.engine)
+                t_engine += t1 - t0; t_read += time.perf_counter() - t1
+                if self.profiler and self.profiler.enabled: self.profiler.add_stats(get_stats(self.engine, self.stats))
+                sounds.extend(back.sounds)
+                if back.level_complete or back.game_over: break
+            if self.profiler:
+                self.profiler.add("engine", t_engine); self.profiler.add("snapshot", t_read)
+            done = back.level_complete or back.game_over
+            if done and self.recorder:
+                self.recorder.finish(self.ticks, lib.Engine_GetStateHash(self.engine))
+                self.recorder = None
+            # Published before the engine is released, so a level load cannot slip in between.
+            with self.cond:
+                self.sounds.extend(sounds)
+                self.prev, self.curr = self.curr, back
+                self.curr_time = time.perf_counter()
+                if done: self.running = False
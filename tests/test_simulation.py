@@ -0,0 +1,35 @@
+"""SimulationThread must never read a tick into a snapshot the renderer can see."""
+import os
+import sys
+
+import pytest
+
+PROGFILES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "progfiles")
+
+
+@pytest.fixture
+def sim(monkeypatch):
+    # The game and its engines resolve config, levels and the .dll relative to progfiles/.
+    monkeypatch.chdir(PROGFILES)
+    monkeypatch.syspath_prepend(PROGFILES)
+    from cpp_bridge import lib
+    from simulation import SimulationThread
+
+    engine = lib.Engine_Create()
+    assert lib.Engine_LoadLevel(engine, 1)
+    sim = SimulationThread(engine)    # not started: the test calls _step itself
+    sim.reset()
+    sim.running = True
+    yield sim
+    lib.Engine_Destroy(engine)
+
+
+@pytest.mark.parametrize("frame_every", [1, 2, 3, 7])
+def test_step_never_writes_a_visible_snapshot(sim, frame_every):
+    # frame_every > 1 is a renderer slower than the simulation: the pair it holds
+    # goes stale while prev/curr move on.
+    for i in range(60):
+        if i % frame_every == 0: sim.frame()
+        busy = [sim.prev, sim.curr, *sim.held]
+        sim._step()
+        assert all(sim.curr is not b for b in busy)